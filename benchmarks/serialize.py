@@ -0,0 +1,71 @@
+"""Benchmark serializing fleet snapshots to JSON.
+
+Compares the generic ``json.dumps`` path with ``FleetSerializer``, with
+and without ``orjson``::
+
+    python benchmarks/serialize.py [devices]
+"""
+
+from __future__ import annotations
+
+import sys
+import timeit
+from functools import partial
+
+from bluetooth_sensor_state_data import BluetoothServiceInfo
+from sensor_state_data import SensorUpdate
+
+from mopeka_iot_ble import FleetSerializer, MopekaIOTFleet, fleet_to_json
+from mopeka_iot_ble.serialize import orjson
+
+
+def build_snapshot(devices: int) -> dict[str, SensorUpdate]:
+    fleet = MopekaIOTFleet()
+    snapshot = {}
+    for number in range(devices):
+        address = ":".join(f"{byte:02X}" for byte in number.to_bytes(6, "big"))
+        level = 200 + number % 800
+        update = fleet.update(
+            BluetoothServiceInfo(
+                name="",
+                address=address,
+                rssi=-40 - number % 50,
+                manufacturer_data={
+                    89: b"\x08pC"
+                    + bytes((level & 0xFF, 0xC0 | level >> 8))
+                    + b"\xe0\xf5\t\xfa\xe3"
+                },
+                service_uuids=["0000fee5-0000-1000-8000-00805f9b34fb"],
+                service_data={},
+                source="local",
+            )
+        )
+        assert update is not None
+        snapshot[address] = update
+    return snapshot
+
+
+def main() -> None:
+    devices = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    snapshot = build_snapshot(devices)
+    candidates = {
+        "json.dumps": fleet_to_json,
+        "FleetSerializer": FleetSerializer(use_orjson=False).dumps,
+    }
+    if orjson is not None:
+        candidates["FleetSerializer (orjson)"] = FleetSerializer().dumps
+    reference = fleet_to_json(snapshot)
+    baseline = None
+    for name, dumps in candidates.items():
+        assert dumps(snapshot) == reference, name
+        runs, total = timeit.Timer(partial(dumps, snapshot)).autorange()
+        elapsed = total / runs
+        baseline = baseline or elapsed
+        print(
+            f"{name:<26} {elapsed * 1000:8.2f} ms"
+            f" {devices / elapsed:12,.0f} devices/s {baseline / elapsed:6.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
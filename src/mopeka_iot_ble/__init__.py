@@ -22,24 +22,106 @@ from sensor_state_data import (
     Units,
 )
 
-from .parser import MopekaIOTBluetoothDeviceData
-from .models import MediumType
+from .battery import BatteryEstimate, BatteryModel
+from .bus import EntityChange, SubscriptionBus
+from .coalesce import UpdateCoalescer
+from .columns import FleetColumns
+from .config import TankConfigStore
+from .estimator import ConsumptionEstimate, ConsumptionEstimator
+from .expiry import DeviceExpiry, TimerWheel
+from .export import ExportFormat, ReadingExporter
+from .fleet import MopekaIOTFleet, RestoredDevice
+from .index import TankLevelIndex
+from .ingest import IngestServer, encode_frame
+from .link import LinkStats, LinkTracker
+from .metrics import ParserMetrics
+from .models import (
+    FrameRecord,
+    MediumType,
+    MopekaReading,
+    MovementEvent,
+    RejectReason,
+    Site,
+    SiteMember,
+    TankConfig,
+)
+from .movement import MovementDetector
+from .parser import ENTITY_KEYS, MopekaIOTBluetoothDeviceData
+from .quality import QualityStats, QualityTracker
+from .recorder import FrameRecorder, read_recording, replay
+from .ring import FrameRingReader, FrameRingWriter, RingFrame
+from .sampling import RejectedPayload, RejectedPayloadSampler
+from .serialize import FleetSerializer, fleet_to_json
+from .sinks import FileSink, OverflowPolicy, QueueSink, ReadingSink, SocketSink
+from .sites import SiteAggregator, SiteTotals
+from .snapshot import SnapshotError, decode_snapshot, encode_snapshot
 
 __version__ = "0.8.0"
 
 __all__ = [
-    "MopekaIOTBluetoothDeviceData",
-    "BinarySensorDeviceClass",
+    "ENTITY_KEYS",
+    "BatteryEstimate",
+    "BatteryModel",
     "BinarySensorDescription",
+    "BinarySensorDeviceClass",
     "BinarySensorValue",
-    "MediumType",
-    "SensorDescription",
-    "SensorDeviceInfo",
+    "ConsumptionEstimate",
+    "ConsumptionEstimator",
     "DeviceClass",
+    "DeviceExpiry",
     "DeviceKey",
+    "EntityChange",
+    "ExportFormat",
+    "FileSink",
+    "FleetColumns",
+    "FleetSerializer",
+    "FrameRecord",
+    "FrameRecorder",
+    "FrameRingReader",
+    "FrameRingWriter",
+    "IngestServer",
+    "LinkStats",
+    "LinkTracker",
+    "MediumType",
+    "MopekaIOTBluetoothDeviceData",
+    "MopekaIOTFleet",
+    "MopekaReading",
+    "MovementDetector",
+    "MovementEvent",
+    "OverflowPolicy",
+    "ParserMetrics",
+    "QualityStats",
+    "QualityTracker",
+    "QueueSink",
+    "ReadingExporter",
+    "ReadingSink",
+    "RejectReason",
+    "RejectedPayload",
+    "RejectedPayloadSampler",
+    "RestoredDevice",
+    "RingFrame",
+    "SensorDescription",
     "SensorDeviceClass",
-    "SensorUpdate",
     "SensorDeviceInfo",
+    "SensorUpdate",
     "SensorValue",
+    "Site",
+    "SiteAggregator",
+    "SiteMember",
+    "SiteTotals",
+    "SnapshotError",
+    "SocketSink",
+    "SubscriptionBus",
+    "TankConfig",
+    "TankConfigStore",
+    "TankLevelIndex",
+    "TimerWheel",
     "Units",
+    "UpdateCoalescer",
+    "decode_snapshot",
+    "encode_frame",
+    "encode_snapshot",
+    "fleet_to_json",
+    "read_recording",
+    "replay",
 ]
@@ -0,0 +1,8 @@
+"""Run the command line decoder with ``python -m mopeka_iot_ble``."""
+
+import sys
+
+from .cli import main
+
+if __name__ == "__main__":
+    sys.exit(main())
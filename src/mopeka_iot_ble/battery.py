@@ -0,0 +1,284 @@
+"""Incremental battery discharge trend and remaining life prediction.
+
+MIT License applies.
+"""
+
+from __future__ import annotations
+
+import math
+import struct
+import time
+from typing import NamedTuple
+
+DEFAULT_HALF_LIFE = 14.0
+DEFAULT_TEMPERATURE_COEFFICIENT = 0.004
+DEFAULT_REFERENCE_TEMPERATURE = 25.0
+DEFAULT_CUTOFF_VOLTAGE = 2.2
+DEFAULT_MIN_SAMPLES = 10
+DEFAULT_MIN_SPAN = 1.0
+DEFAULT_REPLACEMENT_THRESHOLD = 0.2
+
+SECONDS_PER_DAY = 86400.0
+
+# replacements, samples, first and last seen, the five sums of the fit,
+# whether there is an estimate and its voltage, discharge rate,
+# remaining days (NaN for None), samples and timestamp.
+_STATE = struct.Struct("<IIddddddd?dddId")
+
+
+class BatteryEstimate(NamedTuple):
+    """The fitted discharge of a battery.
+
+    ``voltage`` is the smoothed voltage at the latest sample, compensated
+    to the reference temperature; ``discharge_rate`` the voltage drop in
+    V per day and ``remaining_days`` the days until the fitted voltage
+    reaches the cutoff (None while the voltage is not dropping).
+    """
+
+    voltage: float
+    discharge_rate: float
+    remaining_days: float | None
+    samples: int
+    timestamp: float
+
+
+class _Discharge:
+    """Exponentially decayed sums for a fit of voltage over time.
+
+    Times are in days relative to the latest sample, so the fitted
+    voltage now is the intercept and the sums stay small.
+    """
+
+    __slots__ = (
+        "first_seen",
+        "last_seen",
+        "samples",
+        "sum_t",
+        "sum_tt",
+        "sum_ty",
+        "sum_w",
+        "sum_y",
+    )
+
+    def __init__(self, timestamp: float) -> None:
+        self.first_seen = timestamp
+        self.last_seen = timestamp
+        self.samples = 0
+        self.sum_w = 0.0
+        self.sum_t = 0.0
+        self.sum_y = 0.0
+        self.sum_tt = 0.0
+        self.sum_ty = 0.0
+
+    def add(self, timestamp: float, voltage: float, decay: float) -> None:
+        # Move the origin to the new sample and age the old ones.
+        shift = (timestamp - self.last_seen) / SECONDS_PER_DAY
+        if shift:
+            factor = math.exp(-shift * decay)
+            sum_w = self.sum_w
+            sum_t = self.sum_t
+            self.sum_tt = (self.sum_tt - 2 * shift * sum_t + shift * shift * sum_w) * (
+                factor
+            )
+            self.sum_ty = (self.sum_ty - shift * self.sum_y) * factor
+            self.sum_t = (sum_t - shift * sum_w) * factor
+            self.sum_y *= factor
+            self.sum_w = sum_w * factor
+            self.last_seen = timestamp
+        self.samples += 1
+        self.sum_w += 1.0
+        self.sum_y += voltage
+
+    def fit(self) -> tuple[float, float] | None:
+        """Return (slope, voltage now) or None if all samples share a time."""
+        denominator = self.sum_w * self.sum_tt - self.sum_t * self.sum_t
+        if denominator <= 1e-12 * self.sum_w * self.sum_w:
+            return None
+        slope = (self.sum_w * self.sum_ty - self.sum_t * self.sum_y) / denominator
+        return slope, (self.sum_y - slope * self.sum_t) / self.sum_w
+
+
+class BatteryModel:
+    """Fit the battery voltage of every device over time.
+
+    Coin cells sag in the cold, so every voltage is first compensated to
+    ``reference_temperature`` with ``temperature_coefficient`` V per °C,
+    using the temperature decoded from the same frame. The compensated
+    voltage is fitted against time by least squares with weights halving
+    every ``half_life`` days, which smooths the coarse 1/32 V steps the
+    sensors report and follows a discharge that speeds up near the end.
+    Every sample is O(1): only the running sums of the fit change.
+
+    The remaining life is the time until the fitted voltage reaches
+    ``cutoff_voltage``, 2.2 V being where the battery percentage reports
+    0. A voltage more than ``replacement_threshold`` V above the weighted
+    mean is taken as a new battery and starts a new fit.
+    """
+
+    def __init__(
+        self,
+        half_life: float = DEFAULT_HALF_LIFE,
+        temperature_coefficient: float = DEFAULT_TEMPERATURE_COEFFICIENT,
+        reference_temperature: float = DEFAULT_REFERENCE_TEMPERATURE,
+        cutoff_voltage: float = DEFAULT_CUTOFF_VOLTAGE,
+        min_samples: int = DEFAULT_MIN_SAMPLES,
+        min_span: float = DEFAULT_MIN_SPAN,
+        replacement_threshold: float = DEFAULT_REPLACEMENT_THRESHOLD,
+    ) -> None:
+        self._decay = math.log(2) / half_life
+        self._temperature_coefficient = temperature_coefficient
+        self._reference_temperature = reference_temperature
+        self._cutoff_voltage = cutoff_voltage
+        self._min_samples = min_samples
+        self._min_span = min_span * SECONDS_PER_DAY
+        self._replacement_threshold = replacement_threshold
+        self._discharges: dict[str, _Discharge] = {}
+        self._estimates: dict[str, BatteryEstimate] = {}
+        self._replacements: dict[str, int] = {}
+
+    def __len__(self) -> int:
+        """Return the number of tracked devices."""
+        return len(self._discharges)
+
+    def replacements(self, address: str) -> int:
+        """Return how many battery replacements were detected for a device."""
+        return self._replacements.get(address, 0)
+
+    def forget(self, address: str) -> None:
+        """Drop the fit of a device."""
+        self._discharges.pop(address, None)
+        self._estimates.pop(address, None)
+        self._replacements.pop(address, None)
+
+    def dump_state(self, address: str) -> bytes | None:
+        """Return the fit of a device for a snapshot."""
+        if (discharge := self._discharges.get(address)) is None:
+            return None
+        estimate = self._estimates.get(address)
+        return _STATE.pack(
+            min(self._replacements.get(address, 0), 0xFFFFFFFF),
+            min(discharge.samples, 0xFFFFFFFF),
+            discharge.first_seen,
+            discharge.last_seen,
+            discharge.sum_w,
+            discharge.sum_t,
+            discharge.sum_y,
+            discharge.sum_tt,
+            discharge.sum_ty,
+            estimate is not None,
+            *(
+                (0.0, 0.0, math.nan, 0, 0.0)
+                if estimate is None
+                else (
+                    estimate.voltage,
+                    estimate.discharge_rate,
+                    math.nan
+                    if estimate.remaining_days is None
+                    else estimate.remaining_days,
+                    min(estimate.samples, 0xFFFFFFFF),
+                    estimate.timestamp,
+                )
+            ),
+        )
+
+    def load_state(self, address: str, data: bytes) -> None:
+        """Restore the fit of a device from ``dump_state``."""
+        try:
+            (
+                replacements,
+                samples,
+                first_seen,
+                last_seen,
+                sum_w,
+                sum_t,
+                sum_y,
+                sum_tt,
+                sum_ty,
+                has_estimate,
+                voltage,
+                discharge_rate,
+                remaining_days,
+                estimate_samples,
+                timestamp,
+            ) = _STATE.unpack(data)
+        except struct.error as ex:
+            raise ValueError(f"Corrupt battery state: {ex}") from ex
+        discharge = self._discharges[address] = _Discharge(first_seen)
+        discharge.last_seen = last_seen
+        discharge.samples = samples
+        discharge.sum_w = sum_w
+        discharge.sum_t = sum_t
+        discharge.sum_y = sum_y
+        discharge.sum_tt = sum_tt
+        discharge.sum_ty = sum_ty
+        if replacements:
+            self._replacements[address] = replacements
+        else:
+            self._replacements.pop(address, None)
+        if has_estimate:
+            self._estimates[address] = BatteryEstimate(
+                voltage,
+                discharge_rate,
+                None if math.isnan(remaining_days) else remaining_days,
+                estimate_samples,
+                timestamp,
+            )
+        else:
+            self._estimates.pop(address, None)
+
+    def estimate(self, address: str) -> BatteryEstimate | None:
+        """Return the latest estimate of a device."""
+        return self._estimates.get(address)
+
+    def update(
+        self, address: str, timestamp: float, voltage: float, temperature: float
+    ) -> BatteryEstimate | None:
+        """Add a sample and return the estimate once there is enough data."""
+        voltage += self._temperature_coefficient * (
+            self._reference_temperature - temperature
+        )
+        if (discharge := self._discharges.get(address)) is None:
+            discharge = self._discharges[address] = _Discharge(timestamp)
+        elif (
+            discharge.sum_w
+            and voltage - discharge.sum_y / discharge.sum_w
+            > self._replacement_threshold
+        ):
+            self._replacements[address] = self._replacements.get(address, 0) + 1
+            self._estimates.pop(address, None)
+            discharge = self._discharges[address] = _Discharge(timestamp)
+        discharge.add(timestamp, voltage, self._decay)
+        if (
+            discharge.samples < self._min_samples
+            or timestamp - discharge.first_seen < self._min_span
+            or (fit := discharge.fit()) is None
+        ):
+            return None
+        slope, fitted = fit
+        remaining_days = None
+        if slope < 0:
+            remaining_days = max(0.0, fitted - self._cutoff_voltage) / -slope
+        estimate = self._estimates[address] = BatteryEstimate(
+            fitted, -slope, remaining_days, discharge.samples, timestamp
+        )
+        return estimate
+
+    def due(self, within: float, now: float | None = None) -> list[tuple[str, float]]:
+        """Return the devices whose battery runs out within ``within`` days.
+
+        Returns (address, remaining days as of now) pairs, soonest first,
+        to plan replacement rounds.
+        """
+        if now is None:
+            now = time.time()
+        due: list[tuple[str, float]] = []
+        for address, estimate in self._estimates.items():
+            if estimate.remaining_days is None:
+                continue
+            remaining = estimate.remaining_days - (now - estimate.timestamp) / (
+                SECONDS_PER_DAY
+            )
+            if remaining <= within:
+                due.append((address, max(0.0, remaining)))
+        due.sort(key=lambda item: item[1])
+        return due
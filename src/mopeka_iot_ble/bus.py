@@ -0,0 +1,171 @@
+"""Push based subscriptions to Mopeka IOT sensor changes.
+
+MIT License applies.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Callable
+from datetime import date, datetime
+from decimal import Decimal
+from typing import NamedTuple
+
+from sensor_state_data import SensorUpdate
+
+NativeValue = None | str | int | float | bool | date | datetime | Decimal
+ChangePredicate = Callable[[NativeValue, NativeValue], bool]
+
+
+class EntityChange(NamedTuple):
+    """A change of one entity of one device."""
+
+    address: str
+    key: str
+    old_value: NativeValue
+    new_value: NativeValue
+
+
+def value_changed(old_value: NativeValue, new_value: NativeValue) -> bool:
+    """Return True if the value changed, the default predicate."""
+    return old_value != new_value
+
+
+def always(old_value: NativeValue, new_value: NativeValue) -> bool:
+    """Return True for every update, even if the value did not change."""
+    return True
+
+
+class _Subscription:
+    __slots__ = ("callback", "predicate")
+
+    def __init__(
+        self, callback: Callable[[EntityChange], None], predicate: ChangePredicate
+    ) -> None:
+        self.callback = callback
+        self.predicate = predicate
+
+
+class SubscriptionBus:
+    """Fan out entity changes to the subscribers interested in them.
+
+    Subscriptions are indexed by ``(address, key)`` where either part may
+    be None to match everything. Publishing an update for an address
+    nobody subscribed to is a single set lookup, and only the entities
+    someone asked for are compared with their previous value.
+    """
+
+    def __init__(self) -> None:
+        self._subscriptions: dict[
+            tuple[str | None, str | None], list[_Subscription]
+        ] = {}
+        self._addresses: dict[str | None, int] = {}
+        self._last_values: dict[tuple[str, str], NativeValue] = {}
+
+    def subscribe(
+        self,
+        callback: Callable[[EntityChange], None],
+        address: str | None = None,
+        key: str | None = None,
+        predicate: ChangePredicate = value_changed,
+    ) -> Callable[[], None]:
+        """Call back on changes of an address and/or entity key.
+
+        Returns a function that removes the subscription again.
+        """
+        subscription = _Subscription(callback, predicate)
+        index = (address, key)
+        self._subscriptions.setdefault(index, []).append(subscription)
+        self._addresses[address] = self._addresses.get(address, 0) + 1
+
+        def _remove() -> None:
+            subscriptions = self._subscriptions.get(index)
+            if subscriptions is None or subscription not in subscriptions:
+                return
+            subscriptions.remove(subscription)
+            if not subscriptions:
+                del self._subscriptions[index]
+            if (remaining := self._addresses[address] - 1) > 0:
+                self._addresses[address] = remaining
+            else:
+                del self._addresses[address]
+            self._prune()
+
+        return _remove
+
+    def _watched(self, address: str, key: str) -> bool:
+        """Return True if a subscription matches an entity of an address."""
+        subscriptions = self._subscriptions
+        return (
+            (address, key) in subscriptions
+            or (address, None) in subscriptions
+            or (None, key) in subscriptions
+            or (None, None) in subscriptions
+        )
+
+    def _prune(self) -> None:
+        """Drop the last values of entities nobody subscribes to anymore."""
+        watched = self._watched
+        self._last_values = {
+            index: value
+            for index, value in self._last_values.items()
+            if watched(*index)
+        }
+
+    def forget(self, address: str) -> None:
+        """Drop the last values of a device, for one that went away."""
+        for index in [index for index in self._last_values if index[0] == address]:
+            del self._last_values[index]
+
+    def subscribe_queue(
+        self,
+        address: str | None = None,
+        key: str | None = None,
+        predicate: ChangePredicate = value_changed,
+        maxsize: int = 0,
+    ) -> tuple[asyncio.Queue[EntityChange], Callable[[], None]]:
+        """Deliver changes to an asyncio queue.
+
+        Changes are dropped when a bounded queue is full. Returns the
+        queue and a function that removes the subscription again.
+        """
+        queue: asyncio.Queue[EntityChange] = asyncio.Queue(maxsize)
+
+        def _put(change: EntityChange) -> None:
+            if not queue.full():
+                queue.put_nowait(change)
+
+        return queue, self.subscribe(_put, address, key, predicate)
+
+    def publish(self, address: str, update: SensorUpdate) -> None:
+        """Publish the entities of an update for an address."""
+        addresses = self._addresses
+        if address not in addresses and None not in addresses:
+            return
+        subscriptions = self._subscriptions
+        last_values = self._last_values
+        for values in (update.entity_values, update.binary_entity_values):
+            for device_key, value in values.items():
+                key = device_key.key
+                matches = [
+                    subscription
+                    for index in (
+                        (address, key),
+                        (address, None),
+                        (None, key),
+                        (None, None),
+                    )
+                    if index in subscriptions
+                    for subscription in subscriptions[index]
+                ]
+                if not matches:
+                    continue
+                new_value = value.native_value
+                old_value = last_values.get((address, key))
+                last_values[address, key] = new_value
+                change: EntityChange | None = None
+                for subscription in matches:
+                    if subscription.predicate(old_value, new_value):
+                        if change is None:
+                            change = EntityChange(address, key, old_value, new_value)
+                        subscription.callback(change)
@@ -0,0 +1,203 @@
+"""Decode captured Mopeka IOT frames from the command line.
+
+Reads one frame per line, either the manufacturer data as hex on its own
+or ``address [medium] hex`` separated by whitespace or commas, and
+writes the decoded values as NDJSON or CSV::
+
+    python -m mopeka_iot_ble capture.txt --format csv > readings.csv
+
+MIT License applies.
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+import time
+from collections import deque
+from collections.abc import Iterable, Iterator, Sequence
+from concurrent.futures import Future, ProcessPoolExecutor
+from contextlib import ExitStack
+from typing import IO, Any
+
+from .export import ExportFormat
+from .models import MediumType
+from .parser import DecodedFrame, decode_payload
+
+CHUNK_SIZE = 1 << 20
+MAX_CACHED_FRAMES = 1 << 16
+
+OUTPUT_FIELDS = ("address", "medium", "model_id", "model", *DecodedFrame._fields)
+
+_MEDIUMS = {medium.value.encode(): medium for medium in MediumType}
+_JSON_STRING = json.JSONEncoder(ensure_ascii=False).encode
+
+_DecodedFields = str | tuple[Any, ...] | None
+
+
+def _decoded_fields(
+    frame_hex: bytes, medium: MediumType, export_format: ExportFormat
+) -> _DecodedFields:
+    """Return the decoded part of a row, or None if the frame is not valid."""
+    decoded: _DecodedFields = None
+    try:
+        payload = bytes.fromhex(frame_hex.decode())
+    except ValueError:
+        payload = b""
+    if (result := decode_payload(payload, medium)) is not None:
+        device_type, frame = result
+        values = (medium.value, payload[0], device_type.model, *frame)
+        if export_format is ExportFormat.CSV:
+            decoded = values
+        else:
+            decoded = json.dumps(
+                dict(zip(OUTPUT_FIELDS[1:], values, strict=True)),
+                separators=(",", ":"),
+            )
+    return decoded
+
+
+def decode_lines(
+    lines: Sequence[bytes], medium: MediumType, export_format: ExportFormat
+) -> tuple[str, int]:
+    """Decode capture lines into output text and the number of rows written.
+
+    Lines that do not hold a valid frame, or that name an unknown
+    medium, are skipped.
+    """
+    out = io.StringIO()
+    writerow = csv.writer(out, lineterminator="\n").writerow
+    write = out.write
+    mediums = _MEDIUMS
+    # Captures repeat the same frames over and over, so the decoded part of
+    # a row is cached per frame and medium; only the address is added per line.
+    cache: dict[tuple[bytes, MediumType], _DecodedFields] = {}
+    rows = 0
+    for line in lines:
+        fields = line.replace(b",", b" ").split()
+        if not fields:
+            continue
+        address = ""
+        line_medium: MediumType | None = medium
+        if len(fields) > 1:
+            address = fields[0].decode(errors="replace")
+            if len(fields) > 2:
+                line_medium = mediums.get(fields[1])
+        if line_medium is None:
+            continue
+        key = (fields[-1], line_medium)
+        if key in cache:
+            decoded = cache[key]
+        else:
+            if len(cache) >= MAX_CACHED_FRAMES:
+                cache.clear()
+            decoded = cache[key] = _decoded_fields(
+                fields[-1], line_medium, export_format
+            )
+        if decoded is None:
+            continue
+        if isinstance(decoded, tuple):
+            writerow((address, *decoded))
+        else:
+            write(f'{{"address":{_JSON_STRING(address)},{decoded[1:]}\n')
+        rows += 1
+    return out.getvalue(), rows
+
+
+def _read_chunks(files: Iterable[IO[bytes]]) -> Iterator[list[bytes]]:
+    for file in files:
+        while lines := file.readlines(CHUNK_SIZE):
+            yield lines
+
+
+def _decode_chunk(
+    args: tuple[list[bytes], MediumType, ExportFormat],
+) -> tuple[str, int, int]:
+    lines, medium, export_format = args
+    text, rows = decode_lines(lines, medium, export_format)
+    return text, len(lines), rows
+
+
+def _ordered(
+    pool: ProcessPoolExecutor,
+    work: Iterable[tuple[list[bytes], MediumType, ExportFormat]],
+    jobs: int,
+) -> Iterator[tuple[str, int, int]]:
+    """Decode chunks in the pool, keeping only a few chunks in flight."""
+    pending: deque[Future[tuple[str, int, int]]] = deque()
+    for item in work:
+        pending.append(pool.submit(_decode_chunk, item))
+        if len(pending) > 2 * jobs:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    """Run the command line decoder and return the exit status."""
+    arg_parser = argparse.ArgumentParser(
+        prog="python -m mopeka_iot_ble",
+        description="Decode Mopeka IOT frames to NDJSON or CSV.",
+    )
+    arg_parser.add_argument(
+        "files", nargs="*", default=["-"], help="capture files, - for stdin"
+    )
+    arg_parser.add_argument(
+        "--format",
+        choices=[export_format.value for export_format in ExportFormat],
+        default=ExportFormat.NDJSON.value,
+    )
+    arg_parser.add_argument(
+        "--medium",
+        choices=[medium.value for medium in MediumType],
+        default=MediumType.PROPANE.value,
+        help="medium for lines that do not name one",
+    )
+    arg_parser.add_argument(
+        "--jobs", type=int, default=1, help="number of decoding processes"
+    )
+    arg_parser.add_argument(
+        "--stats", action="store_true", help="report throughput on stderr"
+    )
+    args = arg_parser.parse_args(argv)
+    export_format = ExportFormat(args.format)
+    medium = MediumType(args.medium)
+    output = sys.stdout
+    if export_format is ExportFormat.CSV:
+        csv.writer(output, lineterminator="\n").writerow(OUTPUT_FIELDS)
+    start = time.perf_counter()
+    lines = rows = 0
+    with ExitStack() as stack:
+        files = [
+            sys.stdin.buffer if name == "-" else stack.enter_context(open(name, "rb"))
+            for name in args.files
+        ]
+        work = ((chunk, medium, export_format) for chunk in _read_chunks(files))
+        if args.jobs > 1:
+            pool = stack.enter_context(ProcessPoolExecutor(args.jobs))
+            results: Iterable[tuple[str, int, int]] = _ordered(pool, work, args.jobs)
+        else:
+            results = map(_decode_chunk, work)
+        try:
+            for text, chunk_lines, chunk_rows in results:
+                output.write(text)
+                lines += chunk_lines
+                rows += chunk_rows
+            output.flush()
+        except BrokenPipeError:
+            # The reader went away (``| head``); keep the interpreter from
+            # failing again when it flushes stdout on exit.
+            os.dup2(os.open(os.devnull, os.O_WRONLY), output.fileno())
+            return 1
+    if args.stats:
+        elapsed = time.perf_counter() - start
+        print(
+            f"{lines} lines, {rows} decoded, {lines - rows} skipped "
+            f"in {elapsed:.3f}s ({lines / elapsed if elapsed else 0:.0f} lines/s)",
+            file=sys.stderr,
+        )
+    return 0
@@ -0,0 +1,137 @@
+"""Coalesce sensor updates into one snapshot of changes per tick.
+
+MIT License applies.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Callable
+
+from sensor_state_data import (
+    BinarySensorValue,
+    DeviceKey,
+    Event,
+    SensorUpdate,
+    SensorValue,
+)
+
+from .bus import NativeValue
+
+DEFAULT_INTERVAL = 1.0
+
+FleetChanges = dict[str, SensorUpdate]
+
+_MISSING = object()
+
+
+class _Pending:
+    __slots__ = ("binary_entity_values", "entity_values", "events", "update")
+
+    def __init__(self, update: SensorUpdate) -> None:
+        self.update = update
+        self.entity_values: dict[DeviceKey, SensorValue] = {}
+        self.binary_entity_values: dict[DeviceKey, BinarySensorValue] = {}
+        self.events: dict[DeviceKey, Event] = {}
+
+
+class UpdateCoalescer:
+    """Merge the updates of many devices into one set of changes per tick.
+
+    ``add`` only remembers the latest value of every entity, so a device
+    that advertises ten times in a tick costs ten dict stores. ``flush``
+    compares the latest values with the ones emitted before and hands
+    the callbacks one ``SensorUpdate`` per device with only the entities
+    that changed, along with the events fired during the tick. Devices
+    without changes are left out, so an idle fleet emits nothing.
+
+    Call ``flush`` once per tick, or run ``run`` as an asyncio task to do
+    so every ``interval`` seconds.
+    """
+
+    def __init__(self, interval: float = DEFAULT_INTERVAL) -> None:
+        self._interval = interval
+        self._pending: dict[str, _Pending] = {}
+        self._emitted: dict[str, dict[DeviceKey, NativeValue]] = {}
+        self._callbacks: tuple[Callable[[FleetChanges], None], ...] = ()
+
+    def register_callback(
+        self, callback: Callable[[FleetChanges], None]
+    ) -> Callable[[], None]:
+        """Call back with the changes of every tick that had any.
+
+        Returns a function that removes the callback again.
+        """
+        self._callbacks = (*self._callbacks, callback)
+
+        def _remove() -> None:
+            self._callbacks = tuple(cb for cb in self._callbacks if cb is not callback)
+
+        return _remove
+
+    def add(self, address: str, update: SensorUpdate) -> None:
+        """Add the update of a device to the current tick."""
+        if (pending := self._pending.get(address)) is None:
+            pending = self._pending[address] = _Pending(update)
+        else:
+            pending.update = update
+        pending.entity_values.update(update.entity_values)
+        pending.binary_entity_values.update(update.binary_entity_values)
+        if update.events:
+            pending.events.update(update.events)
+
+    def forget(self, address: str) -> None:
+        """Drop the pending and emitted values of a device."""
+        self._pending.pop(address, None)
+        self._emitted.pop(address, None)
+
+    def flush(self) -> FleetChanges:
+        """Emit and return the changes since the last flush."""
+        pending_devices, self._pending = self._pending, {}
+        changes: FleetChanges = {}
+        for address, pending in pending_devices.items():
+            if (emitted := self._emitted.get(address)) is None:
+                emitted = self._emitted[address] = {}
+            entity_values = {
+                device_key: value
+                for device_key, value in pending.entity_values.items()
+                if emitted.get(device_key, _MISSING) != value.native_value
+            }
+            binary_entity_values = {
+                device_key: value
+                for device_key, value in pending.binary_entity_values.items()
+                if emitted.get(device_key, _MISSING) != value.native_value
+            }
+            if not (entity_values or binary_entity_values or pending.events):
+                continue
+            for values in (entity_values, binary_entity_values):
+                for device_key, value in values.items():
+                    emitted[device_key] = value.native_value
+            update = pending.update
+            changes[address] = SensorUpdate(
+                title=update.title,
+                devices=dict(update.devices),
+                entity_descriptions={
+                    device_key: update.entity_descriptions[device_key]
+                    for device_key in entity_values
+                    if device_key in update.entity_descriptions
+                },
+                entity_values=entity_values,
+                binary_entity_descriptions={
+                    device_key: update.binary_entity_descriptions[device_key]
+                    for device_key in binary_entity_values
+                    if device_key in update.binary_entity_descriptions
+                },
+                binary_entity_values=binary_entity_values,
+                events=pending.events,
+            )
+        if changes:
+            for callback in self._callbacks:
+                callback(changes)
+        return changes
+
+    async def run(self) -> None:
+        """Flush every ``interval`` seconds until cancelled."""
+        while True:
+            await asyncio.sleep(self._interval)
+            self.flush()
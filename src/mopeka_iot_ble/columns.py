@@ -0,0 +1,167 @@
+"""Columnar store of the latest state of every device of a fleet.
+
+MIT License applies.
+"""
+
+from __future__ import annotations
+
+import importlib
+import math
+from array import array
+from typing import Any
+
+from .models import MediumType, MopekaReading
+from .snapshot import MEDIUM_IDS, MEDIUMS
+
+DEFAULT_CAPACITY = 1024
+
+# Column name, array typecode and the value of a device not seen yet.
+COLUMNS: tuple[tuple[str, str, float], ...] = (
+    ("tank_level", "f", math.nan),
+    ("temperature", "b", 0),
+    ("battery_voltage", "f", math.nan),
+    ("reading_quality", "B", 0),
+    ("last_seen", "d", 0.0),
+    ("medium", "B", 0),
+)
+
+
+class FleetColumns:
+    """Keep the latest reading of every device in contiguous columns.
+
+    The store is a reading callback. Every device gets a dense ID, the
+    index of its row in each column, and a reading overwrites that row
+    in place. A device takes about 20 bytes, so 100k devices fit in a
+    couple of MB, and fleet wide statistics and exports work on whole
+    columns instead of one object per device.
+
+    Columns hold the tank level in mm (NaN until a level was read;
+    readings without a level keep the last one), the temperature in °C,
+    the battery voltage, the reading quality, the time last seen and the
+    medium as its position in ``MediumType``. Temperatures and reading
+    qualities outside the range of their column are clamped to it.
+
+    Columns are allocated with spare capacity and replaced by larger
+    copies when full, never resized in place, so views handed out by
+    ``column`` and ``numpy_columns`` stay valid but stop following the
+    store once it grew. Removing a device moves the last row into its
+    place, which changes the ID of the last device.
+    """
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY) -> None:
+        self._count = 0
+        self._capacity = 0
+        self._ids: dict[str, int] = {}
+        self._addresses: list[str] = []
+        self._columns: dict[str, array[Any]] = {
+            name: array(typecode) for name, typecode, _ in COLUMNS
+        }
+        self._grow(max(1, capacity))
+
+    def __len__(self) -> int:
+        """Return the number of devices."""
+        return self._count
+
+    def __contains__(self, address: object) -> bool:
+        """Return True if a device is stored."""
+        return address in self._ids
+
+    @property
+    def addresses(self) -> list[str]:
+        """Return the address of every device, indexed by device ID."""
+        return list(self._addresses)
+
+    def device_id(self, address: str) -> int | None:
+        """Return the device ID of an address."""
+        return self._ids.get(address)
+
+    def _grow(self, capacity: int) -> None:
+        count = self._count
+        for name, typecode, empty in COLUMNS:
+            column = array(typecode, [empty]) * capacity
+            column[:count] = self._columns[name][:count]
+            self._columns[name] = column
+        self._capacity = capacity
+
+    def _add(self, address: str) -> int:
+        if self._count == self._capacity:
+            self._grow(self._capacity * 2)
+        device_id = self._ids[address] = self._count
+        self._addresses.append(address)
+        self._count += 1
+        return device_id
+
+    def __call__(self, reading: MopekaReading) -> None:
+        """Store a reading."""
+        self.update(
+            reading.address,
+            reading.timestamp,
+            reading.tank_level,
+            reading.temperature,
+            reading.battery_voltage,
+            reading.reading_quality,
+            reading.medium,
+        )
+
+    def update(
+        self,
+        address: str,
+        timestamp: float,
+        tank_level: float | None,
+        temperature: int,
+        battery_voltage: float,
+        reading_quality: int,
+        medium: MediumType,
+    ) -> int:
+        """Overwrite the row of a device and return its device ID."""
+        if (device_id := self._ids.get(address)) is None:
+            device_id = self._add(address)
+        columns = self._columns
+        if tank_level is not None:
+            columns["tank_level"][device_id] = tank_level
+        columns["temperature"][device_id] = max(-128, min(127, temperature))
+        columns["battery_voltage"][device_id] = battery_voltage
+        columns["reading_quality"][device_id] = max(0, min(255, reading_quality))
+        columns["last_seen"][device_id] = timestamp
+        columns["medium"][device_id] = MEDIUM_IDS[medium]
+        return device_id
+
+    def remove(self, address: str) -> None:
+        """Remove a device, moving the last device into its row."""
+        if (device_id := self._ids.pop(address, None)) is None:
+            return
+        last = self._count - 1
+        last_address = self._addresses.pop()
+        if device_id != last:
+            for column in self._columns.values():
+                column[device_id] = column[last]
+            self._addresses[device_id] = last_address
+            self._ids[last_address] = device_id
+        for name, _, empty in COLUMNS:
+            self._columns[name][last] = empty
+        self._count = last
+
+    def row(self, address: str) -> dict[str, float | MediumType] | None:
+        """Return the stored values of a device."""
+        if (device_id := self._ids.get(address)) is None:
+            return None
+        row: dict[str, float | MediumType] = {
+            name: column[device_id] for name, column in self._columns.items()
+        }
+        row["medium"] = MEDIUMS[self._columns["medium"][device_id]]
+        return row
+
+    def column(self, name: str) -> memoryview:
+        """Return a view of a column, one value per device ID."""
+        return memoryview(self._columns[name])[: self._count]
+
+    def numpy_columns(self) -> dict[str, Any]:
+        """Return NumPy arrays viewing the columns without copying.
+
+        Requires NumPy, which is not a dependency of this package.
+        """
+        numpy = importlib.import_module("numpy")
+        return {
+            name: numpy.frombuffer(column, dtype=column.typecode)[: self._count]
+            for name, column in self._columns.items()
+        }
@@ -0,0 +1,188 @@
+"""Per-address tank configuration loaded from a file and reloaded on change.
+
+The file is JSON::
+
+    {
+        "default": {"medium": "propane"},
+        "devices": {
+            "AA:BB:CC:DD:EE:FF": {
+                "medium": "fresh_water",
+                "tank_height": 480,
+                "level_offset": 12,
+                "level_deadband": 2
+            }
+        }
+    }
+
+Device entries inherit the fields they leave out from the default.
+Addresses are matched without regard to case.
+
+MIT License applies.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import dataclasses
+import json
+import logging
+import os
+from collections.abc import Callable
+from typing import Any
+
+from .models import MediumType, TankConfig
+
+_LOGGER = logging.getLogger(__name__)
+
+DEFAULT_POLL_INTERVAL = 1.0
+
+ConfigChangeCallback = Callable[[frozenset[str] | None], None]
+
+_FIELDS = frozenset(field.name for field in dataclasses.fields(TankConfig))
+# Fields that may be null rather than a number.
+_OPTIONAL_FIELDS = frozenset(("tank_height",))
+
+
+def _object(value: Any, name: str) -> dict[str, Any]:
+    if not isinstance(value, dict):
+        raise ValueError(f"{name} must be a JSON object")
+    return value
+
+
+def _tank_config(entry: Any, base: TankConfig, name: str) -> TankConfig:
+    """Build a tank config from a JSON object, defaulting to ``base``."""
+    entry = _object(entry, name)
+    if unknown := entry.keys() - _FIELDS:
+        raise ValueError(f"Unknown tank config fields: {', '.join(sorted(unknown))}")
+    fields: dict[str, Any] = {}
+    for field, value in entry.items():
+        if field == "medium":
+            if not isinstance(value, str):
+                raise ValueError(f"{name}: medium must be a string")
+            fields[field] = MediumType(value)
+        elif value is None and field in _OPTIONAL_FIELDS:
+            fields[field] = None
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            fields[field] = float(value)
+        else:
+            raise ValueError(f"{name}: {field} must be a number")
+    return dataclasses.replace(base, **fields)
+
+
+class TankConfigStore:
+    """Tank configuration of every address, kept in sync with a file.
+
+    ``poll`` only stats the file, so it can be called often; the file is
+    read again when its modification time or size changed. A reload
+    parses the whole file before anything is swapped in, so readers see
+    either the old or the new configuration and a broken file leaves the
+    old one in place. Change callbacks get the addresses whose entry
+    changed, or None when the default changed and any address may be
+    affected.
+    """
+
+    def __init__(
+        self, path: str | os.PathLike[str], default: TankConfig | None = None
+    ) -> None:
+        self._path = path
+        self._base = TankConfig() if default is None else default
+        # Default and entries are swapped together as one tuple.
+        self._state: tuple[TankConfig, dict[str, TankConfig]] = (self._base, {})
+        self._stat: tuple[int, int] | None = None
+        self._change_callbacks: tuple[ConfigChangeCallback, ...] = ()
+        self.load()
+
+    def __len__(self) -> int:
+        """Return the number of configured addresses."""
+        return len(self._state[1])
+
+    def __contains__(self, address: object) -> bool:
+        return isinstance(address, str) and address.upper() in self._state[1]
+
+    @property
+    def default(self) -> TankConfig:
+        """Return the configuration of addresses without an entry."""
+        return self._state[0]
+
+    def get(self, address: str) -> TankConfig:
+        """Return the configuration of an address."""
+        default, configs = self._state
+        return configs.get(address.upper(), default)
+
+    def register_change_callback(
+        self, callback: ConfigChangeCallback
+    ) -> Callable[[], None]:
+        """Call back after a reload changed the configuration.
+
+        Returns a function that removes the callback again.
+        """
+        self._change_callbacks = (*self._change_callbacks, callback)
+
+        def _remove() -> None:
+            self._change_callbacks = tuple(
+                cb for cb in self._change_callbacks if cb is not callback
+            )
+
+        return _remove
+
+    def _file_stat(self) -> tuple[int, int] | None:
+        try:
+            stat = os.stat(self._path)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def poll(self) -> bool:
+        """Reload the file if it changed and return True if it was reloaded."""
+        if (stat := self._file_stat()) == self._stat:
+            return False
+        try:
+            self.load()
+        except (OSError, ValueError) as ex:
+            _LOGGER.warning(
+                "Keeping the tank configuration, %s is invalid: %s", self._path, ex
+            )
+            # Do not parse the same broken file again on every poll.
+            self._stat = stat
+            return False
+        return True
+
+    def load(self) -> None:
+        """Read the file and apply the entries that changed.
+
+        A missing file is an empty configuration. Raises ValueError if
+        the file is not valid, leaving the current configuration.
+        """
+        stat = self._file_stat()
+        if stat is None:
+            data: dict[str, Any] = {}
+        else:
+            with open(self._path, encoding="utf-8") as file:
+                data = json.load(file)
+            if not isinstance(data, dict):
+                raise ValueError("Tank configuration must be a JSON object")
+        default = _tank_config(data.get("default", {}), self._base, "default")
+        configs = {
+            address.upper(): _tank_config(entry, default, f"devices[{address}]")
+            for address, entry in _object(data.get("devices", {}), "devices").items()
+        }
+        old_default, old_configs = self._state
+        self._state = (default, configs)
+        self._stat = stat
+        changed: frozenset[str] | None = None
+        if default == old_default:
+            changed = frozenset(
+                address
+                for address in configs.keys() | old_configs.keys()
+                if configs.get(address) != old_configs.get(address)
+            )
+            if not changed:
+                return
+        for callback in self._change_callbacks:
+            callback(changed)
+
+    async def watch(self, interval: float = DEFAULT_POLL_INTERVAL) -> None:
+        """Poll the file every ``interval`` seconds until cancelled."""
+        while True:
+            await asyncio.sleep(interval)
+            self.poll()
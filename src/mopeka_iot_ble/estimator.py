@@ -0,0 +1,308 @@
+"""Incremental tank consumption rate and time to empty estimation.
+
+MIT License applies.
+"""
+
+from __future__ import annotations
+
+import math
+import struct
+from collections import deque
+from typing import NamedTuple
+
+DEFAULT_WINDOW = 3 * 86400.0
+DEFAULT_BUCKET = 300.0
+DEFAULT_MIN_SAMPLES = 10
+DEFAULT_MIN_SPAN = 3600.0
+DEFAULT_MIN_QUALITY = 2
+DEFAULT_REFILL_THRESHOLD = 50.0
+DEFAULT_REFILL_CONFIRM = 2
+
+SECONDS_PER_DAY = 86400.0
+
+# origin, refills, open bucket index, count and sums, then the number
+# of closed samples and of pending refill readings, followed by that
+# many (time, level) pairs each.
+_STATE = struct.Struct("<dIqIddIH")
+_POINT = struct.Struct("<dd")
+
+
+class ConsumptionEstimate(NamedTuple):
+    """The fitted consumption of a tank.
+
+    ``consumption_rate`` is the level drop in mm per day (negative while
+    the level rises), ``time_to_empty`` the days until the fitted level
+    reaches zero (None if the tank is not draining), ``level`` the
+    fitted level in mm at the latest sample and ``samples`` the number
+    of time buckets fitted.
+    """
+
+    consumption_rate: float
+    time_to_empty: float | None
+    level: float
+    samples: int
+
+
+class _Regression:
+    """Running sums for a windowed least squares fit of level over time.
+
+    Readings are averaged per time bucket. Closed buckets are kept as
+    one (mean time, mean level) sample each; the open bucket is only
+    summed up and joins the fit as a provisional sample.
+    """
+
+    __slots__ = (
+        "bucket",
+        "bucket_count",
+        "bucket_sum_t",
+        "bucket_sum_y",
+        "origin",
+        "pending",
+        "samples",
+        "sum_t",
+        "sum_tt",
+        "sum_ty",
+        "sum_y",
+    )
+
+    def __init__(self, origin: float) -> None:
+        # Times are kept relative to the first sample so the sums of
+        # squares stay small enough to not lose precision.
+        self.origin = origin
+        self.samples: deque[tuple[float, float]] = deque()
+        self.sum_t = 0.0
+        self.sum_y = 0.0
+        self.sum_tt = 0.0
+        self.sum_ty = 0.0
+        self.bucket = -1
+        self.bucket_count = 0
+        self.bucket_sum_t = 0.0
+        self.bucket_sum_y = 0.0
+        # Readings that jumped above the fit, waiting to be confirmed
+        # as a refill.
+        self.pending: list[tuple[float, float]] = []
+
+    def __len__(self) -> int:
+        return len(self.samples) + (self.bucket_count > 0)
+
+    def add(self, t: float, y: float) -> None:
+        self.samples.append((t, y))
+        self.sum_t += t
+        self.sum_y += y
+        self.sum_tt += t * t
+        self.sum_ty += t * y
+
+    def pop_oldest(self) -> None:
+        t, y = self.samples.popleft()
+        self.sum_t -= t
+        self.sum_y -= y
+        self.sum_tt -= t * t
+        self.sum_ty -= t * y
+
+    def add_reading(self, t: float, y: float, bucket: float) -> None:
+        """Add a reading to its bucket, closing the open one if it ended."""
+        if (index := math.floor(t / bucket)) != self.bucket:
+            if count := self.bucket_count:
+                self.add(self.bucket_sum_t / count, self.bucket_sum_y / count)
+            self.bucket = index
+            self.bucket_count = 0
+            self.bucket_sum_t = 0.0
+            self.bucket_sum_y = 0.0
+        self.bucket_count += 1
+        self.bucket_sum_t += t
+        self.bucket_sum_y += y
+
+    def first(self) -> float:
+        """Return the time of the oldest sample."""
+        if self.samples:
+            return self.samples[0][0]
+        return self.bucket_sum_t / self.bucket_count
+
+    def last(self) -> float:
+        """Return the level of the newest sample."""
+        if count := self.bucket_count:
+            return self.bucket_sum_y / count
+        return self.samples[-1][1]
+
+    def fit(self) -> tuple[float, float] | None:
+        """Return (slope, intercept) or None if all samples share a time."""
+        n = len(self.samples)
+        sum_t = self.sum_t
+        sum_y = self.sum_y
+        sum_tt = self.sum_tt
+        sum_ty = self.sum_ty
+        if count := self.bucket_count:
+            t = self.bucket_sum_t / count
+            y = self.bucket_sum_y / count
+            n += 1
+            sum_t += t
+            sum_y += y
+            sum_tt += t * t
+            sum_ty += t * y
+        denominator = n * sum_tt - sum_t * sum_t
+        if denominator <= 0:
+            return None
+        slope = (n * sum_ty - sum_t * sum_y) / denominator
+        return slope, (sum_y - slope * sum_t) / n
+
+
+class ConsumptionEstimator:
+    """Fit the tank level over a sliding time window per device.
+
+    Readings are averaged into ``bucket`` second buckets before they are
+    fitted, so the window keeps the same number of samples however often
+    a sensor advertises and at most ``window / bucket`` of them per
+    device. Adding a sample and dropping the ones that fell out of the
+    window are O(1) each: only the running sums of the regression change.
+    Samples below ``min_quality`` are ignored. The tank level is already
+    compensated for the speed of sound at the reported temperature, so
+    the fit works on that rather than the raw echo time.
+
+    A level more than ``refill_threshold`` mm above the fitted line only
+    counts as a refill once ``refill_confirm`` readings in a row agree,
+    so a single bad echo is not taken for one; the refill starts a new
+    fit from the first of them. Jumps that are not confirmed are
+    dropped.
+    """
+
+    def __init__(
+        self,
+        window: float = DEFAULT_WINDOW,
+        min_samples: int = DEFAULT_MIN_SAMPLES,
+        min_span: float = DEFAULT_MIN_SPAN,
+        min_quality: int = DEFAULT_MIN_QUALITY,
+        refill_threshold: float = DEFAULT_REFILL_THRESHOLD,
+        max_samples: int | None = None,
+        bucket: float = DEFAULT_BUCKET,
+        refill_confirm: int = DEFAULT_REFILL_CONFIRM,
+    ) -> None:
+        self._window = window
+        self._bucket = bucket
+        self._min_samples = min_samples
+        self._min_span = min_span
+        self._min_quality = min_quality
+        self._refill_threshold = refill_threshold
+        self._refill_confirm = refill_confirm
+        if max_samples is None:
+            max_samples = math.ceil(window / bucket) + 1
+        self._max_samples = max_samples
+        self._regressions: dict[str, _Regression] = {}
+        self._refills: dict[str, int] = {}
+
+    def refills(self, address: str) -> int:
+        """Return how many refills were detected for a device."""
+        return self._refills.get(address, 0)
+
+    def forget(self, address: str) -> None:
+        """Drop the samples of a device."""
+        self._regressions.pop(address, None)
+        self._refills.pop(address, None)
+
+    def dump_state(self, address: str) -> bytes | None:
+        """Return the samples of a device for a snapshot."""
+        if (regression := self._regressions.get(address)) is None:
+            return None
+        pack = _POINT.pack
+        return b"".join(
+            (
+                _STATE.pack(
+                    regression.origin,
+                    min(self._refills.get(address, 0), 0xFFFFFFFF),
+                    regression.bucket,
+                    regression.bucket_count,
+                    regression.bucket_sum_t,
+                    regression.bucket_sum_y,
+                    len(regression.samples),
+                    len(regression.pending),
+                ),
+                *(pack(t, y) for t, y in regression.samples),
+                *(pack(t, y) for t, y in regression.pending),
+            )
+        )
+
+    def load_state(self, address: str, data: bytes) -> None:
+        """Restore the samples of a device from ``dump_state``."""
+        try:
+            (
+                origin,
+                refills,
+                bucket,
+                bucket_count,
+                bucket_sum_t,
+                bucket_sum_y,
+                sample_count,
+                pending_count,
+            ) = _STATE.unpack_from(data)
+            state_size = _STATE.size
+            points = list(_POINT.iter_unpack(data[state_size:]))
+        except struct.error as ex:
+            raise ValueError(f"Corrupt consumption state: {ex}") from ex
+        if len(points) != sample_count + pending_count:
+            raise ValueError("Corrupt consumption state: wrong number of samples")
+        regression = self._regressions[address] = _Regression(origin)
+        for t, y in points[:sample_count]:
+            regression.add(t, y)
+        regression.bucket = bucket
+        regression.bucket_count = bucket_count
+        regression.bucket_sum_t = bucket_sum_t
+        regression.bucket_sum_y = bucket_sum_y
+        regression.pending = points[sample_count:]
+        if refills:
+            self._refills[address] = refills
+        else:
+            self._refills.pop(address, None)
+
+    def _is_refill(self, regression: _Regression, t: float, tank_level: float) -> bool:
+        if (fit := regression.fit()) is not None:
+            slope, intercept = fit
+            expected = intercept + slope * t
+        else:
+            expected = regression.last()
+        return tank_level - expected > self._refill_threshold
+
+    def update(
+        self,
+        address: str,
+        timestamp: float,
+        tank_level: float | None,
+        reading_quality: int,
+    ) -> ConsumptionEstimate | None:
+        """Add a sample and return the estimate once there is enough data."""
+        if tank_level is None or reading_quality < self._min_quality:
+            return None
+        bucket = self._bucket
+        if (regression := self._regressions.get(address)) is None:
+            regression = self._regressions[address] = _Regression(timestamp)
+        elif self._is_refill(regression, timestamp - regression.origin, tank_level):
+            pending = regression.pending
+            pending.append((timestamp, tank_level))
+            if len(pending) < self._refill_confirm:
+                return None
+            self._refills[address] = self._refills.get(address, 0) + 1
+            regression = self._regressions[address] = _Regression(pending[0][0])
+            for pending_timestamp, pending_level in pending[:-1]:
+                regression.add_reading(
+                    pending_timestamp - regression.origin, pending_level, bucket
+                )
+        else:
+            regression.pending.clear()
+        t = timestamp - regression.origin
+        regression.add_reading(t, tank_level, bucket)
+        samples = regression.samples
+        oldest = t - self._window
+        max_samples = self._max_samples
+        while samples and (samples[0][0] < oldest or len(samples) >= max_samples):
+            regression.pop_oldest()
+        if (
+            len(regression) < self._min_samples
+            or t - regression.first() < self._min_span
+            or (fit := regression.fit()) is None
+        ):
+            return None
+        slope, intercept = fit
+        level = intercept + slope * t
+        consumption_rate = -slope * SECONDS_PER_DAY
+        time_to_empty = max(0.0, level) / consumption_rate if slope < 0 else None
+        return ConsumptionEstimate(
+            consumption_rate, time_to_empty, level, len(regression)
+        )
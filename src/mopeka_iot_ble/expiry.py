@@ -0,0 +1,253 @@
+"""Last seen tracking and expiry of devices that stopped advertising.
+
+MIT License applies.
+"""
+
+from __future__ import annotations
+
+import math
+import time
+from collections.abc import Callable
+
+DEFAULT_STALE_AFTER = 900.0
+DEFAULT_EVICT_AFTER = 86400.0
+DEFAULT_RESOLUTION = 1.0
+
+SLOT_BITS = 6
+SLOTS = 1 << SLOT_BITS
+LEVELS = 4
+
+_SLOT_MASK = SLOTS - 1
+
+
+class TimerWheel:
+    """Hierarchical timer wheel of keyed deadlines.
+
+    Time is cut into ticks of ``resolution`` seconds. The first wheel has
+    a slot per tick for the next 64 ticks, each further wheel a slot per
+    64 slots of the one below; when a wheel wraps, the next slot of the
+    wheel above is spread over it. Scheduling, cancelling and every tick
+    are O(1) however many timers there are. Deadlines beyond the last
+    wheel are parked in its furthest slot until they come within range.
+
+    The wheel starts at ``now``, ``time.monotonic()`` by default, and
+    deadlines use the same clock.
+    """
+
+    def __init__(
+        self, resolution: float = DEFAULT_RESOLUTION, now: float | None = None
+    ) -> None:
+        if now is None:
+            now = time.monotonic()
+        self._resolution = resolution
+        self._wheels: list[list[dict[str, int]]] = [
+            [{} for _ in range(SLOTS)] for _ in range(LEVELS)
+        ]
+        self._locations: dict[str, tuple[int, int]] = {}
+        self._tick = math.floor(now / resolution)
+
+    def __len__(self) -> int:
+        """Return the number of pending timers."""
+        return len(self._locations)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._locations
+
+    def _insert(self, key: str, deadline: int, tick: int) -> None:
+        delta = deadline - tick
+        level = 0
+        while delta >= SLOTS << (SLOT_BITS * level) and level < LEVELS - 1:
+            level += 1
+        slot_deadline = deadline
+        if delta >= SLOTS << (SLOT_BITS * level):
+            # Past the last wheel, park it in the slot that comes round last.
+            slot_deadline = tick + (SLOTS - 1 << SLOT_BITS * level)
+        slot = (slot_deadline >> SLOT_BITS * level) & _SLOT_MASK
+        self._wheels[level][slot][key] = deadline
+        self._locations[key] = (level, slot)
+
+    def schedule(self, key: str, deadline: float) -> None:
+        """Schedule or move the timer of a key to an absolute time."""
+        self.cancel(key)
+        tick = self._tick
+        self._insert(key, max(tick + 1, math.ceil(deadline / self._resolution)), tick)
+
+    def cancel(self, key: str) -> None:
+        """Cancel the timer of a key if there is one."""
+        if (location := self._locations.pop(key, None)) is not None:
+            level, slot = location
+            del self._wheels[level][slot][key]
+
+    def advance(self, now: float) -> list[str]:
+        """Advance the wheel to ``now`` and return the keys that are due."""
+        target = math.floor(now / self._resolution)
+        tick = self._tick
+        wheels = self._wheels
+        locations = self._locations
+        due: list[str] = []
+        while tick < target:
+            if not locations:
+                tick = target
+                break
+            tick += 1
+            index = tick & _SLOT_MASK
+            level = 0
+            # Spread the next slot of each wheel above that comes round.
+            while index == 0 and level < LEVELS - 1:
+                level += 1
+                index = (tick >> SLOT_BITS * level) & _SLOT_MASK
+                cascading = wheels[level][index]
+                wheels[level][index] = {}
+                for key, deadline in cascading.items():
+                    self._insert(key, deadline, tick)
+            slot = wheels[0][tick & _SLOT_MASK]
+            if slot:
+                wheels[0][tick & _SLOT_MASK] = {}
+                for key in slot:
+                    del locations[key]
+                    due.append(key)
+        self._tick = tick
+        return due
+
+
+class DeviceExpiry:
+    """Mark devices stale and evict them when they stop advertising.
+
+    Call ``seen`` for every advertisement and ``advance`` periodically,
+    for example once a second. A device that was not seen for
+    ``stale_after`` seconds is reported stale, one that was not seen for
+    ``evict_after`` seconds is evicted and forgotten. A stale device that
+    advertises again is reported available.
+
+    Seeing a device that is not stale only stores the time: its timer is
+    left where it is and moved forward when it fires, so a busy device
+    costs a dict store per advertisement and one timer move per
+    ``stale_after``. Times default to ``time.monotonic()``; pass ``now``
+    to start the clock elsewhere when feeding times of your own.
+    """
+
+    def __init__(
+        self,
+        stale_after: float = DEFAULT_STALE_AFTER,
+        evict_after: float = DEFAULT_EVICT_AFTER,
+        resolution: float = DEFAULT_RESOLUTION,
+        now: float | None = None,
+    ) -> None:
+        if evict_after < stale_after:
+            raise ValueError("evict_after must not be shorter than stale_after")
+        self._stale_after = stale_after
+        self._evict_after = evict_after
+        self._wheel = TimerWheel(resolution, now)
+        self._last_seen: dict[str, float] = {}
+        self._stale: set[str] = set()
+        self._stale_callbacks: tuple[Callable[[str], None], ...] = ()
+        self._available_callbacks: tuple[Callable[[str], None], ...] = ()
+        self._evict_callbacks: tuple[Callable[[str], None], ...] = ()
+
+    def __len__(self) -> int:
+        """Return the number of tracked devices."""
+        return len(self._last_seen)
+
+    def __contains__(self, address: object) -> bool:
+        return address in self._last_seen
+
+    def register_stale_callback(
+        self, callback: Callable[[str], None]
+    ) -> Callable[[], None]:
+        """Call back with the address of a device that went stale.
+
+        Returns a function that removes the callback again.
+        """
+        self._stale_callbacks = (*self._stale_callbacks, callback)
+
+        def _remove() -> None:
+            self._stale_callbacks = tuple(
+                cb for cb in self._stale_callbacks if cb is not callback
+            )
+
+        return _remove
+
+    def register_available_callback(
+        self, callback: Callable[[str], None]
+    ) -> Callable[[], None]:
+        """Call back with the address of a stale device that came back.
+
+        Returns a function that removes the callback again.
+        """
+        self._available_callbacks = (*self._available_callbacks, callback)
+
+        def _remove() -> None:
+            self._available_callbacks = tuple(
+                cb for cb in self._available_callbacks if cb is not callback
+            )
+
+        return _remove
+
+    def register_evict_callback(
+        self, callback: Callable[[str], None]
+    ) -> Callable[[], None]:
+        """Call back with the address of a device that was evicted.
+
+        Returns a function that removes the callback again.
+        """
+        self._evict_callbacks = (*self._evict_callbacks, callback)
+
+        def _remove() -> None:
+            self._evict_callbacks = tuple(
+                cb for cb in self._evict_callbacks if cb is not callback
+            )
+
+        return _remove
+
+    def last_seen(self, address: str) -> float | None:
+        """Return when a device was last seen."""
+        return self._last_seen.get(address)
+
+    def is_stale(self, address: str) -> bool:
+        """Return True if a device is stale."""
+        return address in self._stale
+
+    def seen(self, address: str, now: float | None = None) -> None:
+        """Record that a device advertised."""
+        if now is None:
+            now = time.monotonic()
+        last_seen = self._last_seen
+        known = address in last_seen
+        if known and now < last_seen[address]:
+            return
+        last_seen[address] = now
+        if not known:
+            self._wheel.schedule(address, now + self._stale_after)
+        elif address in self._stale:
+            self._stale.discard(address)
+            self._wheel.schedule(address, now + self._stale_after)
+            for callback in self._available_callbacks:
+                callback(address)
+
+    def forget(self, address: str) -> None:
+        """Stop tracking a device without calling back."""
+        self._wheel.cancel(address)
+        self._last_seen.pop(address, None)
+        self._stale.discard(address)
+
+    def advance(self, now: float | None = None) -> None:
+        """Mark and evict the devices whose time ran out by ``now``."""
+        if now is None:
+            now = time.monotonic()
+        wheel = self._wheel
+        for address in wheel.advance(now):
+            last_seen = self._last_seen[address]
+            if address in self._stale:
+                if (deadline := last_seen + self._evict_after) > now:
+                    wheel.schedule(address, deadline)
+                    continue
+                self.forget(address)
+                for callback in self._evict_callbacks:
+                    callback(address)
+            elif (deadline := last_seen + self._stale_after) > now:
+                wheel.schedule(address, deadline)
+            else:
+                self._stale.add(address)
+                wheel.schedule(address, last_seen + self._evict_after)
+                for callback in self._stale_callbacks:
+                    callback(address)
@@ -0,0 +1,209 @@
+"""Buffered streaming export of decoded Mopeka IOT readings.
+
+MIT License applies.
+"""
+
+from __future__ import annotations
+
+import csv
+import json
+import os
+import time
+from enum import Enum
+from pathlib import Path
+from typing import IO, Any
+
+from .models import MediumType, MopekaReading
+
+DEFAULT_BUFFER_SIZE = 1 << 20
+DEFAULT_FLUSH_INTERVAL = 5.0
+
+EXPORT_FIELDS = (
+    "timestamp",
+    "address",
+    "source",
+    "rssi",
+    "model_id",
+    "model",
+    "name",
+    "medium",
+    "battery_voltage",
+    "battery_percentage",
+    "temperature",
+    "button_pressed",
+    "tank_level_raw",
+    "tank_level",
+    "reading_quality",
+    "accelerometer_x",
+    "accelerometer_y",
+    "raw",
+)
+
+
+class ExportFormat(Enum):
+    """Enumeration of export file formats."""
+
+    CSV = "csv"
+    NDJSON = "ndjson"
+
+
+def reading_to_row(reading: MopekaReading) -> tuple[Any, ...]:
+    """Return the export row for a reading, ordered as EXPORT_FIELDS."""
+    return (
+        reading.timestamp,
+        reading.address,
+        reading.source,
+        reading.rssi,
+        reading.model_id,
+        reading.model,
+        reading.name,
+        reading.medium.value,
+        reading.battery_voltage,
+        reading.battery_percentage,
+        reading.temperature,
+        reading.button_pressed,
+        reading.tank_level_raw,
+        reading.tank_level,
+        reading.reading_quality,
+        reading.accelerometer_x,
+        reading.accelerometer_y,
+        reading.raw.hex(),
+    )
+
+
+def reading_to_json(reading: MopekaReading) -> str:
+    """Return a reading as a compact JSON object keyed by EXPORT_FIELDS."""
+    return json.dumps(
+        dict(zip(EXPORT_FIELDS, reading_to_row(reading))), separators=(",", ":")
+    )
+
+
+def reading_from_json(line: str | bytes) -> MopekaReading:
+    """Rebuild a reading from the output of ``reading_to_json``."""
+    fields = json.loads(line)
+    fields["medium"] = MediumType(fields["medium"])
+    fields["raw"] = bytes.fromhex(fields["raw"])
+    return MopekaReading(**fields)
+
+
+class ReadingExporter:
+    """Write decoded readings to CSV or NDJSON through a large buffer.
+
+    The exporter is a reading callback, so it can be fed straight from
+    the parser::
+
+        exporter = ReadingExporter("readings.csv")
+        parser.register_reading_callback(exporter)
+
+    Lines are only handed to the operating system when the buffer fills
+    or, on a write, once ``flush_interval`` seconds passed since the last
+    flush. There is no timer: when readings stop coming the buffered
+    lines stay in memory, so callers that need them on disk call
+    ``flush`` themselves, for example periodically or when the fleet
+    goes quiet. The active file is rotated to
+    ``<path>.<n>`` once it grows past ``max_bytes`` or is older than
+    ``rotate_interval`` seconds.
+    """
+
+    def __init__(
+        self,
+        path: str | os.PathLike[str],
+        export_format: ExportFormat = ExportFormat.CSV,
+        buffer_size: int = DEFAULT_BUFFER_SIZE,
+        flush_interval: float | None = DEFAULT_FLUSH_INTERVAL,
+        max_bytes: int | None = None,
+        rotate_interval: float | None = None,
+    ) -> None:
+        self._path = Path(path)
+        self._format = export_format
+        self._buffer_size = buffer_size
+        self._flush_interval = flush_interval
+        self._max_bytes = max_bytes
+        self._rotate_interval = rotate_interval
+        self._rotations = 0
+        self._file: IO[str] | None = None
+        self._writer: Any = None
+        self._size = 0
+        self._opened_at = 0.0
+        self._last_flush = 0.0
+
+    @property
+    def path(self) -> Path:
+        """Return the path of the active file."""
+        return self._path
+
+    @property
+    def rotated_paths(self) -> list[Path]:
+        """Return the paths of files rotated out so far."""
+        return [self._rotated_path(n) for n in range(1, self._rotations + 1)]
+
+    def __call__(self, reading: MopekaReading) -> None:
+        """Export a reading."""
+        self.write(reading)
+
+    def __enter__(self) -> ReadingExporter:
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def write(self, reading: MopekaReading) -> None:
+        """Export a reading."""
+        now = time.monotonic()
+        if self._file is None:
+            self._open(now)
+        elif (self._max_bytes is not None and self._size >= self._max_bytes) or (
+            self._rotate_interval is not None
+            and now - self._opened_at >= self._rotate_interval
+        ):
+            self._rotate(now)
+        if self._format is ExportFormat.CSV:
+            self._size += self._writer.writerow(reading_to_row(reading))
+        else:
+            assert self._file is not None  # nosec
+            self._size += self._file.write(reading_to_json(reading) + "\n")
+        if (
+            self._flush_interval is not None
+            and now - self._last_flush >= self._flush_interval
+        ):
+            self.flush()
+
+    def flush(self) -> None:
+        """Hand buffered lines to the operating system."""
+        if self._file is not None:
+            self._file.flush()
+        self._last_flush = time.monotonic()
+
+    def close(self) -> None:
+        """Flush and close the active file."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            self._writer = None
+
+    def _open(self, now: float) -> None:
+        self._file = open(  # noqa: SIM115
+            self._path,
+            "a",
+            buffering=self._buffer_size,
+            encoding="utf-8",
+            newline="",
+        )
+        self._size = self._path.stat().st_size
+        self._opened_at = now
+        self._last_flush = now
+        if self._format is ExportFormat.CSV:
+            self._writer = csv.writer(self._file, lineterminator="\n")
+            if not self._size:
+                self._size += self._writer.writerow(EXPORT_FIELDS)
+
+    def _rotated_path(self, number: int) -> Path:
+        return self._path.with_name(f"{self._path.name}.{number}")
+
+    def _rotate(self, now: float) -> None:
+        self.close()
+        self._rotations += 1
+        while (target := self._rotated_path(self._rotations)).exists():
+            self._rotations += 1
+        self._path.rename(target)
+        self._open(now)
@@ -0,0 +1,317 @@
+"""Fleet of Mopeka IOT parsers keyed by address.
+
+The parser keeps the state of a single sensor, which is how Home
+Assistant uses it. Gateways that listen to many sensors at once can
+use the fleet to route each advertisement to the parser for its
+address.
+
+MIT License applies.
+"""
+
+from __future__ import annotations
+
+import time
+from collections.abc import Callable, Collection, Iterator
+from typing import NamedTuple
+
+from home_assistant_bluetooth import BluetoothServiceInfo
+from sensor_state_data import SensorUpdate
+
+from .battery import BatteryModel
+from .bus import SubscriptionBus
+from .coalesce import UpdateCoalescer
+from .config import TankConfigStore
+from .estimator import ConsumptionEstimator
+from .expiry import DeviceExpiry
+from .link import LinkTracker
+from .metrics import ParserMetrics
+from .models import MediumType, MopekaReading, RejectReason
+from .movement import MovementDetector
+from .parser import (
+    MOKPEKA_PRO_SERVICE_UUID,
+    MOPEKA_MANUFACTURER,
+    MopekaIOTBluetoothDeviceData,
+    select_entities,
+)
+from .sampling import RejectedPayloadSampler
+from .snapshot import decode_snapshot, encode_snapshot
+
+
+class RestoredDevice(NamedTuple):
+    """The state of a device restored from a snapshot."""
+
+    update: SensorUpdate
+    age: float
+
+
+class MopekaIOTFleet:
+    """Route advertisements to one parser per address."""
+
+    def __init__(
+        self,
+        medium_type: MediumType = MediumType.PROPANE,
+        mediums: dict[str, MediumType] | None = None,
+        metrics: ParserMetrics | None = None,
+        movement_detector: MovementDetector | None = None,
+        rejected_sampler: RejectedPayloadSampler | None = None,
+        bus: SubscriptionBus | None = None,
+        consumption_estimator: ConsumptionEstimator | None = None,
+        expiry: DeviceExpiry | None = None,
+        config: TankConfigStore | None = None,
+        link_tracker: LinkTracker | None = None,
+        coalescer: UpdateCoalescer | None = None,
+        battery_model: BatteryModel | None = None,
+        entities: Collection[str] | None = None,
+    ) -> None:
+        self._medium_type = medium_type
+        self._mediums = dict(mediums or {})
+        self._metrics = metrics
+        self._movement_detector = movement_detector
+        self._rejected_sampler = rejected_sampler
+        self._bus = bus
+        self._consumption_estimator = consumption_estimator
+        self._link_tracker = link_tracker
+        self._battery_model = battery_model
+        self._entities = select_entities(entities)
+        self._coalescer = coalescer
+        self._parsers: dict[str, MopekaIOTBluetoothDeviceData] = {}
+        self._reading_callbacks: tuple[Callable[[MopekaReading], None], ...] = ()
+        self._remove_callbacks: tuple[Callable[[str], None], ...] = ()
+        self._detachers: dict[str, Callable[[], None]] = {}
+        self._expiry = expiry
+        if expiry is not None:
+            expiry.register_evict_callback(self.remove)
+        self._config = config
+        if config is not None:
+            config.register_change_callback(self._apply_config)
+
+    def __len__(self) -> int:
+        """Return the number of known devices."""
+        return len(self._parsers)
+
+    def __iter__(self) -> Iterator[str]:
+        """Iterate over the addresses of known devices."""
+        return iter(self._parsers)
+
+    def __contains__(self, address: object) -> bool:
+        return address in self._parsers
+
+    @property
+    def bus(self) -> SubscriptionBus | None:
+        """Return the bus changes are published to."""
+        return self._bus
+
+    @property
+    def coalescer(self) -> UpdateCoalescer | None:
+        """Return the coalescer updates are merged into."""
+        return self._coalescer
+
+    @property
+    def expiry(self) -> DeviceExpiry | None:
+        """Return the tracker that evicts devices that stopped advertising."""
+        return self._expiry
+
+    @property
+    def metrics(self) -> ParserMetrics | None:
+        """Return the metrics shared by every parser in the fleet."""
+        return self._metrics
+
+    def parser(self, address: str) -> MopekaIOTBluetoothDeviceData | None:
+        """Return the parser for an address."""
+        return self._parsers.get(address)
+
+    def medium_type(self, address: str) -> MediumType:
+        """Return the medium used for an address."""
+        if self._config is not None:
+            return self._config.get(address).medium
+        return self._mediums.get(address, self._medium_type)
+
+    def remove(self, address: str) -> None:
+        """Forget a device along with the state kept for it.
+
+        Removal callbacks are called with the address, so consumers of
+        the readings can drop the device as well.
+        """
+        if self._parsers.pop(address, None) is None:
+            return
+        if (detach := self._detachers.pop(address, None)) is not None:
+            detach()
+        if self._movement_detector is not None:
+            self._movement_detector.forget(address)
+        if self._consumption_estimator is not None:
+            self._consumption_estimator.forget(address)
+        if self._link_tracker is not None:
+            self._link_tracker.forget(address)
+        if self._battery_model is not None:
+            self._battery_model.forget(address)
+        if self._coalescer is not None:
+            self._coalescer.forget(address)
+        if self._expiry is not None:
+            self._expiry.forget(address)
+        if self._bus is not None:
+            self._bus.forget(address)
+        for callback in self._remove_callbacks:
+            callback(address)
+
+    def register_remove_callback(
+        self, callback: Callable[[str], None]
+    ) -> Callable[[], None]:
+        """Call back with the address of a device that was removed.
+
+        Pass the ``remove`` or ``forget`` method of a reading consumer,
+        such as a ``TankLevelIndex`` or ``QualityTracker``, to keep it
+        from holding on to devices the fleet no longer knows. Returns a
+        function that removes the callback again.
+        """
+        self._remove_callbacks = (*self._remove_callbacks, callback)
+
+        def _remove() -> None:
+            self._remove_callbacks = tuple(
+                cb for cb in self._remove_callbacks if cb is not callback
+            )
+
+        return _remove
+
+    def register_reading_callback(
+        self, callback: Callable[[MopekaReading], None]
+    ) -> Callable[[], None]:
+        """Register a callback for readings from every device in the fleet.
+
+        Returns a function that removes the callback again.
+        """
+        if not self._reading_callbacks:
+            for address, parser in self._parsers.items():
+                self._attach(address, parser)
+        self._reading_callbacks = (*self._reading_callbacks, callback)
+
+        def _remove() -> None:
+            self._reading_callbacks = tuple(
+                cb for cb in self._reading_callbacks if cb is not callback
+            )
+            if not self._reading_callbacks:
+                for detach in self._detachers.values():
+                    detach()
+                self._detachers.clear()
+
+        return _remove
+
+    def _dispatch_reading(self, reading: MopekaReading) -> None:
+        for callback in self._reading_callbacks:
+            callback(reading)
+
+    def _attach(self, address: str, parser: MopekaIOTBluetoothDeviceData) -> None:
+        self._detachers[address] = parser.register_reading_callback(
+            self._dispatch_reading
+        )
+
+    def _create_parser(self, address: str) -> MopekaIOTBluetoothDeviceData:
+        parser = MopekaIOTBluetoothDeviceData(
+            self.medium_type(address),
+            movement_detector=self._movement_detector,
+            metrics=self._metrics,
+            rejected_sampler=self._rejected_sampler,
+            consumption_estimator=self._consumption_estimator,
+            tank_config=None if self._config is None else self._config.get(address),
+            link_tracker=self._link_tracker,
+            battery_model=self._battery_model,
+            entities=self._entities,
+        )
+        if self._reading_callbacks:
+            self._attach(address, parser)
+        self._parsers[address] = parser
+        return parser
+
+    def _apply_config(self, changed: frozenset[str] | None) -> None:
+        """Reconfigure the parsers whose tank configuration changed."""
+        if (config := self._config) is None:
+            return
+        parsers = self._parsers
+        for address in parsers.keys() if changed is None else changed:
+            if (parser := parsers.get(address)) is not None and (
+                tank_config := config.get(address)
+            ) != parser.tank_config:
+                parser.set_tank_config(tank_config)
+
+    def update(
+        self,
+        service_info: BluetoothServiceInfo,
+        timestamp: float | None = None,
+        medium: MediumType | None = None,
+    ) -> SensorUpdate | None:
+        """Update the device an advertisement came from.
+
+        ``timestamp`` and ``medium`` are passed on to the parser's
+        ``update``. Returns None without creating a parser when the
+        advertisement does not carry Mopeka manufacturer data and
+        service UUID; the manufacturer ID alone is Nordic's, shared by
+        any nRF based device.
+        """
+        if (parser := self._parsers.get(service_info.address)) is None:
+            if (
+                MOPEKA_MANUFACTURER not in service_info.manufacturer_data
+                or MOKPEKA_PRO_SERVICE_UUID not in service_info.service_uuids
+            ):
+                if (metrics := self._metrics) is not None:
+                    metrics.record_seen()
+                    metrics.record_rejected(RejectReason.NOT_MOPEKA)
+                if (sampler := self._rejected_sampler) is not None:
+                    sampler.offer(RejectReason.NOT_MOPEKA, service_info.address, b"")
+                return None
+            parser = self._create_parser(service_info.address)
+        update = parser.update(service_info, timestamp, medium)
+        if self._expiry is not None:
+            self._expiry.seen(service_info.address)
+        if self._bus is not None:
+            self._bus.publish(service_info.address, update)
+        if self._coalescer is not None:
+            self._coalescer.add(service_info.address, update)
+        return update
+
+    def render_metrics(self) -> str:
+        """Render the fleet metrics in the Prometheus text exposition format."""
+        metrics = self._metrics or ParserMetrics()
+        return metrics.render({"mopeka_fleet_devices": len(self._parsers)})
+
+    def snapshot(self) -> bytes:
+        """Return a compact snapshot of the last frame of every device."""
+        return encode_snapshot(
+            record
+            for parser in self._parsers.values()
+            if (record := parser.last_frame) is not None
+        )
+
+    def restore(
+        self, data: bytes, now: float | None = None
+    ) -> dict[str, RestoredDevice]:
+        """Restore devices from a snapshot.
+
+        Returns the restored state of each device along with the age of
+        the data in seconds, so stale values can be shown as such until
+        the device advertises again.
+        """
+        if now is None:
+            now = time.time()
+        monotonic = time.monotonic()
+        restored: dict[str, RestoredDevice] = {}
+        for record in decode_snapshot(data):
+            address = record.address
+            created = False
+            if (parser := self._parsers.get(address)) is None:
+                parser = self._create_parser(address)
+                created = True
+            if (update := parser.restore(record)) is None:
+                if created:
+                    # Do not keep a device for a frame that did not decode.
+                    del self._parsers[address]
+                    if (detach := self._detachers.pop(address, None)) is not None:
+                        detach()
+            else:
+                if self._bus is not None:
+                    self._bus.publish(address, update)
+                if self._coalescer is not None:
+                    self._coalescer.add(address, update)
+                age = max(0.0, now - record.timestamp)
+                restored[address] = RestoredDevice(update, age)
+                if self._expiry is not None:
+                    self._expiry.seen(address, monotonic - age)
+        return restored
@@ -0,0 +1,147 @@
+"""Fleet wide sorted index of the latest tank level per device.
+
+MIT License applies.
+"""
+
+from __future__ import annotations
+
+from bisect import bisect_left, bisect_right, insort
+from collections.abc import Callable
+from operator import itemgetter
+
+from .models import MediumType, MopekaReading
+
+GroupKey = tuple[MediumType | None, str | None]
+LevelFunction = Callable[[MopekaReading], float | None]
+
+_LEVEL = itemgetter(0)
+
+
+def tank_level_mm(reading: MopekaReading) -> float | None:
+    """Return the tank level in mm, the default indexed value."""
+    return reading.tank_level
+
+
+class TankLevelIndex:
+    """Keep the latest level of every device in sorted order.
+
+    The index is a reading callback. Each device is kept in four sorted
+    lists: all devices, its medium, its model, and its medium and model
+    together, so range and top-k queries for any of those groups are a
+    binary search plus a slice. Readings without a level (bad reading
+    quality) keep the last known level in the index.
+
+    By default the tank level in mm is indexed; pass ``level`` to index
+    something else derived from the reading, such as a percentage.
+    """
+
+    def __init__(self, level: LevelFunction = tank_level_mm) -> None:
+        self._level = level
+        self._devices: dict[str, tuple[float, MediumType, str]] = {}
+        self._groups: dict[GroupKey, list[tuple[float, str]]] = {}
+
+    def __len__(self) -> int:
+        """Return the number of indexed devices."""
+        return len(self._devices)
+
+    def __call__(self, reading: MopekaReading) -> None:
+        """Index a reading."""
+        if (level := self._level(reading)) is None:
+            return
+        self.set_level(reading.address, level, reading.medium, reading.model)
+
+    @staticmethod
+    def _group_keys(medium: MediumType, model: str) -> tuple[GroupKey, ...]:
+        return ((None, None), (medium, None), (None, model), (medium, model))
+
+    def set_level(
+        self, address: str, level: float, medium: MediumType, model: str
+    ) -> None:
+        """Set the level of a device."""
+        current = self._devices.get(address)
+        if current == (level, medium, model):
+            return
+        if current is not None:
+            self.remove(address)
+        self._devices[address] = (level, medium, model)
+        entry = (level, address)
+        groups = self._groups
+        for group_key in self._group_keys(medium, model):
+            if (group := groups.get(group_key)) is None:
+                groups[group_key] = [entry]
+            else:
+                insort(group, entry)
+
+    def remove(self, address: str) -> None:
+        """Remove a device from the index."""
+        if (current := self._devices.pop(address, None)) is None:
+            return
+        level, medium, model = current
+        entry = (level, address)
+        for group_key in self._group_keys(medium, model):
+            group = self._groups[group_key]
+            del group[bisect_left(group, entry)]
+            if not group:
+                del self._groups[group_key]
+
+    def level(self, address: str) -> float | None:
+        """Return the indexed level of a device."""
+        if (current := self._devices.get(address)) is None:
+            return None
+        return current[0]
+
+    def _group(
+        self, medium: MediumType | None, model: str | None
+    ) -> list[tuple[float, str]]:
+        return self._groups.get((medium, model), [])
+
+    def between(
+        self,
+        low: float,
+        high: float,
+        medium: MediumType | None = None,
+        model: str | None = None,
+    ) -> list[tuple[float, str]]:
+        """Return (level, address) with low <= level < high, lowest first."""
+        group = self._group(medium, model)
+        start = bisect_left(group, low, key=_LEVEL)
+        end = bisect_left(group, high, key=_LEVEL)
+        return group[start:end]
+
+    def below(
+        self,
+        threshold: float,
+        medium: MediumType | None = None,
+        model: str | None = None,
+    ) -> list[tuple[float, str]]:
+        """Return (level, address) with level < threshold, lowest first."""
+        group = self._group(medium, model)
+        end = bisect_left(group, threshold, key=_LEVEL)
+        return group[:end]
+
+    def above(
+        self,
+        threshold: float,
+        medium: MediumType | None = None,
+        model: str | None = None,
+    ) -> list[tuple[float, str]]:
+        """Return (level, address) with level > threshold, highest first."""
+        group = self._group(medium, model)
+        start = bisect_right(group, threshold, key=_LEVEL)
+        return group[start:][::-1]
+
+    def lowest(
+        self, count: int, medium: MediumType | None = None, model: str | None = None
+    ) -> list[tuple[float, str]]:
+        """Return the ``count`` lowest (level, address) pairs, lowest first."""
+        return self._group(medium, model)[:count]
+
+    def highest(
+        self, count: int, medium: MediumType | None = None, model: str | None = None
+    ) -> list[tuple[float, str]]:
+        """Return the ``count`` highest (level, address) pairs, highest first."""
+        group = self._group(medium, model)
+        if count <= 0:
+            return []
+        stop = -count - 1
+        return group[:stop:-1]
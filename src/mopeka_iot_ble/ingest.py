@@ -0,0 +1,273 @@
+"""Asyncio server ingesting advertisements forwarded by remote BLE proxies.
+
+Proxies send frames over UDP (one or more frames per datagram) or a TCP
+stream. Every frame is prefixed with its length (u16, little endian)
+and holds, little endian::
+
+    address (6 bytes), rssi (i8), source length (u8), source (utf-8),
+    manufacturer ID (u16), data length (u8), manufacturer data,
+    service UUID count (u8), service UUIDs (16 bytes each, big endian)
+
+``encode_frame`` builds such a frame.
+
+MIT License applies.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import socket
+import struct
+import uuid
+from collections.abc import Callable, Iterable
+
+from home_assistant_bluetooth import BluetoothServiceInfo
+from sensor_state_data import SensorUpdate
+
+from .fleet import MopekaIOTFleet
+from .parser import MOPEKA_MANUFACTURER
+
+DEFAULT_BUFFER_SIZE = 1 << 18
+MAX_FRAME_SIZE = 0xFFFF
+MAX_DATAGRAMS_PER_WAKEUP = 1024
+
+_LENGTH = struct.Struct("<H")
+_HEAD = struct.Struct("<6sbB")
+_MANUFACTURER = struct.Struct("<HB")
+_UUID_SIZE = 16
+
+IngestCallback = Callable[[str, SensorUpdate], None]
+
+
+def encode_frame(
+    address: str,
+    rssi: int,
+    source: str,
+    manufacturer_id: int,
+    manufacturer_data: bytes,
+    service_uuids: Iterable[str] = (),
+) -> bytes:
+    """Encode an advertisement as a length prefixed ingest frame."""
+    source_bytes = source.encode()
+    uuids = [uuid.UUID(service_uuid).bytes for service_uuid in service_uuids]
+    body = b"".join(
+        (
+            _HEAD.pack(
+                bytes.fromhex(address.replace(":", "")), rssi, len(source_bytes)
+            ),
+            source_bytes,
+            _MANUFACTURER.pack(manufacturer_id, len(manufacturer_data)),
+            manufacturer_data,
+            bytes((len(uuids),)),
+            *uuids,
+        )
+    )
+    return _LENGTH.pack(len(body)) + body
+
+
+class _StreamProtocol(asyncio.BufferedProtocol):
+    """Receive a TCP stream straight into a preallocated buffer."""
+
+    def __init__(self, server: IngestServer, buffer_size: int) -> None:
+        self._server = server
+        self._buffer = bytearray(max(buffer_size, MAX_FRAME_SIZE + _LENGTH.size))
+        self._view = memoryview(self._buffer)
+        self._end = 0
+
+    def get_buffer(self, sizehint: int) -> memoryview:
+        end = self._end
+        return self._view[end:]
+
+    def buffer_updated(self, nbytes: int) -> None:
+        end = self._end + nbytes
+        consumed = self._server.feed(self._view[:end])
+        if consumed:
+            self._buffer[: end - consumed] = self._view[consumed:end]
+            end -= consumed
+        self._end = end
+
+    def connection_lost(self, exc: Exception | None) -> None:
+        if self._end:
+            self._server.errors += 1
+
+
+class _DatagramProtocol(asyncio.DatagramProtocol):
+    """Fallback for event loops that cannot watch a socket directly."""
+
+    def __init__(self, server: IngestServer) -> None:
+        self._server = server
+
+    def datagram_received(self, data: bytes, addr: tuple[str | None, int]) -> None:
+        self._server.feed_datagram(memoryview(data))
+
+
+class IngestServer:
+    """Decode advertisements forwarded by proxies over UDP and TCP.
+
+    Frames are parsed straight out of preallocated receive buffers and
+    only frames carrying Mopeka manufacturer data are turned into a
+    ``BluetoothServiceInfo`` and passed through the fleet; the rest are
+    counted in ``ignored``. Callbacks get the address and update of
+    every decoded frame.
+    """
+
+    def __init__(
+        self,
+        fleet: MopekaIOTFleet | None = None,
+        buffer_size: int = DEFAULT_BUFFER_SIZE,
+    ) -> None:
+        self._fleet = MopekaIOTFleet() if fleet is None else fleet
+        self._buffer_size = buffer_size
+        self._callbacks: tuple[IngestCallback, ...] = ()
+        self._addresses: dict[bytes, str] = {}
+        self._uuids: dict[bytes, str] = {}
+        self._servers: list[asyncio.AbstractServer] = []
+        self._sockets: list[socket.socket] = []
+        self._transports: list[asyncio.BaseTransport] = []
+        self.frames = 0
+        self.ignored = 0
+        self.errors = 0
+
+    @property
+    def fleet(self) -> MopekaIOTFleet:
+        """Return the fleet frames are decoded by."""
+        return self._fleet
+
+    def register_callback(self, callback: IngestCallback) -> Callable[[], None]:
+        """Call back with the address and update of every decoded frame.
+
+        Returns a function that removes the callback again.
+        """
+        self._callbacks = (*self._callbacks, callback)
+
+        def _remove() -> None:
+            self._callbacks = tuple(cb for cb in self._callbacks if cb is not callback)
+
+        return _remove
+
+    def feed(self, data: memoryview) -> int:
+        """Handle the complete frames in a buffer and return the bytes used."""
+        offset = 0
+        size = len(data)
+        unpack_length = _LENGTH.unpack_from
+        while offset + 2 <= size:
+            (length,) = unpack_length(data, offset)
+            end = offset + 2 + length
+            if end > size:
+                break
+            self._handle_frame(data, offset + 2, end)
+            offset = end
+        return offset
+
+    def feed_datagram(self, data: memoryview) -> None:
+        """Handle a datagram, which must hold whole frames."""
+        if self.feed(data) != len(data):
+            self.errors += 1
+
+    def _handle_frame(self, data: memoryview, offset: int, end: int) -> None:
+        self.frames += 1
+        try:
+            mac, rssi, source_len = _HEAD.unpack_from(data, offset)
+            offset += _HEAD.size
+            source_end = offset + source_len
+            source = str(data[offset:source_end], "utf-8")
+            offset = source_end
+            manufacturer_id, data_len = _MANUFACTURER.unpack_from(data, offset)
+            offset += _MANUFACTURER.size
+            data_end = offset + data_len
+            manufacturer_data = data[offset:data_end]
+            offset = data_end
+            uuid_count = data[offset]
+            offset += 1
+            uuids_end = offset + uuid_count * _UUID_SIZE
+        except (struct.error, IndexError, UnicodeDecodeError):
+            self.errors += 1
+            return
+        if uuids_end != end or len(manufacturer_data) != data_len:
+            self.errors += 1
+            return
+        if manufacturer_id != MOPEKA_MANUFACTURER:
+            self.ignored += 1
+            return
+        if (address := self._addresses.get(mac)) is None:
+            address = self._addresses[mac] = ":".join(f"{byte:02X}" for byte in mac)
+        service_uuids = []
+        uuids = self._uuids
+        for start in range(offset, uuids_end, _UUID_SIZE):
+            stop = start + _UUID_SIZE
+            raw = bytes(data[start:stop])
+            if (service_uuid := uuids.get(raw)) is None:
+                service_uuid = uuids[raw] = str(uuid.UUID(bytes=raw))
+            service_uuids.append(service_uuid)
+        update = self._fleet.update(
+            BluetoothServiceInfo(
+                name="",
+                address=address,
+                rssi=rssi,
+                manufacturer_data={manufacturer_id: bytes(manufacturer_data)},
+                service_uuids=service_uuids,
+                service_data={},
+                source=source,
+            )
+        )
+        if update is not None:
+            for callback in self._callbacks:
+                callback(address, update)
+
+    async def start_tcp(self, host: str = "127.0.0.1", port: int = 0) -> int:
+        """Listen for TCP streams and return the bound port."""
+        loop = asyncio.get_running_loop()
+        server = await loop.create_server(
+            lambda: _StreamProtocol(self, self._buffer_size), host, port
+        )
+        self._servers.append(server)
+        bound_port: int = server.sockets[0].getsockname()[1]
+        return bound_port
+
+    async def start_udp(self, host: str = "127.0.0.1", port: int = 0) -> int:
+        """Listen for UDP datagrams and return the bound port."""
+        loop = asyncio.get_running_loop()
+        family = socket.AF_INET6 if ":" in host else socket.AF_INET
+        sock = socket.socket(family, socket.SOCK_DGRAM)
+        sock.setblocking(False)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, self._buffer_size)
+        sock.bind((host, port))
+        bound_port: int = sock.getsockname()[1]
+        buffer = bytearray(MAX_FRAME_SIZE + _LENGTH.size)
+        view = memoryview(buffer)
+
+        def _read() -> None:
+            # Drain the queued datagrams, but give other tasks a turn
+            # during a flood.
+            for _ in range(MAX_DATAGRAMS_PER_WAKEUP):
+                try:
+                    nbytes = sock.recv_into(buffer)
+                except (BlockingIOError, InterruptedError):
+                    return
+                self.feed_datagram(view[:nbytes])
+
+        try:
+            loop.add_reader(sock, _read)
+        except NotImplementedError:
+            transport, _ = await loop.create_datagram_endpoint(
+                lambda: _DatagramProtocol(self), sock=sock
+            )
+            self._transports.append(transport)
+        else:
+            self._sockets.append(sock)
+        return bound_port
+
+    async def close(self) -> None:
+        """Stop listening and close every socket."""
+        loop = asyncio.get_running_loop()
+        for sock in self._sockets:
+            loop.remove_reader(sock)
+            sock.close()
+        for transport in self._transports:
+            transport.close()
+        for server in self._servers:
+            server.close()
+            await server.wait_closed()
+        self._sockets.clear()
+        self._transports.clear()
+        self._servers.clear()
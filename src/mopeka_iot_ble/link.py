@@ -0,0 +1,219 @@
+"""Signal strength and advertisement cadence statistics per device.
+
+MIT License applies.
+"""
+
+from __future__ import annotations
+
+import math
+import struct
+from typing import NamedTuple
+
+DEFAULT_ALPHA = 0.05
+DEFAULT_MIN_INTERVAL = 0.5
+NOMINAL_RELAX = 0.01
+
+# samples, RSSI mean and variance, last seen, payload changed, payload
+# and repeat interval, nominal interval, expected, lost, followed by the
+# last payload. Intervals not seen yet are NaN.
+_STATE = struct.Struct("<Iddddddddd")
+
+
+class LinkStats(NamedTuple):
+    """The radio link of a device as seen by the scanners.
+
+    Intervals are in seconds and None until they were seen once;
+    ``packet_loss`` is the estimated share of advertisements missed.
+    """
+
+    samples: int
+    rssi_mean: float
+    rssi_stddev: float
+    payload_interval: float | None
+    repeat_interval: float | None
+    packet_loss: float | None
+
+
+class _Link:
+    __slots__ = (
+        "expected",
+        "last_payload",
+        "last_seen",
+        "lost",
+        "nominal",
+        "payload_changed",
+        "payload_interval",
+        "repeat_interval",
+        "rssi_mean",
+        "rssi_variance",
+        "samples",
+    )
+
+    def __init__(self, timestamp: float, rssi: float, payload: bytes) -> None:
+        self.samples = 1
+        self.rssi_mean = float(rssi)
+        self.rssi_variance = 0.0
+        self.last_seen = timestamp
+        self.last_payload = payload
+        self.payload_changed = timestamp
+        self.payload_interval: float | None = None
+        self.repeat_interval: float | None = None
+        self.nominal: float | None = None
+        self.expected = 0.0
+        self.lost = 0.0
+
+
+def _optional(value: float | None) -> float:
+    return math.nan if value is None else value
+
+
+def _nan_to_none(value: float) -> float | None:
+    return None if math.isnan(value) else value
+
+
+def _smooth(average: float | None, value: float, alpha: float) -> float:
+    return value if average is None else average + alpha * (value - average)
+
+
+class LinkTracker:
+    """Track the RSSI and advertisement cadence of every device.
+
+    All statistics are exponentially weighted with ``alpha`` so they
+    follow a sensor that is moved or whose battery is fading, and each
+    advertisement costs a few float operations. Until ``1 / alpha``
+    samples were seen the RSSI mean and variance weigh every sample
+    equally.
+
+    ``payload_interval`` is the time between advertisements carrying a
+    new payload and ``repeat_interval`` the time between copies of the
+    same payload. Packet loss is estimated from gaps in the cadence:
+    an interval of about ``n`` times the nominal interval means ``n - 1``
+    advertisements were missed. The nominal interval is learned as the
+    shortest interval seen, relaxing slowly upwards, unless
+    ``expected_interval`` pins it. Intervals below ``min_interval`` are
+    copies of one advertisement heard by several scanners and do not
+    count towards packet loss.
+    """
+
+    def __init__(
+        self,
+        alpha: float = DEFAULT_ALPHA,
+        expected_interval: float | None = None,
+        min_interval: float = DEFAULT_MIN_INTERVAL,
+    ) -> None:
+        self._alpha = alpha
+        self._expected_interval = expected_interval
+        self._min_interval = min_interval
+        self._links: dict[str, _Link] = {}
+
+    def __len__(self) -> int:
+        """Return the number of tracked devices."""
+        return len(self._links)
+
+    def forget(self, address: str) -> None:
+        """Drop the statistics of a device."""
+        self._links.pop(address, None)
+
+    def dump_state(self, address: str) -> bytes | None:
+        """Return the statistics of a device for a snapshot."""
+        if (link := self._links.get(address)) is None:
+            return None
+        return (
+            _STATE.pack(
+                min(link.samples, 0xFFFFFFFF),
+                link.rssi_mean,
+                link.rssi_variance,
+                link.last_seen,
+                link.payload_changed,
+                _optional(link.payload_interval),
+                _optional(link.repeat_interval),
+                _optional(link.nominal),
+                link.expected,
+                link.lost,
+            )
+            + link.last_payload
+        )
+
+    def load_state(self, address: str, data: bytes) -> None:
+        """Restore the statistics of a device from ``dump_state``."""
+        try:
+            (
+                samples,
+                rssi_mean,
+                rssi_variance,
+                last_seen,
+                payload_changed,
+                payload_interval,
+                repeat_interval,
+                nominal,
+                expected,
+                lost,
+            ) = _STATE.unpack_from(data)
+        except struct.error as ex:
+            raise ValueError(f"Corrupt link state: {ex}") from ex
+        state_size = _STATE.size
+        link = self._links[address] = _Link(last_seen, rssi_mean, data[state_size:])
+        link.samples = samples
+        link.rssi_variance = rssi_variance
+        link.payload_changed = payload_changed
+        link.payload_interval = _nan_to_none(payload_interval)
+        link.repeat_interval = _nan_to_none(repeat_interval)
+        link.nominal = _nan_to_none(nominal)
+        link.expected = expected
+        link.lost = lost
+
+    def stats(self, address: str) -> LinkStats | None:
+        """Return the statistics of a device."""
+        if (link := self._links.get(address)) is None:
+            return None
+        return self._stats(link)
+
+    @staticmethod
+    def _stats(link: _Link) -> LinkStats:
+        return LinkStats(
+            link.samples,
+            link.rssi_mean,
+            math.sqrt(link.rssi_variance),
+            link.payload_interval,
+            link.repeat_interval,
+            link.lost / link.expected if link.expected else None,
+        )
+
+    def update(
+        self, address: str, timestamp: float, rssi: float, payload: bytes
+    ) -> LinkStats:
+        """Add an advertisement of a device and return its statistics."""
+        if (link := self._links.get(address)) is None:
+            link = self._links[address] = _Link(timestamp, rssi, payload)
+            return self._stats(link)
+        alpha = self._alpha
+        link.samples += 1
+        # Exponentially weighted mean and variance (West, 1979).
+        weight = max(alpha, 1.0 / link.samples)
+        difference = rssi - link.rssi_mean
+        increment = weight * difference
+        link.rssi_mean += increment
+        link.rssi_variance = (1.0 - weight) * (
+            link.rssi_variance + difference * increment
+        )
+        interval = timestamp - link.last_seen
+        link.last_seen = timestamp
+        if payload == link.last_payload:
+            link.repeat_interval = _smooth(link.repeat_interval, interval, alpha)
+        else:
+            link.payload_interval = _smooth(
+                link.payload_interval, timestamp - link.payload_changed, alpha
+            )
+            link.payload_changed = timestamp
+            link.last_payload = payload
+        if interval >= self._min_interval:
+            if (nominal := self._expected_interval) is None:
+                if link.nominal is None or interval < link.nominal:
+                    link.nominal = interval
+                else:
+                    link.nominal += (interval - link.nominal) * NOMINAL_RELAX
+                nominal = link.nominal
+            expected = max(1, round(interval / nominal))
+            link.expected = link.expected * (1.0 - alpha) + expected
+            link.lost = link.lost * (1.0 - alpha) + expected - 1
+        return self._stats(link)
@@ -0,0 +1,130 @@
+"""Prometheus style metrics for the Mopeka IOT parser.
+
+MIT License applies.
+"""
+
+from __future__ import annotations
+
+from bisect import bisect_left
+
+from .models import RejectReason
+
+DEFAULT_LATENCY_BUCKETS = (
+    0.000005,
+    0.00001,
+    0.000025,
+    0.00005,
+    0.0001,
+    0.00025,
+    0.0005,
+    0.001,
+    0.005,
+)
+
+LOW_QUALITY_THRESHOLD = 1
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class ParserMetrics:
+    """Counters and a decode latency histogram for one or more parsers.
+
+    Recording only increments plain integers and never takes a lock, so
+    it is safe to share one instance across every parser in a fleet and
+    to ``render`` it from another thread while decoding continues.
+    """
+
+    def __init__(
+        self, latency_buckets: tuple[float, ...] = DEFAULT_LATENCY_BUCKETS
+    ) -> None:
+        self.adverts_seen = 0
+        self.accepted = 0
+        self.low_quality = 0
+        self.rejected = dict.fromkeys(RejectReason, 0)
+        self.models: dict[str, int] = {}
+        self._latency_buckets = latency_buckets
+        self._latency_counts = [0] * (len(latency_buckets) + 1)
+        self._latency_sum = 0.0
+
+    def record_accepted(self, model: str, reading_quality: int) -> None:
+        """Record a decoded advertisement."""
+        self.accepted += 1
+        models = self.models
+        models[model] = models.get(model, 0) + 1
+        if reading_quality <= LOW_QUALITY_THRESHOLD:
+            self.low_quality += 1
+
+    def record_rejected(self, reason: RejectReason) -> None:
+        """Record an advertisement that was not decoded."""
+        self.rejected[reason] += 1
+
+    def record_seen(self) -> None:
+        """Record an advertisement passed to the parser."""
+        self.adverts_seen += 1
+
+    def record_latency(self, seconds: float) -> None:
+        """Record how long one decoded advertisement took to process."""
+        self._latency_counts[bisect_left(self._latency_buckets, seconds)] += 1
+        self._latency_sum += seconds
+
+    def render(self, extra_gauges: dict[str, float] | None = None) -> str:
+        """Render the metrics in the Prometheus text exposition format."""
+        lines = [
+            "# HELP mopeka_adverts_seen_total Advertisements passed to the parser.",
+            "# TYPE mopeka_adverts_seen_total counter",
+            f"mopeka_adverts_seen_total {self.adverts_seen}",
+            "# HELP mopeka_adverts_accepted_total Advertisements decoded.",
+            "# TYPE mopeka_adverts_accepted_total counter",
+            f"mopeka_adverts_accepted_total {self.accepted}",
+            "# HELP mopeka_adverts_rejected_total Advertisements not decoded.",
+            "# TYPE mopeka_adverts_rejected_total counter",
+        ]
+        for reason, count in tuple(self.rejected.items()):
+            lines.append(
+                f'mopeka_adverts_rejected_total{{reason="{reason.value}"}} {count}'
+            )
+        lines.extend(
+            (
+                "# HELP mopeka_readings_total Decoded readings by model.",
+                "# TYPE mopeka_readings_total counter",
+            )
+        )
+        for model, count in sorted(tuple(self.models.items())):
+            lines.append(
+                f'mopeka_readings_total{{model="{_escape_label(model)}"}} {count}'
+            )
+        lines.extend(
+            (
+                (
+                    "# HELP mopeka_low_quality_readings_total Readings with a "
+                    f"reading quality of {LOW_QUALITY_THRESHOLD} or less."
+                ),
+                "# TYPE mopeka_low_quality_readings_total counter",
+                f"mopeka_low_quality_readings_total {self.low_quality}",
+                (
+                    "# HELP mopeka_decode_duration_seconds Time spent per "
+                    "decoded advertisement."
+                ),
+                "# TYPE mopeka_decode_duration_seconds histogram",
+            )
+        )
+        counts = tuple(self._latency_counts)
+        cumulative = 0
+        for bound, count in zip(self._latency_buckets, counts):
+            cumulative += count
+            lines.append(
+                f'mopeka_decode_duration_seconds_bucket{{le="{bound}"}} {cumulative}'
+            )
+        cumulative += counts[-1]
+        lines.extend(
+            (
+                f'mopeka_decode_duration_seconds_bucket{{le="+Inf"}} {cumulative}',
+                f"mopeka_decode_duration_seconds_sum {self._latency_sum}",
+                f"mopeka_decode_duration_seconds_count {cumulative}",
+            )
+        )
+        for name, value in (extra_gauges or {}).items():
+            lines.extend((f"# TYPE {name} gauge", f"{name} {value}"))
+        return "\n".join(lines) + "\n"
@@ -7,7 +7,13 @@ help decoding the advertisements.
 MIT License applies.
 """
 
+from __future__ import annotations
+
+from dataclasses import dataclass
 from enum import Enum
+from typing import NamedTuple
+
+from sensor_state_data import Units
 
 
 class MediumType(Enum):
@@ -25,3 +31,108 @@ class MediumType(Enum):
     LNG = "lng"
     OIL = "oil"
     HYDRAULIC_OIL = "hydraulic_oil"
+
+
+class MovementEvent(Enum):
+    """Enumeration of sensor placement events derived from the accelerometer."""
+
+    MOVED = "moved"
+    NOT_LEVEL = "not_level"
+    LEVEL = "level"
+
+
+@dataclass(slots=True)
+class MopekaReading:
+    """A decoded Mopeka IOT advertisement."""
+
+    timestamp: float
+    address: str
+    source: str
+    rssi: int
+    model_id: int
+    model: str
+    name: str
+    medium: MediumType
+    battery_voltage: float
+    battery_percentage: float
+    temperature: int
+    button_pressed: bool
+    tank_level_raw: int
+    tank_level: int | None
+    reading_quality: int
+    accelerometer_x: int
+    accelerometer_y: int
+    raw: bytes
+
+
+@dataclass(frozen=True, slots=True)
+class TankConfig:
+    """Configuration of the tank a sensor is mounted on.
+
+    ``level_offset`` is added to the measured level in mm, for sensors
+    that do not sit at the bottom of the tank. Changes of the published
+    level smaller than ``level_deadband`` mm are held back. With a
+    ``tank_height`` in mm the fill level is also published as a
+    percentage.
+    """
+
+    medium: MediumType = MediumType.PROPANE
+    tank_height: float | None = None
+    level_offset: float = 0.0
+    level_deadband: float = 0.0
+
+
+@dataclass(frozen=True, slots=True)
+class SiteMember:
+    """A tank of a site.
+
+    ``capacity`` is the volume of the full tank in the unit of the site,
+    reached at a level of ``tank_height`` mm.
+    """
+
+    address: str
+    tank_height: float
+    capacity: float = 1.0
+    name: str | None = None
+
+    def __post_init__(self) -> None:
+        if not self.tank_height > 0:
+            raise ValueError(f"Tank height of {self.address} must be positive")
+
+
+@dataclass(frozen=True, slots=True)
+class Site:
+    """Tanks that together form one reservoir.
+
+    For example two bottles on an automatic changeover regulator, or a
+    bank of water tanks.
+    """
+
+    name: str
+    members: tuple[SiteMember, ...]
+    volume_unit: Units | None = None
+
+
+class RejectReason(Enum):
+    """Enumeration of reasons an advertisement was not decoded."""
+
+    NOT_MOPEKA = "not_mopeka"
+    UNSUPPORTED_MODEL = "unsupported_model"
+    WRONG_LENGTH = "wrong_length"
+
+
+class FrameRecord(NamedTuple):
+    """A raw Mopeka IOT frame as it was received.
+
+    ``medium`` is the medium the frame was decoded for. ``state`` holds
+    the per device state of the parser's trackers as (name, data) pairs,
+    for snapshots.
+    """
+
+    timestamp: float
+    address: str
+    source: str
+    rssi: int
+    medium: MediumType
+    payload: bytes
+    state: tuple[tuple[str, bytes], ...] = ()
@@ -0,0 +1,167 @@
+"""Accelerometer based movement and mis-mount detection for Mopeka IOT sensors.
+
+The sensor reports the raw X/Y position of its accelerometer in the last
+two bytes of every advertisement. A sensor that stays on the same tank
+keeps reporting roughly the same position, so a running baseline per
+device is enough to notice when it has been moved, re-mounted on another
+tank, or was never mounted level in the first place.
+
+MIT License applies.
+"""
+
+from __future__ import annotations
+
+import struct
+
+from .models import MovementEvent
+
+DEFAULT_MAX_DEVICES = 4096
+
+# x, y, samples, streak, level
+_STATE = struct.Struct("<ddIH?")
+
+
+def accelerometer_to_signed(value: int) -> int:
+    """Convert a raw accelerometer byte to a signed value."""
+    return value - 256 if value > 127 else value
+
+
+class _DeviceBaseline:
+    """Running X/Y baseline for a single device."""
+
+    __slots__ = ("level", "samples", "streak", "x", "y")
+
+    def __init__(self, x: int, y: int) -> None:
+        self.x = float(x)
+        self.y = float(y)
+        self.samples = 1
+        self.streak = 0
+        self.level = True
+
+
+class MovementDetector:
+    """Detect moved, swapped or badly mounted sensors.
+
+    Each call to ``update`` is O(1): the baseline is an exponentially
+    weighted moving average of the signed X/Y position. A sample further
+    than ``move_threshold`` from the baseline on either axis only counts
+    as movement once ``confirm_samples`` consecutive samples agree, so a
+    single bumped reading does not raise an event. After a move the
+    baseline restarts from the new position.
+
+    Once a baseline has settled for ``warmup_samples`` samples it is
+    checked against ``level_tolerance``; crossing it emits ``NOT_LEVEL``
+    and coming back inside emits ``LEVEL``.
+
+    At most ``max_devices`` baselines are kept, dropping the least
+    recently seen device first; ``forget`` drops a device that is gone.
+    """
+
+    def __init__(
+        self,
+        move_threshold: int = 12,
+        confirm_samples: int = 3,
+        level_tolerance: int = 48,
+        warmup_samples: int = 5,
+        alpha: float = 0.1,
+        max_devices: int = DEFAULT_MAX_DEVICES,
+    ) -> None:
+        self._move_threshold = move_threshold
+        self._confirm_samples = confirm_samples
+        self._level_tolerance = level_tolerance
+        self._warmup_samples = warmup_samples
+        self._alpha = alpha
+        self._max_devices = max_devices
+        self._baselines: dict[str, _DeviceBaseline] = {}
+
+    def __len__(self) -> int:
+        """Return the number of tracked devices."""
+        return len(self._baselines)
+
+    def baseline(self, address: str) -> tuple[float, float] | None:
+        """Return the signed X/Y baseline for a device."""
+        if (state := self._baselines.get(address)) is None:
+            return None
+        return state.x, state.y
+
+    def is_level(self, address: str) -> bool | None:
+        """Return if a device is mounted level, or None if not settled yet."""
+        state = self._baselines.get(address)
+        if state is None or state.samples < self._warmup_samples:
+            return None
+        return state.level
+
+    def forget(self, address: str) -> None:
+        """Drop the baseline for a device."""
+        self._baselines.pop(address, None)
+
+    def dump_state(self, address: str) -> bytes | None:
+        """Return the baseline of a device for a snapshot."""
+        if (state := self._baselines.get(address)) is None:
+            return None
+        return _STATE.pack(
+            state.x,
+            state.y,
+            min(state.samples, 0xFFFFFFFF),
+            min(state.streak, 0xFFFF),
+            state.level,
+        )
+
+    def load_state(self, address: str, data: bytes) -> None:
+        """Restore the baseline of a device from ``dump_state``."""
+        try:
+            x, y, samples, streak, level = _STATE.unpack(data)
+        except struct.error as ex:
+            raise ValueError(f"Corrupt movement state: {ex}") from ex
+        baselines = self._baselines
+        if address not in baselines and len(baselines) >= self._max_devices:
+            del baselines[next(iter(baselines))]
+        state = baselines[address] = _DeviceBaseline(0, 0)
+        state.x = x
+        state.y = y
+        state.samples = samples
+        state.streak = streak
+        state.level = level
+
+    def update(
+        self, address: str, accelerometer_x: int, accelerometer_y: int
+    ) -> MovementEvent | None:
+        """Feed one raw accelerometer sample and return an event if one fired."""
+        x = accelerometer_to_signed(accelerometer_x)
+        y = accelerometer_to_signed(accelerometer_y)
+        baselines = self._baselines
+        if (state := baselines.pop(address, None)) is None:
+            if len(baselines) >= self._max_devices:
+                del baselines[next(iter(baselines))]
+            baselines[address] = _DeviceBaseline(x, y)
+            return None
+        # Keep the baselines ordered from least to most recently seen.
+        baselines[address] = state
+
+        threshold = self._move_threshold
+        if abs(x - state.x) > threshold or abs(y - state.y) > threshold:
+            state.streak += 1
+            if state.streak < self._confirm_samples:
+                return None
+            # The sensor settled somewhere else, start over from here
+            state.x = float(x)
+            state.y = float(y)
+            state.samples = 1
+            state.streak = 0
+            state.level = True
+            return MovementEvent.MOVED
+
+        state.streak = 0
+        alpha = self._alpha
+        state.x += alpha * (x - state.x)
+        state.y += alpha * (y - state.y)
+        state.samples += 1
+        if state.samples < self._warmup_samples:
+            return None
+
+        tolerance = self._level_tolerance
+        level = abs(state.x) <= tolerance and abs(state.y) <= tolerance
+        if level is state.level:
+            return None
+        state.level = level
+        return MovementEvent.LEVEL if level else MovementEvent.NOT_LEVEL
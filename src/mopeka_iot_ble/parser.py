@@ -9,20 +9,44 @@ MIT License applies.
 
 from __future__ import annotations
 
+import json
 import logging
+import os
+import time
+from collections.abc import Callable, Collection
 from dataclasses import dataclass
+from typing import Any, NamedTuple, Protocol
 
 from bluetooth_data_tools import short_address
 from bluetooth_sensor_state_data import BluetoothData
 from home_assistant_bluetooth import BluetoothServiceInfo
 from sensor_state_data import (
+    BinarySensorDescription,
     BinarySensorDeviceClass,
+    BinarySensorValue,
+    DeviceClass,
+    DeviceKey,
+    SensorDescription,
     SensorDeviceClass,
-    SensorLibrary,
+    SensorUpdate,
+    SensorValue,
     Units,
 )
 
-from .models import MediumType
+from .battery import BatteryModel
+from .estimator import ConsumptionEstimator
+from .link import LinkStats, LinkTracker
+from .metrics import ParserMetrics
+from .models import (
+    FrameRecord,
+    MediumType,
+    MopekaReading,
+    RejectReason,
+    TankConfig,
+)
+from .movement import MovementDetector
+from .sampling import RejectedPayloadSampler
+from .snapshot import SnapshotError
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -47,27 +71,6 @@ MOPEKA_MANUFACTURER = 89
 MOKPEKA_PRO_SERVICE_UUID = "0000fee5-0000-1000-8000-00805f9b34fb"
 
 
-@dataclass
-class MopekaDevice:
-    model: str
-    name: str
-    adv_length: int
-
-
-DEVICE_TYPES = {
-    0x3: MopekaDevice("M1017", "Pro Check", 10),
-    0x4: MopekaDevice("Pro-200", "Pro-200", 10),
-    0x5: MopekaDevice("Pro H20", "Pro Check H2O", 10),
-    0x6: MopekaDevice("M1017", "Lippert BottleCheck", 10),
-    0x8: MopekaDevice("M1015", "Pro Plus", 10),
-    0x9: MopekaDevice("M1015", "Pro Plus with Cellular", 10),
-    0xA: MopekaDevice("TD40/TD200", "TD40/TD200", 10),
-    0xB: MopekaDevice("TD40/TD200", "TD40/TD200 with Cellular", 10),
-    0xC: MopekaDevice("M1017", "Pro Check Universal", 10),
-    0x12: MopekaDevice("Pro-200", "Pro-200B", 10),
-}
-
-
 def hex(data: bytes) -> str:
     """Return a string object containing two hexadecimal digits for each byte in the instance."""
     return "b'{}'".format("".join(f"\\x{b:02x}" for b in data))
@@ -101,19 +104,637 @@ def tank_level_and_temp_to_mm(
     return int(tank_level * (coefs[0] + (coefs[1] * temp) + (coefs[2] * (temp**2))))
 
 
-class MopekaIOTBluetoothDeviceData(BluetoothData):
-    """Data for Mopeka IOT BLE sensors."""
+class DecodedFrame(NamedTuple):
+    """Values decoded from the manufacturer data of one advertisement."""
+
+    battery_voltage: float
+    battery_percentage: float
+    temperature: int
+    button_pressed: bool
+    tank_level_raw: int
+    tank_level: int | None
+    reading_quality: int
+    accelerometer_x: int
+    accelerometer_y: int
+
+
+FrameDecoder = Callable[[bytes | memoryview, MediumType], DecodedFrame]
+
 
-    def __init__(self, medium_type: MediumType = MediumType.PROPANE) -> None:
+def decode_standard(data: bytes | memoryview, medium: MediumType) -> DecodedFrame:
+    """Decode the 10 byte layout shared by the current Mopeka sensors."""
+    battery = data[1]
+    temp = data[2] & 0x7F
+    tank_level = ((data[4] << 8) + data[3]) & 0x3FFF
+    reading_quality = data[4] >> 6
+    return DecodedFrame(
+        battery_to_voltage(battery),
+        battery_to_percentage(battery),
+        temp_to_celsius(temp),
+        data[2] & 0x80 > 0,
+        tank_level,
+        (
+            tank_level_and_temp_to_mm(tank_level, temp, medium)
+            if reading_quality >= 1
+            else None
+        ),
+        reading_quality,
+        data[8],
+        data[9],
+    )
+
+
+DECODERS: dict[str, FrameDecoder] = {"standard": decode_standard}
+
+
+@dataclass
+class MopekaDevice:
+    model: str
+    name: str
+    adv_length: int
+    decoder: FrameDecoder = decode_standard
+
+
+DEVICE_TYPES: dict[int, MopekaDevice] = {}
+
+# Indexed by the model byte, so the lookup never hashes or misses
+_DEVICE_DISPATCH: list[MopekaDevice | None] = [None] * 256
+
+
+def _check_model_id(model_id: int) -> None:
+    if not 0 <= model_id <= 0xFF:
+        raise ValueError(f"Model ID must be a single byte: {model_id}")
+
+
+def register_device_type(
+    model_id: int,
+    model: str,
+    name: str,
+    adv_length: int = 10,
+    decoder: FrameDecoder = decode_standard,
+    replace: bool = False,
+) -> MopekaDevice:
+    """Register a Mopeka model ID so its advertisements are decoded."""
+    _check_model_id(model_id)
+    if model_id in DEVICE_TYPES and not replace:
+        raise ValueError(f"Model ID {model_id:#04x} is already registered")
+    device_type = MopekaDevice(model, name, adv_length, decoder)
+    DEVICE_TYPES[model_id] = device_type
+    _DEVICE_DISPATCH[model_id] = device_type
+    return device_type
+
+
+def unregister_device_type(model_id: int) -> None:
+    """Stop decoding advertisements for a Mopeka model ID."""
+    _check_model_id(model_id)
+    DEVICE_TYPES.pop(model_id, None)
+    _DEVICE_DISPATCH[model_id] = None
+
+
+def get_device_type(model_id: int) -> MopekaDevice | None:
+    """Return the registered device type for a model ID."""
+    return _DEVICE_DISPATCH[model_id]
+
+
+def decode_payload(
+    payload: bytes | memoryview, medium: MediumType = MediumType.PROPANE
+) -> tuple[MopekaDevice, DecodedFrame] | None:
+    """Decode Mopeka manufacturer data without building a service info.
+
+    Returns None if the model is not registered or the length is wrong.
+    """
+    if (
+        not payload
+        or (device_type := _DEVICE_DISPATCH[payload[0]]) is None
+        or len(payload) != device_type.adv_length
+    ):
+        return None
+    return device_type, device_type.decoder(payload, medium)
+
+
+def _device_type_from_json(entry: Any) -> tuple[int, MopekaDevice]:
+    """Return the model ID and device type of a device types file entry."""
+    if not isinstance(entry, dict):
+        raise ValueError("Expected an object")
+    model_id = entry.get("model_id")
+    if isinstance(model_id, str):
+        model_id = int(model_id, 0)
+    if not isinstance(model_id, int) or isinstance(model_id, bool):
+        raise ValueError("model_id must be an integer or a hex string")
+    _check_model_id(model_id)
+    model = entry.get("model")
+    name = entry.get("name")
+    if not isinstance(model, str) or not isinstance(name, str):
+        raise ValueError("model and name must be strings")
+    adv_length = entry.get("adv_length", 10)
+    if (
+        not isinstance(adv_length, int)
+        or isinstance(adv_length, bool)
+        or adv_length < 1
+    ):
+        raise ValueError("adv_length must be a positive integer")
+    decoder = entry.get("decoder", "standard")
+    if not isinstance(decoder, str) or decoder not in DECODERS:
+        raise ValueError(f"Unknown decoder: {decoder}")
+    return model_id, MopekaDevice(model, name, adv_length, DECODERS[decoder])
+
+
+def load_device_types(path: str | os.PathLike[str], replace: bool = False) -> int:
+    """Register device types from a JSON file and return how many were loaded.
+
+    The file holds a list of objects with ``model_id`` (an integer or a hex
+    string such as ``"0x0d"``), ``model``, ``name`` and optionally
+    ``adv_length`` and ``decoder``, the name of an entry in ``DECODERS``.
+    The whole file is checked before anything is registered, so a bad
+    entry raises ValueError and leaves the registered types as they were.
+    """
+    with open(path, encoding="utf-8") as file:
+        entries = json.load(file)
+    if not isinstance(entries, list):
+        raise ValueError(f"{os.fspath(path)}: expected a list of device types")
+    device_types: dict[int, MopekaDevice] = {}
+    for number, entry in enumerate(entries):
+        try:
+            model_id, device_type = _device_type_from_json(entry)
+            if model_id in device_types or (model_id in DEVICE_TYPES and not replace):
+                raise ValueError(f"Model ID {model_id:#04x} is already registered")
+        except ValueError as ex:
+            raise ValueError(
+                f"{os.fspath(path)}: invalid device type {number}: {ex}"
+            ) from ex
+        device_types[model_id] = device_type
+    for model_id, device_type in device_types.items():
+        DEVICE_TYPES[model_id] = device_type
+        _DEVICE_DISPATCH[model_id] = device_type
+    return len(device_types)
+
+
+for _model_id, _model, _name in (
+    (0x3, "M1017", "Pro Check"),
+    (0x4, "Pro-200", "Pro-200"),
+    (0x5, "Pro H20", "Pro Check H2O"),
+    (0x6, "M1017", "Lippert BottleCheck"),
+    (0x8, "M1015", "Pro Plus"),
+    (0x9, "M1015", "Pro Plus with Cellular"),
+    (0xA, "TD40/TD200", "TD40/TD200"),
+    (0xB, "TD40/TD200", "TD40/TD200 with Cellular"),
+    (0xC, "M1017", "Pro Check Universal"),
+    (0x12, "Pro-200", "Pro-200B"),
+):
+    register_device_type(_model_id, _model, _name)
+
+
+# The descriptions of every sensor the parser publishes.
+SENSOR_DESCRIPTIONS: dict[DeviceKey, SensorDescription] = {}
+
+
+class _Entity(NamedTuple):
+    """A prebuilt sensor key, description and name."""
+
+    device_key: DeviceKey
+    description: SensorDescription
+    name: str
+
+
+def _entity(
+    key: str,
+    name: str,
+    unit: Units | None = None,
+    device_class: SensorDeviceClass | None = None,
+) -> _Entity:
+    device_key = DeviceKey(key)
+    description = SENSOR_DESCRIPTIONS[device_key] = SensorDescription(
+        device_key=device_key,
+        device_class=device_class,
+        native_unit_of_measurement=unit,
+    )
+    return _Entity(device_key, description, name)
+
+
+# Every parser publishes for device_id None, so the keys and descriptions
+# are the same for all devices and only have to be built once.
+TEMPERATURE = _entity(
+    "temperature", "Temperature", Units.TEMP_CELSIUS, SensorDeviceClass.TEMPERATURE
+)
+BATTERY = _entity("battery", "Battery", Units.PERCENTAGE, SensorDeviceClass.BATTERY)
+BATTERY_VOLTAGE = _entity(
+    "battery_voltage",
+    "Battery Voltage",
+    Units.ELECTRIC_POTENTIAL_VOLT,
+    SensorDeviceClass.VOLTAGE,
+)
+TANK_LEVEL = _entity(
+    "tank_level", "Tank Level", Units.LENGTH_MILLIMETERS, SensorDeviceClass.DISTANCE
+)
+TANK_FILL = _entity("tank_fill", "Tank Fill", Units.PERCENTAGE)
+ACCELEROMETER_X = _entity("accelerometer_x", "Position X")
+ACCELEROMETER_Y = _entity("accelerometer_y", "Position Y")
+READING_QUALITY_RAW = _entity("reading_quality_raw", "Reading quality raw")
+READING_QUALITY = _entity("reading_quality", "Reading quality", Units.PERCENTAGE)
+SIGNAL_STRENGTH = _entity(
+    DeviceClass.SIGNAL_STRENGTH.value,
+    "Signal Strength",
+    Units.SIGNAL_STRENGTH_DECIBELS_MILLIWATT,
+    SensorDeviceClass.SIGNAL_STRENGTH,
+)
+# Only the "mm/d" unit string, without the speed device class.
+CONSUMPTION_RATE = _entity(
+    "consumption_rate", "Consumption rate", Units.SPEED_MILLIMETERS_PER_DAY
+)
+TIME_TO_EMPTY = _entity(
+    "time_to_empty", "Time to empty", Units.TIME_DAYS, SensorDeviceClass.DURATION
+)
+BATTERY_REMAINING = _entity(
+    "battery_remaining",
+    "Battery remaining",
+    Units.TIME_DAYS,
+    SensorDeviceClass.DURATION,
+)
+RSSI_MEAN = _entity(
+    "rssi_mean",
+    "Signal Strength Mean",
+    Units.SIGNAL_STRENGTH_DECIBELS_MILLIWATT,
+    SensorDeviceClass.SIGNAL_STRENGTH,
+)
+RSSI_STDDEV = _entity("rssi_stddev", "Signal Strength Deviation")
+PAYLOAD_INTERVAL = _entity(
+    "payload_interval",
+    "Update Interval",
+    Units.TIME_SECONDS,
+    SensorDeviceClass.DURATION,
+)
+REPEAT_INTERVAL = _entity(
+    "repeat_interval", "Repeat Interval", Units.TIME_SECONDS, SensorDeviceClass.DURATION
+)
+PACKET_LOSS = _entity("packet_loss", "Packet Loss", Units.PERCENTAGE)
+BUTTON_PRESSED_KEY = DeviceKey("button_pressed")
+BUTTON_PRESSED_DESCRIPTION = BinarySensorDescription(
+    device_key=BUTTON_PRESSED_KEY,
+    device_class=BinarySensorDeviceClass.OCCUPANCY,
+)
+# Published once a parser restored a snapshot: True until the device
+# advertises again.
+RESTORED_KEY = DeviceKey("restored")
+RESTORED_DESCRIPTION = BinarySensorDescription(
+    device_key=RESTORED_KEY, device_class=None
+)
+# The keys of every entity the parser can publish.
+ENTITY_KEYS = frozenset(
+    (
+        *(device_key.key for device_key in SENSOR_DESCRIPTIONS),
+        BUTTON_PRESSED_KEY.key,
+        RESTORED_KEY.key,
+    )
+)
+
+DEFAULT_MAX_IDENTITIES = 64
+
+
+class _DeviceState(Protocol):
+    """A tracker whose per device state goes into snapshots."""
+
+    def dump_state(self, address: str) -> bytes | None: ...
+
+    def load_state(self, address: str, data: bytes) -> None: ...
+
+
+def select_entities(entities: Collection[str] | None) -> frozenset[str]:
+    """Return the entity keys to publish, all of them for None."""
+    if entities is None:
+        return ENTITY_KEYS
+    # A frozenset is returned as is, so parsers can share one.
+    selected = frozenset(entities)
+    if unknown := selected - ENTITY_KEYS:
+        raise ValueError(f"Unknown entities: {', '.join(sorted(unknown))}")
+    return selected
+
+
+class MopekaIOTBluetoothDeviceData(BluetoothData):
+    """Data for Mopeka IOT BLE sensors.
+
+    ``entities`` limits the published entities to the given keys, out of
+    ``ENTITY_KEYS``. Other entities are neither updated nor stored.
+    """
+
+    def __init__(
+        self,
+        medium_type: MediumType = MediumType.PROPANE,
+        movement_detector: MovementDetector | None = None,
+        metrics: ParserMetrics | None = None,
+        rejected_sampler: RejectedPayloadSampler | None = None,
+        max_identities: int = DEFAULT_MAX_IDENTITIES,
+        consumption_estimator: ConsumptionEstimator | None = None,
+        tank_config: TankConfig | None = None,
+        link_tracker: LinkTracker | None = None,
+        battery_model: BatteryModel | None = None,
+        entities: Collection[str] | None = None,
+    ) -> None:
         super().__init__()
+        self._entities = select_entities(entities)
+        self._link_tracker = link_tracker
+        self._battery_model = battery_model
+        self._tank_config = TankConfig(medium_type)
         self._medium_type = medium_type
+        self._adjust_level = False
+        self._published_level: float | None = None
+        if tank_config is not None:
+            self.set_tank_config(tank_config)
+        self._movement_detector = movement_detector
+        self._metrics = metrics
+        self._rejected_sampler = rejected_sampler
+        self._consumption_estimator = consumption_estimator
+        self._reading_callbacks: tuple[Callable[[MopekaReading], None], ...] = ()
+        self._max_identities = max_identities
+        self._identities: dict[tuple[str, int], str] = {}
+        self._identity: tuple[str, int] | None = None
+        self._restored = False
+        self._last_frame: tuple[float, str, str, int, MediumType, bytes] | None = None
+
+    def register_reading_callback(
+        self, callback: Callable[[MopekaReading], None]
+    ) -> Callable[[], None]:
+        """Register a callback for every decoded reading.
+
+        Returns a function that removes the callback again.
+        """
+        self._reading_callbacks = (*self._reading_callbacks, callback)
+
+        def _remove() -> None:
+            self._reading_callbacks = tuple(
+                cb for cb in self._reading_callbacks if cb is not callback
+            )
+
+        return _remove
+
+    @property
+    def medium_type(self) -> MediumType:
+        """Return the medium the tank level is calculated for."""
+        return self._medium_type
+
+    @property
+    def tank_config(self) -> TankConfig:
+        """Return the configuration of the tank."""
+        return self._tank_config
+
+    def set_tank_config(self, tank_config: TankConfig) -> None:
+        """Apply a new tank configuration from the next frame on."""
+        self._tank_config = tank_config
+        self._medium_type = tank_config.medium
+        self._adjust_level = bool(
+            tank_config.tank_height
+            or tank_config.level_offset
+            or tank_config.level_deadband
+        )
+        self._published_level = None
+
+    def _trackers(self) -> dict[str, _DeviceState]:
+        """Return the trackers with per device state, by snapshot name."""
+        trackers: dict[str, _DeviceState] = {}
+        if self._movement_detector is not None:
+            trackers["movement"] = self._movement_detector
+        if self._consumption_estimator is not None:
+            trackers["consumption"] = self._consumption_estimator
+        if self._link_tracker is not None:
+            trackers["link"] = self._link_tracker
+        if self._battery_model is not None:
+            trackers["battery"] = self._battery_model
+        return trackers
+
+    @property
+    def last_frame(self) -> FrameRecord | None:
+        """Return the last frame that was decoded with the trackers' state."""
+        if self._last_frame is None:
+            return None
+        timestamp, address, source, rssi, medium, payload = self._last_frame
+        return FrameRecord(
+            timestamp,
+            address,
+            source,
+            rssi,
+            medium,
+            bytes(payload),
+            tuple(
+                (name, state)
+                for name, tracker in self._trackers().items()
+                if (state := tracker.dump_state(address)) is not None
+            ),
+        )
+
+    def restore(self, record: FrameRecord) -> SensorUpdate | None:
+        """Restore the state from a previously decoded frame.
+
+        The frame is decoded for the medium it was recorded with and the
+        state of the trackers is restored from the record. Metrics and
+        reading callbacks do not see restored frames. The ``restored``
+        binary sensor is on until the device advertises again. Returns
+        None if the frame can no longer be decoded and raises
+        SnapshotError if the state of a tracker is corrupt.
+        """
+        if (decoded := decode_payload(record.payload, record.medium)) is None:
+            return None
+        device_type, frame = decoded
+        address = record.address
+        trackers = self._trackers()
+        for name, state in record.state:
+            if (tracker := trackers.get(name)) is not None:
+                try:
+                    tracker.load_state(address, state)
+                except ValueError as ex:
+                    raise SnapshotError(str(ex)) from ex
+        self._events_updates.clear()
+        if self._identity != (identity := (address, record.payload[0])):
+            self._set_identity(identity, device_type)
+        self._publish_frame(frame)
+        self._restored = True
+        self._publish_restored(True)
+        self.update_signal_strength(record.rssi)
+        self._last_frame = (
+            record.timestamp,
+            address,
+            record.source,
+            record.rssi,
+            record.medium,
+            record.payload,
+        )
+        return self._finish_update()
+
+    @property
+    def metrics(self) -> ParserMetrics | None:
+        """Return the metrics this parser records into."""
+        return self._metrics
+
+    def _set_identity(
+        self, identity: tuple[str, int], device_type: MopekaDevice
+    ) -> None:
+        """Apply the device info for an address and model."""
+        identities = self._identities
+        if (name := identities.get(identity)) is None:
+            if len(identities) >= self._max_identities:
+                del identities[next(iter(identities))]
+            name = f"{device_type.name} {short_address(identity[0])}"
+            identities[identity] = name
+        self.set_device_manufacturer("Mopeka IOT")
+        self.set_device_type(device_type.model)
+        self.set_device_name(name)
+        self._identity = identity
+
+    def _update_entity(self, entity: _Entity, native_value: int | float | None) -> None:
+        """Update a sensor from its prebuilt key and description."""
+        device_key = entity.device_key
+        if device_key.key not in self._entities:
+            return
+        if self._precision >= 0 and isinstance(native_value, float):
+            native_value = round(native_value, self._precision)
+        self._sensor_values_updates[device_key] = SensorValue(
+            device_key, entity.name, native_value
+        )
+        self._sensor_descriptions_updates[device_key] = entity.description
+
+    def update_signal_strength(self, native_value: int | float) -> None:
+        """Quick update for the signal strength sensor."""
+        if self._device_id_to_type:
+            self._update_entity(SIGNAL_STRENGTH, native_value)
+
+    def _publish_frame(self, frame: DecodedFrame) -> None:
+        """Update the sensors from a decoded frame."""
+        update_entity = self._update_entity
+        update_entity(TEMPERATURE, frame.temperature)
+        update_entity(BATTERY, frame.battery_percentage)
+        update_entity(BATTERY_VOLTAGE, frame.battery_voltage)
+        if BUTTON_PRESSED_KEY.key in self._entities:
+            self._binary_sensor_values_updates[BUTTON_PRESSED_KEY] = BinarySensorValue(
+                BUTTON_PRESSED_KEY, "Button pressed", frame.button_pressed
+            )
+            self._binary_sensor_descriptions_updates[BUTTON_PRESSED_KEY] = (
+                BUTTON_PRESSED_DESCRIPTION
+            )
+        if self._adjust_level:
+            self._publish_tank_level(frame.tank_level)
+        else:
+            update_entity(TANK_LEVEL, frame.tank_level)
+        update_entity(ACCELEROMETER_X, frame.accelerometer_x)
+        update_entity(ACCELEROMETER_Y, frame.accelerometer_y)
+        reading_quality = frame.reading_quality
+        update_entity(READING_QUALITY_RAW, reading_quality)
+        update_entity(READING_QUALITY, round(reading_quality / 3 * 100))
+        # Reading stars = (3-reading_quality) * "★" + (reading_quality * "⭐")
 
-    def _start_update(self, service_info: BluetoothServiceInfo) -> None:
+    def _publish_restored(self, restored: bool) -> None:
+        """Update the binary sensor telling values come from a snapshot."""
+        if RESTORED_KEY.key in self._entities:
+            self._binary_sensor_values_updates[RESTORED_KEY] = BinarySensorValue(
+                RESTORED_KEY, "Restored", restored
+            )
+            self._binary_sensor_descriptions_updates[RESTORED_KEY] = (
+                RESTORED_DESCRIPTION
+            )
+
+    def _publish_tank_level(self, tank_level: float | None) -> None:
+        """Update the tank level as adjusted by the tank configuration."""
+        config = self._tank_config
+        if tank_level is not None:
+            tank_level += config.level_offset
+            published = self._published_level
+            if (
+                published is not None
+                and abs(tank_level - published) < config.level_deadband
+            ):
+                tank_level = published
+            self._published_level = tank_level
+        self._update_entity(TANK_LEVEL, tank_level)
+        if tank_height := config.tank_height:
+            self._update_entity(
+                TANK_FILL,
+                None
+                if tank_level is None
+                else round(min(100.0, max(0.0, tank_level / tank_height * 100)), 1),
+            )
+
+    def _publish_link(self, stats: LinkStats) -> None:
+        """Update the diagnostic sensors of the radio link."""
+        update_entity = self._update_entity
+        update_entity(RSSI_MEAN, round(stats.rssi_mean, 1))
+        update_entity(RSSI_STDDEV, round(stats.rssi_stddev, 1))
+        if stats.payload_interval is not None:
+            update_entity(PAYLOAD_INTERVAL, round(stats.payload_interval, 1))
+        if stats.repeat_interval is not None:
+            update_entity(REPEAT_INTERVAL, round(stats.repeat_interval, 1))
+        if stats.packet_loss is not None:
+            update_entity(PACKET_LOSS, round(stats.packet_loss * 100, 1))
+
+    def supported(self, data: BluetoothServiceInfo) -> bool:
+        """Return True if the device is supported.
+
+        Only the model and length are checked and the device info set, so
+        an advertisement passed to both ``supported`` and ``update`` is
+        decoded, counted and handed to reading callbacks once.
+        """
+        if (
+            MOKPEKA_PRO_SERVICE_UUID in data.service_uuids
+            and (payload := data.manufacturer_data.get(MOPEKA_MANUFACTURER))
+            and (device_type := _DEVICE_DISPATCH[payload[0]]) is not None
+            and len(payload) == device_type.adv_length
+            and self._identity != (identity := (data.address, payload[0]))
+        ):
+            self._set_identity(identity, device_type)
+        return bool(self._device_id_to_type)
+
+    def update(
+        self,
+        data: BluetoothServiceInfo,
+        timestamp: float | None = None,
+        medium: MediumType | None = None,
+    ) -> SensorUpdate:
+        """Update the device from an advertisement.
+
+        ``timestamp`` overrides the time the reading is stamped with and
+        ``medium`` the medium of the tank for this advertisement only,
+        for replaying recorded frames.
+        """
+        self._events_updates.clear()
+        self._start_update(data, timestamp, medium)
+        self.update_signal_strength(data.rssi)
+        return self._finish_update()
+
+    def _start_update(
+        self,
+        service_info: BluetoothServiceInfo,
+        timestamp: float | None = None,
+        medium: MediumType | None = None,
+    ) -> None:
         """Update from BLE advertisement data."""
+        if (metrics := self._metrics) is None:
+            self._decode(service_info, timestamp, medium)
+            return
+        metrics.record_seen()
+        start = time.perf_counter()
+        if self._decode(service_info, timestamp, medium):
+            metrics.record_latency(time.perf_counter() - start)
+
+    def _reject(self, reason: RejectReason, service_info: BluetoothServiceInfo) -> None:
+        """Account for an advertisement that was not decoded."""
+        if self._metrics is not None:
+            self._metrics.record_rejected(reason)
+        if self._rejected_sampler is not None:
+            self._rejected_sampler.offer(
+                reason,
+                service_info.address,
+                service_info.manufacturer_data.get(MOPEKA_MANUFACTURER, b""),
+            )
+
+    def _decode(
+        self,
+        service_info: BluetoothServiceInfo,
+        timestamp: float | None,
+        medium: MediumType | None,
+    ) -> bool:
+        """Decode BLE advertisement data and return True if it was decoded."""
+        if medium is None:
+            medium = self._medium_type
         _LOGGER.debug(
             "Parsing Mopeka IOT BLE advertisement data: %s, MediumType is: %s",
             service_info,
-            self._medium_type,
+            medium,
         )
         manufacturer_data = service_info.manufacturer_data
         service_uuids = service_info.service_uuids
@@ -123,80 +744,89 @@ class MopekaIOTBluetoothDeviceData(BluetoothData):
             or MOKPEKA_PRO_SERVICE_UUID not in service_uuids
         ):
             _LOGGER.debug("Not a Mopeka IOT BLE advertisement: %s", service_info)
-            return
+            self._reject(RejectReason.NOT_MOPEKA, service_info)
+            return False
         data = manufacturer_data[MOPEKA_MANUFACTURER]
+        if not data:
+            self._reject(RejectReason.WRONG_LENGTH, service_info)
+            return False
         model_num = data[0]
-        if not (device_type := DEVICE_TYPES.get(model_num)):
+        if (device_type := _DEVICE_DISPATCH[model_num]) is None:
             _LOGGER.debug("Unsupported Mopeka IOT BLE advertisement: %s", service_info)
-            return
-        adv_length = device_type.adv_length
-        if len(data) != adv_length:
-            return
-
-        self.set_device_manufacturer("Mopeka IOT")
-        self.set_device_type(device_type.model)
-        self.set_device_name(f"{device_type.name} {short_address(address)}")
-        battery = data[1]
-        battery_voltage = battery_to_voltage(battery)
-        battery_percentage = battery_to_percentage(battery)
-        button_pressed = bool(data[2] & 0x80 > 0)
-        temp = data[2] & 0x7F
-        temp_celsius = temp_to_celsius(temp)
-        tank_level = ((int(data[4]) << 8) + data[3]) & 0x3FFF
-        tank_level_mm = tank_level_and_temp_to_mm(tank_level, temp, self._medium_type)
-        reading_quality = data[4] >> 6
-        accelerometer_x = data[8]
-        accelerometer_y = data[9]
-
-        self.update_predefined_sensor(SensorLibrary.TEMPERATURE__CELSIUS, temp_celsius)
-        self.update_predefined_sensor(
-            SensorLibrary.BATTERY__PERCENTAGE, battery_percentage
-        )
-        self.update_predefined_sensor(
-            SensorLibrary.VOLTAGE__ELECTRIC_POTENTIAL_VOLT,
-            battery_voltage,
-            name="Battery Voltage",
-            key="battery_voltage",
+            self._reject(RejectReason.UNSUPPORTED_MODEL, service_info)
+            return False
+        if len(data) != device_type.adv_length:
+            self._reject(RejectReason.WRONG_LENGTH, service_info)
+            return False
+
+        if self._identity != (identity := (address, model_num)):
+            self._set_identity(identity, device_type)
+        frame = device_type.decoder(data, medium)
+        self._publish_frame(frame)
+        if self._restored:
+            self._restored = False
+            self._publish_restored(False)
+        if timestamp is None:
+            timestamp = time.time()
+        self._last_frame = (
+            timestamp,
+            address,
+            service_info.source,
+            service_info.rssi,
+            medium,
+            data,
         )
-        self.update_predefined_binary_sensor(
-            BinarySensorDeviceClass.OCCUPANCY,
-            button_pressed,
-            key="button_pressed",
-            name="Button pressed",
-        )
-        self.update_sensor(
-            "tank_level",
-            Units.LENGTH_MILLIMETERS,
-            tank_level_mm if reading_quality >= 1 else None,
-            SensorDeviceClass.DISTANCE,
-            "Tank Level",
-        )
-        self.update_sensor(
-            "accelerometer_x",
-            None,
-            accelerometer_x,
-            None,
-            "Position X",
-        )
-        self.update_sensor(
-            "accelerometer_y",
-            None,
-            accelerometer_y,
-            None,
-            "Position Y",
-        )
-        self.update_sensor(
-            "reading_quality_raw",
-            None,
-            reading_quality,
-            None,
-            "Reading quality raw",
-        )
-        self.update_sensor(
-            "reading_quality",
-            Units.PERCENTAGE,
-            round(reading_quality / 3 * 100),
-            None,
-            "Reading quality",
-        )
-        # Reading stars = (3-reading_quality) * "★" + (reading_quality * "⭐")
+        reading_quality = frame.reading_quality
+        accelerometer_x = frame.accelerometer_x
+        accelerometer_y = frame.accelerometer_y
+        if self._movement_detector is not None and (
+            event := self._movement_detector.update(
+                address, accelerometer_x, accelerometer_y
+            )
+        ):
+            self.fire_event(
+                "movement",
+                event.value,
+                {
+                    "accelerometer_x": accelerometer_x,
+                    "accelerometer_y": accelerometer_y,
+                },
+                name="Movement",
+            )
+        if self._consumption_estimator is not None and (
+            estimate := self._consumption_estimator.update(
+                address, timestamp, frame.tank_level, reading_quality
+            )
+        ):
+            self._update_entity(CONSUMPTION_RATE, round(estimate.consumption_rate, 2))
+            if estimate.time_to_empty is not None:
+                self._update_entity(TIME_TO_EMPTY, round(estimate.time_to_empty, 1))
+        if self._battery_model is not None and (
+            battery := self._battery_model.update(
+                address, timestamp, frame.battery_voltage, frame.temperature
+            )
+        ):
+            if battery.remaining_days is not None:
+                self._update_entity(BATTERY_REMAINING, round(battery.remaining_days, 1))
+        if self._link_tracker is not None:
+            self._publish_link(
+                self._link_tracker.update(address, timestamp, service_info.rssi, data)
+            )
+        if self._metrics is not None:
+            self._metrics.record_accepted(device_type.model, reading_quality)
+        if self._reading_callbacks:
+            reading = MopekaReading(
+                timestamp,
+                address,
+                service_info.source,
+                service_info.rssi,
+                model_num,
+                device_type.model,
+                device_type.name,
+                medium,
+                *frame,
+                bytes(data),
+            )
+            for callback in self._reading_callbacks:
+                callback(reading)
+        return True
@@ -0,0 +1,179 @@
+"""Sliding window reading quality distributions per device.
+
+MIT License applies.
+"""
+
+from __future__ import annotations
+
+import math
+import time
+from collections import deque
+from typing import NamedTuple
+
+from .models import MopekaReading
+
+DEFAULT_WINDOW = 86400.0
+DEFAULT_BUCKET = 3600.0
+DEFAULT_MIN_SAMPLES = 20
+
+QUALITY_LEVELS = 4
+
+# Counters kept per bucket: one per quality level, then readings without
+# a tank level and changes of quality from the previous reading.
+_NO_LEVEL = QUALITY_LEVELS
+_TRANSITIONS = QUALITY_LEVELS + 1
+_COUNTERS = QUALITY_LEVELS + 2
+
+
+class QualityStats(NamedTuple):
+    """Reading quality of a device, or the fleet, over the window."""
+
+    samples: int
+    quality_counts: tuple[int, ...]
+    no_level: int
+    transitions: int
+
+    @property
+    def poor_ratio(self) -> float:
+        """Return the share of readings with a quality of 0 or 1."""
+        if not self.samples:
+            return 0.0
+        return (self.quality_counts[0] + self.quality_counts[1]) / self.samples
+
+    @property
+    def mean_quality(self) -> float:
+        """Return the mean reading quality from 0 to 3."""
+        if not self.samples:
+            return 0.0
+        return (
+            sum(quality * count for quality, count in enumerate(self.quality_counts))
+            / self.samples
+        )
+
+
+def _stats(totals: list[int]) -> QualityStats:
+    return QualityStats(
+        sum(totals[:QUALITY_LEVELS]),
+        tuple(totals[:QUALITY_LEVELS]),
+        totals[_NO_LEVEL],
+        totals[_TRANSITIONS],
+    )
+
+
+class _DeviceQuality:
+    __slots__ = ("buckets", "last_quality", "totals")
+
+    def __init__(self) -> None:
+        self.buckets: deque[tuple[int, list[int]]] = deque()
+        self.totals = [0] * _COUNTERS
+        self.last_quality: int | None = None
+
+    def expire(self, oldest: int) -> None:
+        buckets = self.buckets
+        totals = self.totals
+        while buckets and buckets[0][0] < oldest:
+            for index, count in enumerate(buckets.popleft()[1]):
+                totals[index] -= count
+
+
+class QualityTracker:
+    """Keep the reading quality distribution of every device.
+
+    The tracker is a reading callback. Readings are counted into
+    ``bucket`` second buckets and the buckets older than ``window``
+    seconds are subtracted from the running totals, so a reading costs a
+    few list increments and the distribution of a device is ready
+    without going over its readings.
+
+    Besides the count of every quality level the tracker counts readings
+    without a tank level and how often the quality changed, which points
+    at sensors that are mounted badly rather than on an empty tank.
+    """
+
+    def __init__(
+        self, window: float = DEFAULT_WINDOW, bucket: float = DEFAULT_BUCKET
+    ) -> None:
+        self._bucket = bucket
+        self._window_buckets = max(1, math.ceil(window / bucket))
+        self._devices: dict[str, _DeviceQuality] = {}
+
+    def __len__(self) -> int:
+        """Return the number of tracked devices."""
+        return len(self._devices)
+
+    def __call__(self, reading: MopekaReading) -> None:
+        """Count a reading."""
+        self.update(
+            reading.address,
+            reading.timestamp,
+            reading.reading_quality,
+            reading.tank_level is None,
+        )
+
+    def update(
+        self, address: str, timestamp: float, reading_quality: int, no_level: bool
+    ) -> None:
+        """Count a reading of a device."""
+        if (device := self._devices.get(address)) is None:
+            device = self._devices[address] = _DeviceQuality()
+        index = int(timestamp // self._bucket)
+        buckets = device.buckets
+        if buckets and buckets[-1][0] >= index:
+            counts = buckets[-1][1]
+        else:
+            counts = [0] * _COUNTERS
+            buckets.append((index, counts))
+            device.expire(index - self._window_buckets + 1)
+        totals = device.totals
+        counts[reading_quality] += 1
+        totals[reading_quality] += 1
+        if no_level:
+            counts[_NO_LEVEL] += 1
+            totals[_NO_LEVEL] += 1
+        if device.last_quality is not None and device.last_quality != reading_quality:
+            counts[_TRANSITIONS] += 1
+            totals[_TRANSITIONS] += 1
+        device.last_quality = reading_quality
+
+    def forget(self, address: str) -> None:
+        """Drop the counts of a device."""
+        self._devices.pop(address, None)
+
+    def _oldest(self, now: float | None) -> int:
+        if now is None:
+            now = time.time()
+        return int(now // self._bucket) - self._window_buckets + 1
+
+    def stats(self, address: str, now: float | None = None) -> QualityStats | None:
+        """Return the reading quality of a device over the window up to now."""
+        if (device := self._devices.get(address)) is None:
+            return None
+        device.expire(self._oldest(now))
+        return _stats(device.totals)
+
+    def totals(self, now: float | None = None) -> QualityStats:
+        """Return the reading quality of the whole fleet."""
+        oldest = self._oldest(now)
+        totals = [0] * _COUNTERS
+        for device in self._devices.values():
+            device.expire(oldest)
+            for index, count in enumerate(device.totals):
+                totals[index] += count
+        return _stats(totals)
+
+    def ranked(
+        self, min_samples: int = DEFAULT_MIN_SAMPLES, now: float | None = None
+    ) -> list[tuple[str, QualityStats]]:
+        """Return the devices with enough samples, worst quality first.
+
+        Devices are ordered by their share of poor readings, then by how
+        often their quality changed.
+        """
+        oldest = self._oldest(now)
+        ranked: list[tuple[str, QualityStats]] = []
+        for address, device in self._devices.items():
+            device.expire(oldest)
+            if (stats := _stats(device.totals)).samples >= min_samples:
+                ranked.append((address, stats))
+        ranked.sort(key=lambda item: (-item[1].poor_ratio, -item[1].transitions))
+        return ranked
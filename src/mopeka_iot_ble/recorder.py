@@ -0,0 +1,264 @@
+"""Append-only recording and replay of raw Mopeka IOT frames.
+
+A recording is a header (magic "MOPL" and a version byte) followed by
+frame records in the same layout as snapshot records::
+
+    record  timestamp (f64), rssi (i8), medium (u8),
+            address length (u8), source length (u8), payload length (u8),
+            address (utf-8), source (utf-8), payload
+
+A record cut short by a crash ends the recording without an error, and
+is cut off when the recording is opened for writing again.
+
+MIT License applies.
+"""
+
+from __future__ import annotations
+
+import os
+import struct
+import time
+from collections.abc import Iterator
+from pathlib import Path
+from typing import IO
+
+from home_assistant_bluetooth import BluetoothServiceInfo
+from sensor_state_data import SensorUpdate
+
+from .fleet import MopekaIOTFleet
+from .models import FrameRecord, MopekaReading
+from .parser import (
+    MOKPEKA_PRO_SERVICE_UUID,
+    MOPEKA_MANUFACTURER,
+    MopekaIOTBluetoothDeviceData,
+)
+from .snapshot import FRAME_RECORD, MEDIUM_IDS, SnapshotError, medium_from_id
+
+RECORDING_MAGIC = b"MOPL"
+RECORDING_VERSION = 1
+DEFAULT_BUFFER_SIZE = 1 << 16
+DEFAULT_SYNC_INTERVAL = 5.0
+READ_CHUNK_SIZE = 1 << 20
+
+_HEADER = struct.Struct("<4sB")
+
+
+class FrameRecorder:
+    """Append every accepted frame to a recording.
+
+    The recorder is a reading callback, so it can be fed straight from
+    the parser or the fleet::
+
+        recorder = FrameRecorder("capture.mopl")
+        fleet.register_reading_callback(recorder)
+
+    Records are written through a ``buffer_size`` byte buffer and the
+    file is flushed and fsynced every ``sync_interval`` seconds, so at
+    most that much of a capture is lost if the host goes down.
+    """
+
+    def __init__(
+        self,
+        path: str | os.PathLike[str],
+        buffer_size: int = DEFAULT_BUFFER_SIZE,
+        sync_interval: float | None = DEFAULT_SYNC_INTERVAL,
+    ) -> None:
+        self._path = Path(path)
+        self._buffer_size = buffer_size
+        self._sync_interval = sync_interval
+        self._file: IO[bytes] | None = None
+        self._last_sync = 0.0
+        self._encoded: dict[str, bytes] = {}
+
+    @property
+    def path(self) -> Path:
+        """Return the path of the recording."""
+        return self._path
+
+    def __call__(self, reading: MopekaReading) -> None:
+        """Record the frame of a reading."""
+        self.write(
+            FrameRecord(
+                reading.timestamp,
+                reading.address,
+                reading.source,
+                reading.rssi,
+                reading.medium,
+                reading.raw,
+            )
+        )
+
+    def __enter__(self) -> FrameRecorder:
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def _encode(self, text: str) -> bytes:
+        if (encoded := self._encoded.get(text)) is None:
+            if len(self._encoded) >= 4096:
+                self._encoded.clear()
+            encoded = self._encoded[text] = text.encode()
+        return encoded
+
+    def write(self, record: FrameRecord) -> None:
+        """Append a frame record."""
+        if (file := self._file) is None:
+            file = self._open()
+        address = self._encode(record.address)
+        source = self._encode(record.source)
+        payload = record.payload
+        file.write(
+            FRAME_RECORD.pack(
+                record.timestamp,
+                max(-128, min(127, record.rssi)),
+                MEDIUM_IDS[record.medium],
+                len(address),
+                len(source),
+                len(payload),
+            )
+        )
+        file.write(address)
+        file.write(source)
+        file.write(payload)
+        if (
+            self._sync_interval is not None
+            and time.monotonic() - self._last_sync >= self._sync_interval
+        ):
+            self.sync()
+
+    def sync(self) -> None:
+        """Flush the buffer and fsync the recording to disk."""
+        if self._file is not None:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+        self._last_sync = time.monotonic()
+
+    def close(self) -> None:
+        """Sync and close the recording."""
+        if self._file is not None:
+            self.sync()
+            self._file.close()
+            self._file = None
+
+    def _open(self) -> IO[bytes]:
+        try:
+            with open(self._path, "r+b") as existing:
+                # Drop a record torn by a crash, new records go after it.
+                length = _complete_length(existing)
+                if length < existing.seek(0, os.SEEK_END):
+                    existing.truncate(length)
+        except FileNotFoundError:
+            pass
+        file = open(self._path, "ab", buffering=self._buffer_size)  # noqa: SIM115
+        if not file.tell():
+            file.write(_HEADER.pack(RECORDING_MAGIC, RECORDING_VERSION))
+        self._file = file
+        self._last_sync = time.monotonic()
+        return file
+
+
+def _check_header(header: bytes) -> None:
+    magic, version = _HEADER.unpack(header)
+    if magic != RECORDING_MAGIC:
+        raise SnapshotError("Not a Mopeka recording")
+    if version != RECORDING_VERSION:
+        raise SnapshotError(f"Unsupported recording version {version}")
+
+
+def _complete_length(file: IO[bytes]) -> int:
+    """Return the length of a recording up to its last complete record."""
+    header = file.read(_HEADER.size)
+    if len(header) < _HEADER.size:
+        return 0
+    _check_header(header)
+    unpack_from = FRAME_RECORD.unpack_from
+    record_size = FRAME_RECORD.size
+    length = _HEADER.size
+    data = b""
+    while chunk := file.read(READ_CHUNK_SIZE):
+        data = data + chunk if data else chunk
+        offset = 0
+        while offset + record_size <= len(data):
+            *_, address_len, source_len, payload_len = unpack_from(data, offset)
+            end = offset + record_size + address_len + source_len + payload_len
+            if end > len(data):
+                break
+            offset = end
+        length += offset
+        data = data[offset:]
+    return length
+
+
+def read_recording(path: str | os.PathLike[str]) -> Iterator[FrameRecord]:
+    """Read the frame records of a recording in order.
+
+    Raises SnapshotError if the file is not a recording or a record is
+    corrupt.
+    """
+    with open(path, "rb") as file:
+        header = file.read(_HEADER.size)
+        if len(header) < _HEADER.size:
+            return
+        _check_header(header)
+        unpack_from = FRAME_RECORD.unpack_from
+        record_size = FRAME_RECORD.size
+        data = b""
+        while chunk := file.read(READ_CHUNK_SIZE):
+            data = data + chunk if data else chunk
+            view = memoryview(data)
+            offset = 0
+            while offset + record_size <= len(data):
+                timestamp, rssi, medium_id, address_len, source_len, payload_len = (
+                    unpack_from(data, offset)
+                )
+                address_start = offset + record_size
+                source_start = address_start + address_len
+                payload_start = source_start + source_len
+                end = payload_start + payload_len
+                if end > len(data):
+                    break
+                try:
+                    record = FrameRecord(
+                        timestamp,
+                        str(view[address_start:source_start], "utf-8"),
+                        str(view[source_start:payload_start], "utf-8"),
+                        rssi,
+                        medium_from_id(medium_id),
+                        bytes(view[payload_start:end]),
+                    )
+                except UnicodeDecodeError as ex:
+                    raise SnapshotError(f"Recording is corrupt: {ex}") from ex
+                yield record
+                offset = end
+            view.release()
+            data = data[offset:]
+
+
+def record_to_service_info(record: FrameRecord) -> BluetoothServiceInfo:
+    """Rebuild the advertisement a frame record was decoded from."""
+    return BluetoothServiceInfo(
+        name="",
+        address=record.address,
+        rssi=record.rssi,
+        manufacturer_data={MOPEKA_MANUFACTURER: record.payload},
+        service_uuids=[MOKPEKA_PRO_SERVICE_UUID],
+        service_data={},
+        source=record.source,
+    )
+
+
+def replay(
+    path: str | os.PathLike[str],
+    target: MopekaIOTBluetoothDeviceData | MopekaIOTFleet,
+) -> Iterator[SensorUpdate | None]:
+    """Feed the frames of a recording through a parser or a fleet.
+
+    Yields the update for every frame. Frames are replayed as fast as
+    they are consumed, each stamped with the time it was recorded at and
+    decoded for the medium it was recorded with.
+    """
+    for record in read_recording(path):
+        yield target.update(
+            record_to_service_info(record), record.timestamp, record.medium
+        )
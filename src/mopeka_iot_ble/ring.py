@@ -0,0 +1,254 @@
+"""Shared memory ring buffer to hand frames from a capture process to decoders.
+
+One producer writes fixed size records into a ring in shared memory and
+any number of consumers in other processes decode them straight out of
+the shared buffer, so nothing is pickled on the way.
+
+Layout (little endian)::
+
+    header  magic "MOPR", version (u8), record size (u32), capacity (u32),
+            write sequence (u64 at offset 16), padded to 64 bytes
+    record  sequence (u64), timestamp (f64), rssi (i8), medium (u8),
+            address (6 bytes), payload length (u8), payload (16 bytes),
+            padded to 48 bytes
+
+Every record carries its sequence number, which is zeroed while the
+producer rewrites the slot. A consumer that finds a different sequence
+after decoding knows the producer lapped it and drops the record.
+
+MIT License applies.
+"""
+
+from __future__ import annotations
+
+import struct
+import sys
+import time
+from multiprocessing import shared_memory
+from typing import NamedTuple, cast
+
+from .models import MediumType
+from .parser import DecodedFrame, MopekaDevice, decode_payload
+from .snapshot import MEDIUM_IDS, MEDIUMS
+
+RING_MAGIC = b"MOPR"
+RING_VERSION = 1
+DEFAULT_CAPACITY = 65536
+MAX_PAYLOAD = 16
+
+_HEADER = struct.Struct("<4sB3xII")
+_WRITE_SEQUENCE = struct.Struct("<Q")
+_WRITE_SEQUENCE_OFFSET = 16
+_HEADER_SIZE = 64
+_RECORD = struct.Struct("<QdbB6sB")
+_RECORD_SIZE = 48
+
+
+class RingFrame(NamedTuple):
+    """A frame decoded out of the ring."""
+
+    timestamp: float
+    address: str
+    rssi: int
+    medium: MediumType
+    device_type: MopekaDevice
+    frame: DecodedFrame
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    """Attach to an existing segment, leaving its cleanup to the producer.
+
+    Before Python 3.13 attaching always registers the segment with the
+    resource tracker. Consumers started through ``multiprocessing`` share
+    the producer's tracker, so that only cleans up after a crash; a
+    consumer with its own tracker unlinks the ring when it exits.
+    """
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name, track=False)
+    return shared_memory.SharedMemory(name)
+
+
+class FrameRingWriter:
+    """Create a ring and write frames into it, the single producer side."""
+
+    def __init__(
+        self, capacity: int = DEFAULT_CAPACITY, name: str | None = None
+    ) -> None:
+        if capacity < 1:
+            raise ValueError("Capacity must be at least 1")
+        self._capacity = capacity
+        self._shm = shared_memory.SharedMemory(
+            name, create=True, size=_HEADER_SIZE + capacity * _RECORD_SIZE
+        )
+        self._buf = cast(memoryview, self._shm.buf)
+        _HEADER.pack_into(
+            self._buf, 0, RING_MAGIC, RING_VERSION, _RECORD_SIZE, capacity
+        )
+        self._sequence = 0
+        self._macs: dict[str, bytes] = {}
+
+    @property
+    def name(self) -> str:
+        """Return the name consumers attach with."""
+        return self._shm.name
+
+    @property
+    def capacity(self) -> int:
+        """Return the number of records the ring holds."""
+        return self._capacity
+
+    def write(
+        self,
+        address: str,
+        rssi: int,
+        payload: bytes,
+        medium: MediumType = MediumType.PROPANE,
+        timestamp: float | None = None,
+    ) -> int:
+        """Write a frame and return its sequence number."""
+        if len(payload) > MAX_PAYLOAD:
+            raise ValueError(f"Payload is longer than {MAX_PAYLOAD} bytes")
+        if (mac := self._macs.get(address)) is None:
+            mac = self._macs[address] = bytes.fromhex(address.replace(":", ""))
+        sequence = self._sequence + 1
+        buf = self._buf
+        offset = _HEADER_SIZE + ((sequence - 1) % self._capacity) * _RECORD_SIZE
+        _WRITE_SEQUENCE.pack_into(buf, offset, 0)
+        _RECORD.pack_into(
+            buf,
+            offset,
+            0,
+            time.time() if timestamp is None else timestamp,
+            max(-128, min(127, rssi)),
+            MEDIUM_IDS[medium],
+            mac,
+            len(payload),
+        )
+        start = offset + _RECORD.size
+        end = start + len(payload)
+        buf[start:end] = payload
+        _WRITE_SEQUENCE.pack_into(buf, offset, sequence)
+        _WRITE_SEQUENCE.pack_into(buf, _WRITE_SEQUENCE_OFFSET, sequence)
+        self._sequence = sequence
+        return sequence
+
+    def close(self) -> None:
+        """Close and unlink the ring; attached consumers keep their mapping."""
+        del self._buf
+        self._shm.close()
+        self._shm.unlink()
+
+    def __enter__(self) -> FrameRingWriter:
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+
+class FrameRingReader:
+    """Attach to a ring by name and decode the frames written to it.
+
+    Readers only read the shared memory, so any number of them can follow
+    one ring. Each keeps its own position; a reader that falls more than
+    a ring behind skips to the oldest record still there and counts the
+    skipped ones in ``dropped``.
+
+    With ``shards`` greater than one a reader only decodes the addresses
+    of its ``shard``, so several processes can split one ring while every
+    device is still decoded in order by the same process.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        shard: int = 0,
+        shards: int = 1,
+        from_start: bool = False,
+    ) -> None:
+        if not 0 <= shard < shards:
+            raise ValueError("Shard must be between 0 and shards - 1")
+        self._shm = _attach(name)
+        self._buf = cast(memoryview, self._shm.buf)
+        magic, version, record_size, capacity = _HEADER.unpack_from(self._buf)
+        if magic != RING_MAGIC or version != RING_VERSION:
+            self.close()
+            raise ValueError(f"{name} is not a Mopeka frame ring")
+        if record_size != _RECORD_SIZE:
+            self.close()
+            raise ValueError(f"Unsupported record size {record_size}")
+        self._capacity = capacity
+        self._shard = shard
+        self._shards = shards
+        self._position = 1 if from_start else self._write_sequence() + 1
+        self._addresses: dict[bytes, str | None] = {}
+        self.dropped = 0
+        self.rejected = 0
+
+    def _write_sequence(self) -> int:
+        (sequence,) = _WRITE_SEQUENCE.unpack_from(self._buf, _WRITE_SEQUENCE_OFFSET)
+        return cast(int, sequence)
+
+    def _address(self, mac: bytes) -> str | None:
+        """Return the address of a MAC, or None if it is not in our shard."""
+        address = None
+        if int.from_bytes(mac, "big") % self._shards == self._shard:
+            address = ":".join(f"{byte:02X}" for byte in mac)
+        self._addresses[mac] = address
+        return address
+
+    def read(self, limit: int | None = None) -> list[RingFrame]:
+        """Decode the frames written since the last read, oldest first."""
+        buf = self._buf
+        capacity = self._capacity
+        record_size = _RECORD_SIZE
+        payload_offset = _RECORD.size
+        unpack_from = _RECORD.unpack_from
+        sequence_from = _WRITE_SEQUENCE.unpack_from
+        addresses = self._addresses
+        mediums = MEDIUMS
+        end = self._write_sequence()
+        position = self._position
+        if end - position >= capacity:
+            self.dropped += end - capacity + 1 - position
+            position = end - capacity + 1
+        if limit is not None:
+            end = min(end, position + limit - 1)
+        frames: list[RingFrame] = []
+        for sequence in range(position, end + 1):
+            offset = _HEADER_SIZE + ((sequence - 1) % capacity) * record_size
+            slot_sequence, timestamp, rssi, medium_id, mac, length = unpack_from(
+                buf, offset
+            )
+            if slot_sequence != sequence:
+                self.dropped += 1
+                continue
+            if mac in addresses:
+                address = addresses[mac]
+            else:
+                address = self._address(mac)
+            if address is None:
+                continue
+            medium = mediums[medium_id]
+            start = offset + payload_offset
+            stop = start + length
+            decoded = decode_payload(buf[start:stop], medium)
+            if sequence_from(buf, offset)[0] != sequence:
+                self.dropped += 1
+                continue
+            if decoded is None:
+                self.rejected += 1
+                continue
+            frames.append(RingFrame(timestamp, address, rssi, medium, *decoded))
+        self._position = end + 1
+        return frames
+
+    def close(self) -> None:
+        """Detach from the ring, leaving it to the producer to unlink."""
+        del self._buf
+        self._shm.close()
+
+    def __enter__(self) -> FrameRingReader:
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
@@ -0,0 +1,141 @@
+"""Sampled capture of advertisements the parser could not decode.
+
+MIT License applies.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import random
+import time
+from collections.abc import Iterable
+from dataclasses import dataclass
+
+from .models import RejectReason
+
+DEFAULT_CAPACITY = 64
+DEFAULT_RATE = 10.0
+DEFAULT_REASONS = frozenset((RejectReason.UNSUPPORTED_MODEL, RejectReason.WRONG_LENGTH))
+
+
+@dataclass(slots=True)
+class RejectedPayload:
+    """A sampled advertisement that was not decoded."""
+
+    timestamp: float
+    address: str
+    reason: RejectReason
+    payload: bytes
+
+
+class _Reservoir:
+    """Uniform reservoir sample of one rejection reason."""
+
+    __slots__ = ("items", "seen")
+
+    def __init__(self) -> None:
+        self.items: list[RejectedPayload] = []
+        self.seen = 0
+
+
+class RejectedPayloadSampler:
+    """Keep a bounded, rate limited sample of rejected payloads.
+
+    Every rejection reason has its own reservoir of at most ``capacity``
+    payloads so a flood of one kind of frame cannot push out a rare new
+    model ID. Each reservoir is a uniform sample (algorithm R) of
+    everything offered to it. Storing a payload copies the bytes, so
+    stores are limited to ``rate`` per second with a burst of
+    ``capacity``; offers beyond that are only counted.
+    """
+
+    def __init__(
+        self,
+        capacity: int = DEFAULT_CAPACITY,
+        rate: float = DEFAULT_RATE,
+        reasons: Iterable[RejectReason] = DEFAULT_REASONS,
+        seed: int | None = None,
+    ) -> None:
+        self._capacity = capacity
+        self._rate = rate
+        wanted = set(reasons)
+        self._reservoirs = {
+            reason: _Reservoir() for reason in RejectReason if reason in wanted
+        }
+        self._random = random.Random(seed)  # nosec
+        self._tokens = float(capacity)
+        self._last_refill = time.monotonic()
+
+    def seen(self, reason: RejectReason) -> int:
+        """Return how many payloads were offered for a reason."""
+        if (reservoir := self._reservoirs.get(reason)) is None:
+            return 0
+        return reservoir.seen
+
+    def offer(self, reason: RejectReason, address: str, payload: bytes) -> bool:
+        """Offer a rejected payload, return True if it was stored."""
+        if (reservoir := self._reservoirs.get(reason)) is None:
+            return False
+        reservoir.seen += 1
+        items = reservoir.items
+        if len(items) < self._capacity:
+            slot = len(items)
+        elif (slot := self._random.randrange(reservoir.seen)) >= self._capacity:
+            return False
+        if not self._take_token():
+            return False
+        sample = RejectedPayload(time.time(), address, reason, bytes(payload))
+        if slot == len(items):
+            items.append(sample)
+        else:
+            items[slot] = sample
+        return True
+
+    def _take_token(self) -> bool:
+        now = time.monotonic()
+        self._tokens = min(
+            float(self._capacity),
+            self._tokens + (now - self._last_refill) * self._rate,
+        )
+        self._last_refill = now
+        if self._tokens < 1.0:
+            return False
+        self._tokens -= 1.0
+        return True
+
+    def samples(self, reason: RejectReason | None = None) -> list[RejectedPayload]:
+        """Return the sampled payloads, optionally for a single reason."""
+        if reason is not None:
+            reservoir = self._reservoirs.get(reason)
+            return list(reservoir.items) if reservoir else []
+        return [
+            sample
+            for reservoir in self._reservoirs.values()
+            for sample in reservoir.items
+        ]
+
+    def clear(self) -> None:
+        """Drop all samples and counts."""
+        for reservoir in self._reservoirs.values():
+            reservoir.items.clear()
+            reservoir.seen = 0
+
+    def dump(self, path: str | os.PathLike[str]) -> int:
+        """Write the samples to a NDJSON file and return how many were written."""
+        samples = self.samples()
+        with open(path, "w", encoding="utf-8") as file:
+            for sample in samples:
+                file.write(
+                    json.dumps(
+                        {
+                            "timestamp": sample.timestamp,
+                            "address": sample.address,
+                            "reason": sample.reason.value,
+                            "payload": sample.payload.hex(),
+                        },
+                        separators=(",", ":"),
+                    )
+                    + "\n"
+                )
+        return len(samples)
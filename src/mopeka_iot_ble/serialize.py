@@ -0,0 +1,275 @@
+"""JSON serialization of the latest sensor updates of a fleet.
+
+A fleet snapshot maps every address to its device and entities::
+
+    {"C9:F3:32:E0:F5:09": {"title": ..., "name": ..., "model": ...,
+        "sensors": {"temperature": {"unit": "°C",
+            "device_class": "temperature", "value": 27}, ...},
+        "binary_sensors": {"button_pressed": {
+            "device_class": "occupancy", "value": false}}}}
+
+Keys of entities of a sub device are suffixed with its device ID. The
+output is compact UTF-8 JSON.
+
+MIT License applies.
+"""
+
+from __future__ import annotations
+
+import json
+import math
+from collections.abc import Mapping
+from datetime import date
+from decimal import Decimal
+from enum import Enum
+from typing import Any
+
+from sensor_state_data import (
+    BinarySensorDescription,
+    BinarySensorValue,
+    DeviceKey,
+    SensorDescription,
+    SensorUpdate,
+    SensorValue,
+)
+
+from .parser import (
+    BUTTON_PRESSED_DESCRIPTION,
+    BUTTON_PRESSED_KEY,
+    RESTORED_DESCRIPTION,
+    RESTORED_KEY,
+    SENSOR_DESCRIPTIONS,
+)
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None  # type: ignore[assignment]
+
+_SEPARATORS = (",", ":")
+
+
+def _default(value: Any) -> Any:
+    """Encode the native values json does not know."""
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, Enum):
+        return value.value
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _dumps(value: Any) -> str:
+    return json.dumps(
+        value, default=_default, ensure_ascii=False, separators=_SEPARATORS
+    )
+
+
+def _entity_key(device_key: DeviceKey) -> str:
+    if device_key.device_id is None:
+        return device_key.key
+    return f"{device_key.key}_{device_key.device_id}"
+
+
+def _description_dict(
+    description: SensorDescription | BinarySensorDescription | None,
+) -> dict[str, Any]:
+    if description is None:
+        return {}
+    fields: dict[str, Any] = {}
+    if isinstance(description, SensorDescription):
+        unit = description.native_unit_of_measurement
+        fields["unit"] = None if unit is None else unit.value
+    device_class = description.device_class
+    fields["device_class"] = None if device_class is None else device_class.value
+    return fields
+
+
+def update_to_dict(update: SensorUpdate) -> dict[str, Any]:
+    """Return the snapshot entry of a device as plain JSON types."""
+    device = update.devices.get(None)
+    return {
+        "title": update.title,
+        "name": None if device is None else device.name,
+        "model": None if device is None else device.model,
+        "sensors": {
+            _entity_key(device_key): {
+                **_description_dict(update.entity_descriptions.get(device_key)),
+                "value": value.native_value,
+            }
+            for device_key, value in update.entity_values.items()
+        },
+        "binary_sensors": {
+            _entity_key(device_key): {
+                **_description_dict(update.binary_entity_descriptions.get(device_key)),
+                "value": value.native_value,
+            }
+            for device_key, value in update.binary_entity_values.items()
+        },
+    }
+
+
+def fleet_to_json(updates: Mapping[str, SensorUpdate]) -> bytes:
+    """Serialize a fleet snapshot through plain dicts and ``json.dumps``.
+
+    This is the generic path, kept as the reference for
+    ``FleetSerializer``.
+    """
+    return _dumps(
+        {address: update_to_dict(update) for address, update in updates.items()}
+    ).encode()
+
+
+class FleetSerializer:
+    """Serialize fleet snapshots to JSON in one pass.
+
+    The parser publishes a fixed set of entities whose keys and
+    descriptions are module constants shared by all devices, so the JSON
+    of everything but the value is built once per entity and looked up
+    by the identity of the key, without hashing the key dataclass.
+    Device headers are cached by name and model, and ints, floats,
+    bools and None are written without going through ``json``. Entities
+    outside the parser's set take the generic path. The output matches
+    ``fleet_to_json`` byte for byte.
+
+    With ``orjson`` installed and ``use_orjson`` left on, the values are
+    instead put into prebuilt dicts per entity and the snapshot is
+    encoded by ``orjson``. That is faster still, but ``orjson`` writes
+    very small or large floats with a shorter exponent and NaN as null.
+    """
+
+    def __init__(self, use_orjson: bool = True) -> None:
+        self._use_orjson = use_orjson and orjson is not None
+        self._headers: dict[tuple[str | None, str | None, str | None], str] = {}
+        self._prefixes: dict[int, str] = {}
+        self._templates: dict[int, tuple[str, dict[str, Any]]] = {}
+        known: dict[DeviceKey, SensorDescription | BinarySensorDescription] = {
+            **SENSOR_DESCRIPTIONS,
+            BUTTON_PRESSED_KEY: BUTTON_PRESSED_DESCRIPTION,
+            RESTORED_KEY: RESTORED_DESCRIPTION,
+        }
+        for device_key, description in known.items():
+            self._prefixes[id(device_key)] = _entity_prefix(device_key, description)
+            self._templates[id(device_key)] = (
+                _entity_key(device_key),
+                _description_dict(description),
+            )
+
+    def dumps(self, updates: Mapping[str, SensorUpdate]) -> bytes:
+        """Return the JSON of a fleet snapshot."""
+        if self._use_orjson:
+            return self._dumps_orjson(updates)
+        parts: list[str] = []
+        append = parts.append
+        separator = "{"
+        for address, update in updates.items():
+            append(separator)
+            append(_dumps(address))
+            append(":")
+            append(self._header(update))
+            self._append_entities(
+                parts, update.entity_values, update.entity_descriptions
+            )
+            append('},"binary_sensors":{')
+            self._append_entities(
+                parts, update.binary_entity_values, update.binary_entity_descriptions
+            )
+            append("}}")
+            separator = ","
+        append("}" if parts else "{}")
+        return "".join(parts).encode()
+
+    def _header(self, update: SensorUpdate) -> str:
+        """Return the JSON of a device up to the open sensors object."""
+        # Device infos are changed in place, so cache by their content.
+        device = update.devices.get(None)
+        key = (
+            (update.title, None, None)
+            if device is None
+            else (update.title, device.name, device.model)
+        )
+        if (header := self._headers.get(key)) is None:
+            entry = _dumps(update_to_dict(SensorUpdate(update.title, update.devices)))
+            header = self._headers[key] = entry[: -len('},"binary_sensors":{}}')]
+        return header
+
+    def _append_entities(
+        self,
+        parts: list[str],
+        values: Mapping[DeviceKey, SensorValue | BinarySensorValue],
+        descriptions: Mapping[DeviceKey, SensorDescription | BinarySensorDescription],
+    ) -> None:
+        append = parts.append
+        prefixes = self._prefixes
+        separator = ""
+        for device_key, value in values.items():
+            if (prefix := prefixes.get(id(device_key))) is None:
+                prefix = _entity_prefix(device_key, descriptions.get(device_key))
+            append(separator)
+            append(prefix)
+            native_value = value.native_value
+            # Exact type checks, as bools are ints and enums can be too.
+            value_type = type(native_value)
+            if value_type is int:
+                append(int.__repr__(native_value))
+            elif value_type is float and math.isfinite(native_value):  # type: ignore[arg-type]
+                append(float.__repr__(native_value))
+            elif native_value is None:
+                append("null")
+            elif native_value is True:
+                append("true")
+            elif native_value is False:
+                append("false")
+            else:
+                append(_dumps(native_value))
+            append("}")
+            separator = ","
+
+    def _entities_dict(
+        self,
+        values: Mapping[DeviceKey, SensorValue | BinarySensorValue],
+        descriptions: Mapping[DeviceKey, SensorDescription | BinarySensorDescription],
+    ) -> dict[str, Any]:
+        templates = self._templates
+        entities: dict[str, Any] = {}
+        for device_key, value in values.items():
+            if (template := templates.get(id(device_key))) is None:
+                template = (
+                    _entity_key(device_key),
+                    _description_dict(descriptions.get(device_key)),
+                )
+            key, fields = template
+            entity = fields.copy()
+            entity["value"] = value.native_value
+            entities[key] = entity
+        return entities
+
+    def _dumps_orjson(self, updates: Mapping[str, SensorUpdate]) -> bytes:
+        assert orjson is not None  # nosec
+        snapshot: dict[str, Any] = {}
+        for address, update in updates.items():
+            device = update.devices.get(None)
+            snapshot[address] = {
+                "title": update.title,
+                "name": None if device is None else device.name,
+                "model": None if device is None else device.model,
+                "sensors": self._entities_dict(
+                    update.entity_values, update.entity_descriptions
+                ),
+                "binary_sensors": self._entities_dict(
+                    update.binary_entity_values, update.binary_entity_descriptions
+                ),
+            }
+        result: bytes = orjson.dumps(snapshot, default=_default)
+        return result
+
+
+def _entity_prefix(
+    device_key: DeviceKey,
+    description: SensorDescription | BinarySensorDescription | None,
+) -> str:
+    """Return the JSON of an entity up to its value."""
+    entity = _dumps({_entity_key(device_key): {**_description_dict(description)}})
+    # Drop the outer braces and the inner closing one.
+    return entity[1:-2] + ("," if description else "") + '"value":'
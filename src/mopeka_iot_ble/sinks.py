@@ -0,0 +1,401 @@
+"""Batched output sinks for decoded readings.
+
+A sink is a reading callback that only appends to a bounded buffer; a
+worker thread takes batches off the buffer and writes them out, so a
+slow or unreachable consumer never holds up decoding.
+
+MIT License applies.
+"""
+
+from __future__ import annotations
+
+import abc
+import logging
+import os
+import queue
+import socket
+import threading
+import time
+from collections import deque
+from enum import Enum
+from pathlib import Path
+from typing import IO, Any
+
+from .export import ExportFormat, ReadingExporter, reading_from_json, reading_to_json
+from .models import MopekaReading
+
+_LOGGER = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 100
+DEFAULT_LINGER = 1.0
+DEFAULT_MAX_BUFFERED = 10000
+DEFAULT_RETRY_INTERVAL = 1.0
+DEFAULT_CLOSE_TIMEOUT = 10.0
+
+
+class OverflowPolicy(Enum):
+    """Enumeration of what a sink does with readings when its buffer is full."""
+
+    BLOCK = "block"
+    DROP = "drop"
+    SPILL = "spill"
+
+
+class ReadingSink(abc.ABC):
+    """Deliver readings in batches from a worker thread.
+
+    A batch is written once ``batch_size`` readings are buffered or the
+    oldest buffered reading waited ``linger`` seconds. At most
+    ``max_buffered`` readings are kept in memory; beyond that the
+    ``overflow`` policy applies:
+
+    * ``DROP`` discards the reading and counts it in ``dropped``.
+    * ``BLOCK`` makes the caller wait for room, only for callers that
+      can afford to.
+    * ``SPILL`` appends the reading to ``spill_path`` as NDJSON. Once a
+      reading was spilled, later ones are spilled too until the worker
+      caught up and delivered the spilled ones, so order is kept. The
+      file is written and read back outside the buffer's lock, a batch
+      at a time, and emptied whenever the worker caught up.
+
+    A batch whose write raises OSError is retried every
+    ``retry_interval`` seconds while readings keep buffering; one that
+    raises anything else is logged and dropped. Subclasses implement
+    ``write_batch``.
+    """
+
+    def __init__(
+        self,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        linger: float = DEFAULT_LINGER,
+        max_buffered: int = DEFAULT_MAX_BUFFERED,
+        overflow: OverflowPolicy = OverflowPolicy.DROP,
+        spill_path: str | os.PathLike[str] | None = None,
+        retry_interval: float = DEFAULT_RETRY_INTERVAL,
+    ) -> None:
+        if overflow is OverflowPolicy.SPILL and spill_path is None:
+            raise ValueError("The spill overflow policy needs a spill_path")
+        self._batch_size = batch_size
+        self._linger = linger
+        self._max_buffered = max_buffered
+        self._overflow = overflow
+        self._spill_path = None if spill_path is None else Path(spill_path)
+        self._retry_interval = retry_interval
+        self._buffer: deque[MopekaReading] = deque()
+        self._condition = threading.Condition()
+        # Serializes writes to the spill file; taken before the condition.
+        self._spill_lock = threading.Lock()
+        self._spill_file: IO[str] | None = None
+        self._spill_reader: IO[str] | None = None
+        # Readings sent to the spill file and not taken back yet, and how
+        # many of them were written out and can be read back.
+        self._spilled = 0
+        self._spill_ready = 0
+        self._in_flight = 0
+        self._flushing = 0
+        self._closing = False
+        self.dropped = 0
+        self.delivered = 0
+        self._worker = threading.Thread(
+            target=self._run, name=f"{type(self).__name__} worker", daemon=True
+        )
+        self._worker.start()
+
+    @abc.abstractmethod
+    def write_batch(self, batch: list[MopekaReading]) -> None:
+        """Write out a batch of readings; raise OSError to have it retried."""
+
+    def close_output(self) -> None:
+        """Release the output once the worker stopped."""
+
+    @property
+    def spilled(self) -> int:
+        """Return the number of readings waiting in the spill file."""
+        return self._spilled
+
+    def __call__(self, reading: MopekaReading) -> None:
+        """Buffer a reading."""
+        self.put(reading)
+
+    def __enter__(self) -> ReadingSink:
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def put(self, reading: MopekaReading) -> bool:
+        """Buffer a reading and return False if it was dropped."""
+        with self._condition:
+            buffer = self._buffer
+            if self._closing:
+                self.dropped += 1
+                return False
+            spill = False
+            if self._spilled or len(buffer) >= self._max_buffered:
+                overflow = self._overflow
+                if overflow is OverflowPolicy.SPILL:
+                    # Written out once the lock is released.
+                    self._spilled += 1
+                    spill = True
+                elif (
+                    overflow is OverflowPolicy.DROP
+                    or not self._condition.wait_for(
+                        lambda: len(buffer) < self._max_buffered or self._closing
+                    )
+                    or self._closing
+                ):
+                    self.dropped += 1
+                    return False
+            if not spill:
+                buffer.append(reading)
+                if len(buffer) == 1 or len(buffer) >= self._batch_size:
+                    self._condition.notify_all()
+                return True
+        return self._spill(reading)
+
+    def flush(self, timeout: float | None = None) -> bool:
+        """Wait until everything buffered was delivered.
+
+        Returns False if that did not happen within ``timeout`` seconds.
+        """
+        with self._condition:
+            self._flushing += 1
+            self._condition.notify_all()
+            try:
+                return self._condition.wait_for(
+                    lambda: (
+                        not (self._buffer or self._spilled or self._in_flight)
+                        or not self._worker.is_alive()
+                    ),
+                    timeout,
+                )
+            finally:
+                self._flushing -= 1
+
+    def close(self, timeout: float | None = DEFAULT_CLOSE_TIMEOUT) -> None:
+        """Deliver what is buffered and stop the worker.
+
+        Readings that could not be delivered within ``timeout`` seconds
+        are dropped; None waits for as long as it takes.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        self.flush(timeout)
+        with self._condition:
+            self._closing = True
+            self._condition.notify_all()
+        self._worker.join(
+            None if deadline is None else max(0.0, deadline - time.monotonic())
+        )
+        with self._spill_lock:
+            if self._spill_file is not None:
+                self._spill_file.close()
+        if self._spill_reader is not None and not self._worker.is_alive():
+            self._spill_reader.close()
+        self.close_output()
+
+    def _spill(self, reading: MopekaReading) -> bool:
+        """Append a reading to the spill file, outside the buffer's lock."""
+        line = reading_to_json(reading) + "\n"
+        with self._spill_lock:
+            try:
+                if (spill_file := self._spill_file) is None:
+                    assert self._spill_path is not None  # nosec
+                    # The file only ever holds readings of this sink.
+                    spill_file = self._spill_file = open(  # noqa: SIM115
+                        self._spill_path, "w", encoding="utf-8"
+                    )
+                spill_file.write(line)
+                spill_file.flush()
+            except (OSError, ValueError) as ex:
+                # ValueError: the file was closed along with the sink.
+                _LOGGER.warning("%s failed to spill a reading: %s", self, ex)
+                with self._condition:
+                    self._spilled -= 1
+                    self.dropped += 1
+                    self._condition.notify_all()
+                return False
+            with self._condition:
+                self._spill_ready += 1
+                self._condition.notify_all()
+        return True
+
+    def _unspill(self, count: int) -> list[MopekaReading]:
+        """Read the next ``count`` spilled readings back, outside the lock."""
+        readings: list[MopekaReading] = []
+        reader = self._spill_reader
+        try:
+            if reader is None:
+                assert self._spill_path is not None  # nosec
+                reader = self._spill_reader = open(  # noqa: SIM115
+                    self._spill_path, encoding="utf-8"
+                )
+            readline = reader.readline
+            for _ in range(count):
+                line = readline()
+                try:
+                    readings.append(reading_from_json(line))
+                except (ValueError, KeyError, TypeError) as ex:
+                    _LOGGER.warning(
+                        "%s dropped a corrupt spilled reading: %s", self, ex
+                    )
+        except Exception:
+            # Keep the worker running; the readings not read back are lost.
+            _LOGGER.exception("%s failed to read spilled readings", self)
+        with self._condition:
+            self.dropped += count - len(readings)
+            self._spill_ready -= count
+            self._spilled -= count
+            caught_up = not self._spilled
+        if caught_up and reader is not None:
+            with self._spill_lock, self._condition:
+                # Nothing can be spilled while both locks are held.
+                spill_file = self._spill_file
+                if not self._spilled and spill_file and not spill_file.closed:
+                    spill_file.truncate(0)
+                    # Truncating leaves the write position where it was.
+                    spill_file.seek(0)
+                    reader.seek(0)
+        return readings
+
+    def _next_batch(self) -> list[MopekaReading] | None:
+        """Wait for the next batch, None once closing with nothing left."""
+        condition = self._condition
+        buffer = self._buffer
+        with condition:
+            while not (
+                buffer or self._spill_ready or (self._closing and not self._spilled)
+            ):
+                condition.wait()
+            deadline = time.monotonic() + self._linger
+            while (
+                len(buffer) < self._batch_size
+                and not self._spilled
+                and not self._closing
+                and not self._flushing
+                and (remaining := deadline - time.monotonic()) > 0
+            ):
+                condition.wait(remaining)
+            if buffer:
+                count = min(self._batch_size, len(buffer))
+                batch = [buffer.popleft() for _ in range(count)]
+                self._in_flight = count
+                condition.notify_all()
+                return batch
+            if not self._spill_ready:
+                return None
+            count = self._in_flight = min(self._batch_size, self._spill_ready)
+        return self._unspill(count)
+
+    def _deliver(self, batch: list[MopekaReading]) -> None:
+        """Write a batch, retrying until it succeeds or the sink closes."""
+        while True:
+            try:
+                self.write_batch(batch)
+            except OSError as ex:
+                _LOGGER.warning("%s failed to write a batch: %s", self, ex)
+                with self._condition:
+                    if self._closing:
+                        self.dropped += len(batch)
+                        return
+                    self._condition.wait(self._retry_interval)
+            except Exception:
+                # Not a failure a retry would fix; drop the batch but keep
+                # the worker running.
+                _LOGGER.exception("%s dropped a batch it could not write", self)
+                with self._condition:
+                    self.dropped += len(batch)
+                return
+            else:
+                self.delivered += len(batch)
+                return
+
+    def _run(self) -> None:
+        batch_size = self._batch_size
+        while (batch := self._next_batch()) is not None:
+            for start in range(0, len(batch), batch_size):
+                stop = start + batch_size
+                self._deliver(batch[start:stop])
+            with self._condition:
+                self._in_flight = 0
+                self._condition.notify_all()
+
+
+class QueueSink(ReadingSink):
+    """Hand batches to an in-memory queue, mostly for tests."""
+
+    def __init__(self, **kwargs: Any) -> None:
+        self.batches: queue.Queue[list[MopekaReading]] = queue.Queue()
+        super().__init__(**kwargs)
+
+    def write_batch(self, batch: list[MopekaReading]) -> None:
+        """Put the batch on the queue."""
+        self.batches.put(batch)
+
+
+class FileSink(ReadingSink):
+    """Append batches to a CSV or NDJSON file through a ReadingExporter."""
+
+    def __init__(
+        self,
+        path: str | os.PathLike[str],
+        export_format: ExportFormat = ExportFormat.NDJSON,
+        **kwargs: Any,
+    ) -> None:
+        self._exporter = ReadingExporter(path, export_format, flush_interval=None)
+        super().__init__(**kwargs)
+
+    def write_batch(self, batch: list[MopekaReading]) -> None:
+        """Write the batch and hand it to the operating system."""
+        write = self._exporter.write
+        for reading in batch:
+            write(reading)
+        self._exporter.flush()
+
+    def close_output(self) -> None:
+        """Close the file."""
+        self._exporter.close()
+
+
+class SocketSink(ReadingSink):
+    """Stream batches as NDJSON to a local Unix or TCP socket.
+
+    ``address`` is a path for a Unix socket or a ``(host, port)`` pair.
+    The connection is opened on the first batch and again after a
+    failed write.
+    """
+
+    def __init__(
+        self, address: str | os.PathLike[str] | tuple[str, int], **kwargs: Any
+    ) -> None:
+        self._address = address
+        self._socket: socket.socket | None = None
+        super().__init__(**kwargs)
+
+    def _connect(self) -> socket.socket:
+        if isinstance(self._address, tuple):
+            return socket.create_connection(self._address)
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.connect(os.fspath(self._address))
+        except OSError:
+            sock.close()
+            raise
+        return sock
+
+    def write_batch(self, batch: list[MopekaReading]) -> None:
+        """Send the batch, reconnecting if the connection was lost."""
+        if self._socket is None:
+            self._socket = self._connect()
+        data = "".join(reading_to_json(reading) + "\n" for reading in batch).encode()
+        try:
+            self._socket.sendall(data)
+        except OSError:
+            self._socket.close()
+            self._socket = None
+            raise
+
+    def close_output(self) -> None:
+        """Close the connection."""
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
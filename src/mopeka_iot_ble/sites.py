@@ -0,0 +1,269 @@
+"""Aggregate the tanks of a site into one logical reservoir.
+
+MIT License applies.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Callable, Iterable
+from typing import NamedTuple
+
+from sensor_state_data import (
+    DeviceKey,
+    SensorDescription,
+    SensorDeviceInfo,
+    SensorUpdate,
+    SensorValue,
+    Units,
+)
+
+from .models import MopekaReading, Site, SiteMember
+
+DEFAULT_MIN_QUALITY = 2
+DEFAULT_DRAW_THRESHOLD = 5.0
+
+SiteCallback = Callable[[str, SensorUpdate], None]
+
+SITE_FILL_KEY = DeviceKey("site_fill")
+SITE_VOLUME_KEY = DeviceKey("site_volume")
+SITE_CAPACITY_KEY = DeviceKey("site_capacity")
+ACTIVE_TANK_KEY = DeviceKey("active_tank")
+TANKS_REPORTING_KEY = DeviceKey("tanks_reporting")
+
+_FILL_DESCRIPTION = SensorDescription(SITE_FILL_KEY, None, Units.PERCENTAGE)
+_ACTIVE_TANK_DESCRIPTION = SensorDescription(ACTIVE_TANK_KEY, None, None)
+_TANKS_REPORTING_DESCRIPTION = SensorDescription(TANKS_REPORTING_KEY, None, None)
+
+
+class SiteTotals(NamedTuple):
+    """The aggregate of the tanks of a site that reported a level.
+
+    ``active_tank`` is the name of the tank being drawn from, None until
+    one was seen draining.
+    """
+
+    fill: float | None
+    volume: float
+    capacity: float
+    tanks_reporting: int
+    active_tank: str | None
+
+
+class _Member:
+    __slots__ = ("capacity", "name", "reference", "site", "tank_height", "volume")
+
+    def __init__(self, site: _Site, member: SiteMember) -> None:
+        self.site = site
+        self.name = member.name or member.address
+        self.tank_height = member.tank_height
+        self.capacity = member.capacity
+        self.volume: float | None = None
+        # The level the member is compared against to tell it is drawn
+        # from: the highest level since it last dropped.
+        self.reference: float | None = None
+
+
+class _Site:
+    __slots__ = (
+        "active",
+        "capacity",
+        "descriptions",
+        "device",
+        "name",
+        "reporting",
+        "volume",
+    )
+
+    def __init__(self, site: Site) -> None:
+        self.name = site.name
+        self.volume = 0.0
+        self.capacity = 0.0
+        self.reporting = 0
+        self.active: str | None = None
+        self.device = SensorDeviceInfo(site.name, "Site", "Mopeka IOT", None, None)
+        self.descriptions = {
+            SITE_FILL_KEY: _FILL_DESCRIPTION,
+            SITE_VOLUME_KEY: SensorDescription(SITE_VOLUME_KEY, None, site.volume_unit),
+            SITE_CAPACITY_KEY: SensorDescription(
+                SITE_CAPACITY_KEY, None, site.volume_unit
+            ),
+            ACTIVE_TANK_KEY: _ACTIVE_TANK_DESCRIPTION,
+            TANKS_REPORTING_KEY: _TANKS_REPORTING_DESCRIPTION,
+        }
+
+    def totals(self) -> SiteTotals:
+        return SiteTotals(
+            self.volume / self.capacity * 100 if self.capacity else None,
+            self.volume,
+            self.capacity,
+            self.reporting,
+            self.active,
+        )
+
+
+class SiteAggregator:
+    """Keep the totals of sites of several tanks.
+
+    The aggregator is a reading callback. A reading of a member only
+    swaps that member's share of the site's volume and capacity, so the
+    totals are never summed over the whole site again. Readings without
+    a tank level or below ``min_quality`` keep the last share.
+
+    A member is taken as the active tank once its level dropped more
+    than ``draw_threshold`` mm below the highest level since it last
+    did, which follows an automatic changeover regulator switching
+    bottles without flapping on level noise.
+
+    Callbacks get the name and a ``SensorUpdate`` of the site, with
+    ``site_fill``, ``site_volume``, ``site_capacity``, ``active_tank``
+    and ``tanks_reporting`` sensors, for every reading of a member.
+    """
+
+    def __init__(
+        self,
+        sites: Iterable[Site] = (),
+        min_quality: int = DEFAULT_MIN_QUALITY,
+        draw_threshold: float = DEFAULT_DRAW_THRESHOLD,
+    ) -> None:
+        self._min_quality = min_quality
+        self._draw_threshold = draw_threshold
+        self._sites: dict[str, _Site] = {}
+        self._members: dict[str, _Member] = {}
+        self._callbacks: tuple[SiteCallback, ...] = ()
+        for site in sites:
+            self.add_site(site)
+
+    def __len__(self) -> int:
+        """Return the number of sites."""
+        return len(self._sites)
+
+    def register_callback(self, callback: SiteCallback) -> Callable[[], None]:
+        """Call back with the name and update of a site on every change.
+
+        Returns a function that removes the callback again.
+        """
+        self._callbacks = (*self._callbacks, callback)
+
+        def _remove() -> None:
+            self._callbacks = tuple(cb for cb in self._callbacks if cb is not callback)
+
+        return _remove
+
+    def add_site(self, site: Site) -> None:
+        """Add a site, replacing one of the same name.
+
+        Raises ValueError, keeping the site it would replace, if a tank
+        is listed twice or is already part of another site.
+        """
+        addresses = [member.address for member in site.members]
+        members = self._members
+        if len(set(addresses)) != len(addresses) or any(
+            address in members and members[address].site.name != site.name
+            for address in addresses
+        ):
+            raise ValueError(f"A tank of site {site.name} is already part of a site")
+        self.remove_site(site.name)
+        state = self._sites[site.name] = _Site(site)
+        for member in site.members:
+            self._members[member.address] = _Member(state, member)
+
+    def remove_site(self, name: str) -> None:
+        """Remove a site and forget its members."""
+        if (state := self._sites.pop(name, None)) is None:
+            return
+        for address in [
+            address for address, member in self._members.items() if member.site is state
+        ]:
+            del self._members[address]
+
+    def forget(self, address: str) -> None:
+        """Drop the share of a tank until it reports again.
+
+        The tank stays a member of its site.
+        """
+        if (member := self._members.get(address)) is None or member.volume is None:
+            return
+        site = member.site
+        site.capacity -= member.capacity
+        site.reporting -= 1
+        site.volume -= member.volume
+        if not site.reporting:
+            # Keep rounding left over from the swapped shares out of it.
+            site.volume = site.capacity = 0.0
+        if site.active == member.name:
+            site.active = None
+        member.volume = member.reference = None
+
+    def site_of(self, address: str) -> str | None:
+        """Return the name of the site a tank belongs to."""
+        if (member := self._members.get(address)) is None:
+            return None
+        return member.site.name
+
+    def totals(self, name: str) -> SiteTotals | None:
+        """Return the totals of a site."""
+        if (state := self._sites.get(name)) is None:
+            return None
+        return state.totals()
+
+    def __call__(self, reading: MopekaReading) -> None:
+        """Add a reading."""
+        self.update(reading.address, reading.tank_level, reading.reading_quality)
+
+    def update(
+        self, address: str, tank_level: float | None, reading_quality: int
+    ) -> SensorUpdate | None:
+        """Add the level of a tank and return the update of its site."""
+        if (
+            tank_level is None
+            or reading_quality < self._min_quality
+            or (member := self._members.get(address)) is None
+        ):
+            return None
+        site = member.site
+        volume = max(0.0, min(1.0, tank_level / member.tank_height)) * member.capacity
+        if member.volume is None:
+            site.capacity += member.capacity
+            site.reporting += 1
+            site.volume += volume
+        else:
+            site.volume += volume - member.volume
+        member.volume = volume
+        reference = member.reference
+        if reference is None or tank_level > reference:
+            member.reference = tank_level
+        elif reference - tank_level > self._draw_threshold:
+            site.active = member.name
+            member.reference = tank_level
+        update = self._site_update(site)
+        for callback in self._callbacks:
+            callback(site.name, update)
+        return update
+
+    @staticmethod
+    def _site_update(site: _Site) -> SensorUpdate:
+        totals = site.totals()
+        return SensorUpdate(
+            title=site.name,
+            devices={None: site.device},
+            entity_descriptions=site.descriptions,
+            entity_values={
+                SITE_FILL_KEY: SensorValue(
+                    SITE_FILL_KEY,
+                    "Site fill",
+                    None if totals.fill is None else round(totals.fill, 1),
+                ),
+                SITE_VOLUME_KEY: SensorValue(
+                    SITE_VOLUME_KEY, "Site volume", round(totals.volume, 2)
+                ),
+                SITE_CAPACITY_KEY: SensorValue(
+                    SITE_CAPACITY_KEY, "Site capacity", round(totals.capacity, 2)
+                ),
+                ACTIVE_TANK_KEY: SensorValue(
+                    ACTIVE_TANK_KEY, "Active tank", totals.active_tank
+                ),
+                TANKS_REPORTING_KEY: SensorValue(
+                    TANKS_REPORTING_KEY, "Tanks reporting", totals.tanks_reporting
+                ),
+            },
+        )
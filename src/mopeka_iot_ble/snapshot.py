@@ -0,0 +1,155 @@
+"""Compact binary snapshots of decoded Mopeka IOT frames.
+
+A snapshot stores the last raw frame of every device rather than the
+decoded sensor objects, along with the state the parser's trackers keep
+for the device. Frames are ten bytes, so the frames of 10k devices take a
+few hundred kilobytes; tracker state adds up to a few kilobytes per
+device for the samples of a consumption estimator. Restoring runs the
+frames back through the decoders.
+
+Layout (little endian)::
+
+    header  magic "MOPK", version (u8), record count (u32)
+    record  timestamp (f64), rssi (i8), medium (u8),
+            address length (u8), source length (u8), payload length (u8),
+            address (utf-8), source (utf-8), payload,
+            state count (u8), then per state:
+            name length (u8), data length (u32), name (utf-8), data
+
+Version 1 snapshots, without state, can still be read.
+
+Medium IDs are the position in ``MediumType``; new mediums must only
+ever be appended to keep old snapshots readable.
+
+MIT License applies.
+"""
+
+from __future__ import annotations
+
+import struct
+from collections.abc import Iterable
+
+from .models import FrameRecord, MediumType
+
+SNAPSHOT_MAGIC = b"MOPK"
+SNAPSHOT_VERSION = 2
+
+# The frame part of a record, shared with recordings.
+FRAME_RECORD = struct.Struct("<dbBBBB")
+MEDIUMS = tuple(MediumType)
+MEDIUM_IDS = {medium: medium_id for medium_id, medium in enumerate(MEDIUMS)}
+
+_HEADER = struct.Struct("<4sBI")
+_STATE_COUNT = struct.Struct("<B")
+_STATE = struct.Struct("<BI")
+
+
+class SnapshotError(ValueError):
+    """Raised when a snapshot cannot be read."""
+
+
+def medium_from_id(medium_id: int) -> MediumType:
+    """Return the medium stored as ``medium_id``.
+
+    Raises SnapshotError for an ID no medium has.
+    """
+    if medium_id >= len(MEDIUMS):
+        raise SnapshotError(f"Unknown medium ID {medium_id}")
+    return MEDIUMS[medium_id]
+
+
+def encode_snapshot(records: Iterable[FrameRecord]) -> bytes:
+    """Encode frame records into a snapshot."""
+    pack = FRAME_RECORD.pack
+    medium_ids = MEDIUM_IDS
+    parts = [b""]
+    count = 0
+    for record in records:
+        address = record.address.encode()
+        source = record.source.encode()
+        payload = record.payload
+        parts.append(
+            pack(
+                record.timestamp,
+                max(-128, min(127, record.rssi)),
+                medium_ids[record.medium],
+                len(address),
+                len(source),
+                len(payload),
+            )
+        )
+        parts.append(address)
+        parts.append(source)
+        parts.append(payload)
+        parts.append(_STATE_COUNT.pack(len(record.state)))
+        for name, state in record.state:
+            encoded_name = name.encode()
+            parts.append(_STATE.pack(len(encoded_name), len(state)))
+            parts.append(encoded_name)
+            parts.append(state)
+        count += 1
+    parts[0] = _HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, count)
+    return b"".join(parts)
+
+
+def decode_snapshot(data: bytes) -> list[FrameRecord]:
+    """Decode a snapshot back into frame records."""
+    if len(data) < _HEADER.size:
+        raise SnapshotError("Snapshot is truncated")
+    magic, version, count = _HEADER.unpack_from(data)
+    if magic != SNAPSHOT_MAGIC:
+        raise SnapshotError("Not a Mopeka snapshot")
+    if version not in (1, SNAPSHOT_VERSION):
+        raise SnapshotError(f"Unsupported snapshot version {version}")
+    view = memoryview(data)
+    unpack_from = FRAME_RECORD.unpack_from
+    record_size = FRAME_RECORD.size
+    offset = _HEADER.size
+    records: list[FrameRecord] = []
+    try:
+        for _ in range(count):
+            timestamp, rssi, medium_id, address_len, source_len, payload_len = (
+                unpack_from(data, offset)
+            )
+            offset += record_size
+            address_end = offset + address_len
+            source_end = address_end + source_len
+            payload_end = source_end + payload_len
+            if payload_end > len(data):
+                raise SnapshotError("Snapshot is truncated")
+            address = str(view[offset:address_end], "utf-8")
+            source = str(view[address_end:source_end], "utf-8")
+            payload = bytes(view[source_end:payload_end])
+            offset = payload_end
+            states: list[tuple[str, bytes]] = []
+            if version > 1:
+                (state_count,) = _STATE_COUNT.unpack_from(data, offset)
+                offset += _STATE_COUNT.size
+                for _ in range(state_count):
+                    name_len, state_len = _STATE.unpack_from(data, offset)
+                    name_start = offset + _STATE.size
+                    name_end = name_start + name_len
+                    state_end = name_end + state_len
+                    if state_end > len(data):
+                        raise SnapshotError("Snapshot is truncated")
+                    states.append(
+                        (
+                            str(view[name_start:name_end], "utf-8"),
+                            bytes(view[name_end:state_end]),
+                        )
+                    )
+                    offset = state_end
+            records.append(
+                FrameRecord(
+                    timestamp,
+                    address,
+                    source,
+                    rssi,
+                    medium_from_id(medium_id),
+                    payload,
+                    tuple(states),
+                )
+            )
+    except (struct.error, UnicodeDecodeError) as ex:
+        raise SnapshotError(f"Snapshot is corrupt: {ex}") from ex
+    return records
@@ -0,0 +1,98 @@
+from unittest.mock import patch
+
+import pytest
+from bluetooth_sensor_state_data import BluetoothServiceInfo
+from sensor_state_data import DeviceKey
+
+from mopeka_iot_ble import BatteryModel, MopekaIOTBluetoothDeviceData
+
+DAY = 86400.0
+
+
+def test_linear_discharge():
+    model = BatteryModel(min_samples=5, min_span=1.0)
+    estimates = [model.update("a", day * DAY, 3.0 - 0.01 * day, 25) for day in range(6)]
+    assert estimates[:5] == [None] * 4 + [estimates[4]]
+    estimate = estimates[-1]
+    assert estimate is not None
+    assert estimate.discharge_rate == pytest.approx(0.01)
+    assert estimate.voltage == pytest.approx(2.95)
+    assert estimate.remaining_days == pytest.approx(75.0)
+    assert estimate.samples == 6
+    assert model.estimate("a") == estimate
+
+
+def test_cold_readings_are_compensated():
+    model = BatteryModel(min_samples=2, min_span=0, temperature_coefficient=0.005)
+    # The voltage sags by 0.1 V at -15 °C, which is only the cold.
+    model.update("a", 0, 3.0, 25)
+    estimate = model.update("a", DAY, 2.8, -15)
+    assert estimate is not None
+    assert estimate.discharge_rate == pytest.approx(0.0)
+    assert estimate.voltage == pytest.approx(3.0)
+
+
+def test_recent_samples_weigh_more():
+    model = BatteryModel(half_life=1.0, min_samples=2, min_span=0)
+    for day in range(20):
+        model.update("a", day * DAY, 3.0, 25)
+    for day in range(20, 25):
+        estimate = model.update("a", day * DAY, 3.0 - 0.02 * (day - 19), 25)
+    assert estimate is not None
+    assert 0.015 < estimate.discharge_rate < 0.02
+
+
+def test_replacement_resets_the_fit():
+    model = BatteryModel(min_samples=2, min_span=0)
+    for day in range(5):
+        model.update("a", day * DAY, 2.5 - 0.01 * day, 25)
+    assert model.update("a", 5 * DAY, 3.0, 25) is None
+    assert model.replacements("a") == 1
+    assert model.estimate("a") is None
+    estimate = model.update("a", 6 * DAY, 2.99, 25)
+    assert estimate is not None
+    assert estimate.discharge_rate == pytest.approx(0.01)
+    model.forget("a")
+    assert model.replacements("a") == 0
+    assert len(model) == 0
+
+
+def test_due_orders_by_remaining_days():
+    model = BatteryModel(min_samples=2, min_span=0)
+    for address, rate in (("a", 0.01), ("b", 0.04), ("c", -0.01)):
+        for day in range(2):
+            model.update(address, day * DAY, 2.6 - rate * day, 25)
+    assert model.due(within=100, now=DAY) == [
+        ("b", pytest.approx(9.0)),
+        ("a", pytest.approx(39.0)),
+    ]
+    assert model.due(within=100, now=11 * DAY) == [
+        ("b", 0.0),
+        ("a", pytest.approx(29.0)),
+    ]
+    assert model.due(within=5, now=DAY) == []
+
+
+def test_parser_publishes_remaining_days():
+    model = BatteryModel(min_samples=2, min_span=0)
+    parser = MopekaIOTBluetoothDeviceData(battery_model=model)
+    battery_remaining = DeviceKey("battery_remaining")
+    for day, battery in enumerate((0x70, 0x6F)):
+        service_info = BluetoothServiceInfo(
+            name="",
+            address="C9:F3:32:E0:F5:09",
+            rssi=-63,
+            manufacturer_data={
+                89: b"\x08" + bytes((battery,)) + b"C\xb6\xc3\xe0\xf5\t\xfa\xe3"
+            },
+            service_uuids=["0000fee5-0000-1000-8000-00805f9b34fb"],
+            service_data={},
+            source="local",
+        )
+        with patch("mopeka_iot_ble.parser.time.time", return_value=day * DAY):
+            values = parser.update(service_info).entity_values
+        if not day:
+            assert battery_remaining not in values
+    # 3.47 V at 27 °C is 3.46 V at 25 °C, which losing 1/32 V a day
+    # reaches 2.2 V in 40.3 days.
+    assert values[battery_remaining].native_value == pytest.approx(40.3)
@@ -0,0 +1,95 @@
+import asyncio
+
+from bluetooth_sensor_state_data import BluetoothServiceInfo
+
+from mopeka_iot_ble import EntityChange, MopekaIOTFleet, SubscriptionBus
+from mopeka_iot_ble.bus import always
+
+GOOD = b"\x08pC\xb6\xc3\xe0\xf5\t\xfa\xe3"
+BAD_QUALITY = b"\x08rF\x000\xe0\xf5\t\xf0\xd8"
+
+
+def _service_info(address: str, payload: bytes) -> BluetoothServiceInfo:
+    return BluetoothServiceInfo(
+        name="",
+        address=address,
+        rssi=-63,
+        manufacturer_data={89: payload},
+        service_uuids=["0000fee5-0000-1000-8000-00805f9b34fb"],
+        service_data={},
+        source="local",
+    )
+
+
+def test_subscribe_by_address_and_key():
+    bus = SubscriptionBus()
+    fleet = MopekaIOTFleet(bus=bus)
+    assert fleet.bus is bus
+    changes: list[EntityChange] = []
+    remove = bus.subscribe(changes.append, "AA:AA:AA:AA:AA:AA", "tank_level")
+    fleet.update(_service_info("AA:AA:AA:AA:AA:AA", GOOD))
+    fleet.update(_service_info("BB:BB:BB:BB:BB:BB", GOOD))
+    fleet.update(_service_info("AA:AA:AA:AA:AA:AA", GOOD))
+    fleet.update(_service_info("AA:AA:AA:AA:AA:AA", BAD_QUALITY))
+    assert changes == [
+        EntityChange("AA:AA:AA:AA:AA:AA", "tank_level", None, 341),
+        EntityChange("AA:AA:AA:AA:AA:AA", "tank_level", 341, None),
+    ]
+    remove()
+    assert bus._last_values == {}
+    fleet.update(_service_info("AA:AA:AA:AA:AA:AA", GOOD))
+    assert len(changes) == 2
+
+
+def test_subscribe_all_addresses_with_predicate():
+    bus = SubscriptionBus()
+    fleet = MopekaIOTFleet(bus=bus)
+    every: list[EntityChange] = []
+    buttons: list[EntityChange] = []
+    bus.subscribe(every.append, key="battery_voltage", predicate=always)
+    bus.subscribe(buttons.append, "BB:BB:BB:BB:BB:BB")
+    fleet.update(_service_info("AA:AA:AA:AA:AA:AA", GOOD))
+    fleet.update(_service_info("AA:AA:AA:AA:AA:AA", GOOD))
+    fleet.update(_service_info("BB:BB:BB:BB:BB:BB", GOOD))
+    assert [change.address for change in every] == [
+        "AA:AA:AA:AA:AA:AA",
+        "AA:AA:AA:AA:AA:AA",
+        "BB:BB:BB:BB:BB:BB",
+    ]
+    assert {change.key for change in buttons} >= {"button_pressed", "tank_level"}
+    assert all(change.address == "BB:BB:BB:BB:BB:BB" for change in buttons)
+
+
+def test_subscribe_queue():
+    async def _run() -> list[EntityChange]:
+        bus = SubscriptionBus()
+        fleet = MopekaIOTFleet(bus=bus)
+        queue, remove = bus.subscribe_queue(key="tank_level", maxsize=1)
+        fleet.update(_service_info("AA:AA:AA:AA:AA:AA", GOOD))
+        fleet.update(_service_info("BB:BB:BB:BB:BB:BB", GOOD))
+        remove()
+        return [queue.get_nowait() for _ in range(queue.qsize())]
+
+    assert asyncio.run(_run()) == [
+        EntityChange("AA:AA:AA:AA:AA:AA", "tank_level", None, 341)
+    ]
+
+
+def test_unsubscribe_prunes_last_values():
+    bus = SubscriptionBus()
+    fleet = MopekaIOTFleet(bus=bus)
+    changes: list[EntityChange] = []
+    remove_all = bus.subscribe(changes.append, key="tank_level")
+    remove_one = bus.subscribe(changes.append, "AA:AA:AA:AA:AA:AA", "temperature")
+    fleet.update(_service_info("AA:AA:AA:AA:AA:AA", GOOD))
+    fleet.update(_service_info("BB:BB:BB:BB:BB:BB", GOOD))
+    assert len(bus._last_values) == 3
+    remove_all()
+    remove_all()
+    assert bus._last_values == {("AA:AA:AA:AA:AA:AA", "temperature"): 27}
+    bus.forget("AA:AA:AA:AA:AA:AA")
+    assert bus._last_values == {}
+    remove_one()
+    remove_one()
+    assert bus._subscriptions == {}
+    assert bus._addresses == {}
@@ -0,0 +1,51 @@
+import json
+
+from mopeka_iot_ble.cli import decode_lines, main
+from mopeka_iot_ble.export import ExportFormat
+from mopeka_iot_ble.models import MediumType
+
+PRO_HEX = b"087043b6c3e0f509fae3"
+
+
+def test_decode_lines_formats():
+    lines = [
+        PRO_HEX + b"\n",
+        b"AA:BB:CC:DD:EE:01 fresh_water " + PRO_HEX + b"\n",
+        b"AA:BB:CC:DD:EE:02," + PRO_HEX + b"\n",
+        b"\n",
+        b"AA:BB:CC:DD:EE:03 ffff\n",
+        b"AA:BB:CC:DD:EE:04 nothex\n",
+        b"AA:BB:CC:DD:EE:05 kerosene " + PRO_HEX + b"\n",
+    ]
+    text, rows = decode_lines(lines, MediumType.PROPANE, ExportFormat.NDJSON)
+    assert rows == 3
+    decoded = [json.loads(line) for line in text.splitlines()]
+    assert [(d["address"], d["medium"], d["tank_level"]) for d in decoded] == [
+        ("", "propane", 341),
+        ("AA:BB:CC:DD:EE:01", "fresh_water", 711),
+        ("AA:BB:CC:DD:EE:02", "propane", 341),
+    ]
+    assert decoded[0]["model"] == "M1015"
+    text, rows = decode_lines(lines[1:2], MediumType.PROPANE, ExportFormat.CSV)
+    assert text == (
+        "AA:BB:CC:DD:EE:01,fresh_water,8,M1015,3.5,100,27,False,950,711,3,250,227\n"
+    )
+
+
+def test_main(tmp_path, capsys):
+    capture = tmp_path / "capture.txt"
+    capture.write_bytes((b"AA:BB:CC:DD:EE:01 " + PRO_HEX + b"\n") * 2 + b"\n")
+    assert main([str(capture), str(capture), "--format", "csv", "--stats"]) == 0
+    out, err = capsys.readouterr()
+    lines = out.splitlines()
+    assert lines[0].startswith("address,medium,model_id,model,")
+    assert len(lines) == 5
+    assert err.startswith("6 lines, 4 decoded, 2 skipped")
+
+
+def test_main_jobs(tmp_path, capsys):
+    capture = tmp_path / "capture.txt"
+    capture.write_bytes((b"AA:BB:CC:DD:EE:01 " + PRO_HEX + b"\n") * 100)
+    assert main([str(capture), "--jobs", "2"]) == 0
+    out, _ = capsys.readouterr()
+    assert len(out.splitlines()) == 100
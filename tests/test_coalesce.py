@@ -0,0 +1,71 @@
+from bluetooth_sensor_state_data import BluetoothServiceInfo
+from sensor_state_data import DeviceKey
+
+from mopeka_iot_ble import MopekaIOTFleet, MovementDetector, UpdateCoalescer
+
+TANK_LEVEL = DeviceKey(key="tank_level", device_id=None)
+TEMPERATURE = DeviceKey(key="temperature", device_id=None)
+BUTTON_PRESSED = DeviceKey(key="button_pressed", device_id=None)
+
+PRO = b"\x08pC\xb6\xc3\xe0\xf5\t\xfa\xe3"
+# Same frame two degrees warmer.
+PRO_WARMER = b"\x08pE\xb6\xc3\xe0\xf5\t\xfa\xe3"
+
+
+def _service_info(address: str, payload: bytes = PRO) -> BluetoothServiceInfo:
+    return BluetoothServiceInfo(
+        name="",
+        address=address,
+        rssi=-63,
+        manufacturer_data={89: payload},
+        service_uuids=["0000fee5-0000-1000-8000-00805f9b34fb"],
+        service_data={},
+        source="local",
+    )
+
+
+def test_coalescer_emits_only_changes():
+    coalescer = UpdateCoalescer()
+    emitted = []
+    coalescer.register_callback(emitted.append)
+    fleet = MopekaIOTFleet(coalescer=coalescer)
+    assert fleet.coalescer is coalescer
+    for _ in range(3):
+        fleet.update(_service_info("AA:AA:AA:AA:AA:AA"))
+        fleet.update(_service_info("BB:BB:BB:BB:BB:BB"))
+    changes = coalescer.flush()
+    assert emitted == [changes]
+    assert set(changes) == {"AA:AA:AA:AA:AA:AA", "BB:BB:BB:BB:BB:BB"}
+    first = changes["AA:AA:AA:AA:AA:AA"]
+    assert first.entity_values[TANK_LEVEL].native_value == 341
+    assert TANK_LEVEL in first.entity_descriptions
+    assert first.binary_entity_values[BUTTON_PRESSED].native_value is False
+    assert first.devices[None].name == "Pro Plus AAAA"
+
+    fleet.update(_service_info("AA:AA:AA:AA:AA:AA"))
+    assert coalescer.flush() == {}
+    assert len(emitted) == 1
+
+    fleet.update(_service_info("AA:AA:AA:AA:AA:AA", PRO_WARMER))
+    fleet.update(_service_info("BB:BB:BB:BB:BB:BB", PRO_WARMER))
+    fleet.update(_service_info("BB:BB:BB:BB:BB:BB"))
+    changes = coalescer.flush()
+    assert list(changes) == ["AA:AA:AA:AA:AA:AA"]
+    assert TEMPERATURE in changes["AA:AA:AA:AA:AA:AA"].entity_values
+    assert BUTTON_PRESSED not in changes["AA:AA:AA:AA:AA:AA"].binary_entity_values
+
+
+def test_coalescer_keeps_events():
+    coalescer = UpdateCoalescer()
+    fleet = MopekaIOTFleet(
+        movement_detector=MovementDetector(confirm_samples=1, warmup_samples=1),
+        coalescer=coalescer,
+    )
+    fleet.update(_service_info("AA:AA:AA:AA:AA:AA"))
+    coalescer.flush()
+    fleet.update(_service_info("AA:AA:AA:AA:AA:AA", PRO[:8] + b"\x10\x10"))
+    fleet.update(_service_info("AA:AA:AA:AA:AA:AA", PRO[:8] + b"\x10\x10"))
+    changes = coalescer.flush()
+    assert changes["AA:AA:AA:AA:AA:AA"].events
+    fleet.remove("AA:AA:AA:AA:AA:AA")
+    assert coalescer.flush() == {}
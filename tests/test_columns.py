@@ -0,0 +1,106 @@
+import math
+
+import pytest
+from bluetooth_sensor_state_data import BluetoothServiceInfo
+
+from mopeka_iot_ble import FleetColumns, MediumType, MopekaIOTFleet
+
+
+def _update(columns: FleetColumns, address: str, level: float | None, **kwargs):
+    values = {
+        "timestamp": 1000.0,
+        "temperature": 20,
+        "battery_voltage": 3.0,
+        "reading_quality": 3,
+        "medium": MediumType.PROPANE,
+    }
+    values.update(kwargs)
+    return columns.update(address, tank_level=level, **values)
+
+
+def test_rows_are_updated_in_place():
+    columns = FleetColumns(capacity=2)
+    assert _update(columns, "a", 100.0) == 0
+    assert _update(columns, "b", 200.0) == 1
+    view = columns.column("tank_level")
+    assert _update(columns, "a", 150.0, medium=MediumType.FRESH_WATER) == 0
+    assert view.tolist() == [150.0, 200.0]
+    assert (
+        _update(columns, "a", None, reading_quality=0, medium=MediumType.FRESH_WATER)
+        == 0
+    )
+    row = columns.row("a")
+    assert row is not None
+    assert row["tank_level"] == 150.0
+    assert row["reading_quality"] == 0
+    assert row["medium"] is MediumType.FRESH_WATER
+    assert columns.row("z") is None
+
+
+def test_growth_and_removal_keep_rows_dense():
+    columns = FleetColumns(capacity=1)
+    for number in range(5):
+        _update(
+            columns,
+            str(number),
+            float(number),
+            temperature=-200,
+            reading_quality=256 if number % 2 else -1,
+        )
+    assert len(columns) == 5
+    assert columns.column("tank_level").tolist() == [0.0, 1.0, 2.0, 3.0, 4.0]
+    assert columns.column("temperature").tolist() == [-128] * 5
+    assert columns.column("reading_quality").tolist() == [0, 255, 0, 255, 0]
+    columns.remove("1")
+    columns.remove("x")
+    assert "1" not in columns
+    assert columns.addresses == ["0", "4", "2", "3"]
+    assert columns.device_id("4") == 1
+    assert columns.column("tank_level").tolist() == [0.0, 4.0, 2.0, 3.0]
+    _update(columns, "5", None)
+    assert math.isnan(columns.column("tank_level")[4])
+    columns.remove("5")
+    assert columns.addresses == ["0", "4", "2", "3"]
+
+
+def test_numpy_views():
+    numpy = pytest.importorskip("numpy")
+    columns = FleetColumns()
+    for number in range(10):
+        _update(columns, str(number), float(number * 10))
+    arrays = columns.numpy_columns()
+    assert arrays["tank_level"].dtype == numpy.float32
+    assert arrays["tank_level"].mean() == pytest.approx(45.0)
+    _update(columns, "0", 1000.0)
+    assert arrays["tank_level"][0] == 1000.0
+    assert set(arrays) == {
+        "tank_level",
+        "temperature",
+        "battery_voltage",
+        "reading_quality",
+        "last_seen",
+        "medium",
+    }
+
+
+def test_fleet_readings_fill_the_columns():
+    columns = FleetColumns()
+    fleet = MopekaIOTFleet()
+    fleet.register_reading_callback(columns)
+    fleet.update(
+        BluetoothServiceInfo(
+            name="",
+            address="C9:F3:32:E0:F5:09",
+            rssi=-63,
+            manufacturer_data={89: b"\x08pC\xb6\xc3\xe0\xf5\t\xfa\xe3"},
+            service_uuids=["0000fee5-0000-1000-8000-00805f9b34fb"],
+            service_data={},
+            source="local",
+        )
+    )
+    row = columns.row("C9:F3:32:E0:F5:09")
+    assert row is not None
+    assert row["tank_level"] == 341.0
+    assert row["temperature"] == 27
+    assert row["battery_voltage"] == 3.5
+    assert row["reading_quality"] == 3
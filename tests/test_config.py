@@ -0,0 +1,153 @@
+import json
+import os
+
+import pytest
+from bluetooth_sensor_state_data import BluetoothServiceInfo
+from sensor_state_data import DeviceKey
+
+from mopeka_iot_ble import (
+    MediumType,
+    MopekaIOTBluetoothDeviceData,
+    MopekaIOTFleet,
+    TankConfig,
+    TankConfigStore,
+)
+
+TANK_LEVEL = DeviceKey(key="tank_level", device_id=None)
+TANK_FILL = DeviceKey(key="tank_fill", device_id=None)
+
+
+def _service_info(address: str) -> BluetoothServiceInfo:
+    return BluetoothServiceInfo(
+        name="",
+        address=address,
+        rssi=-63,
+        manufacturer_data={89: b"\x08pC\xb6\xc3\xe0\xf5\t\xfa\xe3"},
+        service_uuids=["0000fee5-0000-1000-8000-00805f9b34fb"],
+        service_data={},
+        source="local",
+    )
+
+
+def _write(path, data, bump=0):
+    path.write_text(json.dumps(data))
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + bump))
+
+
+def test_store_reloads_changed_entries(tmp_path):
+    path = tmp_path / "tanks.json"
+    _write(
+        path,
+        {
+            "default": {"medium": "propane"},
+            "devices": {
+                "AA": {"medium": "fresh_water", "tank_height": 480},
+                "BB": {"level_offset": 10},
+            },
+        },
+    )
+    store = TankConfigStore(path)
+    changes = []
+    store.register_change_callback(changes.append)
+    assert store.get("AA") == TankConfig(MediumType.FRESH_WATER, 480)
+    assert store.get("BB") == TankConfig(level_offset=10)
+    assert store.get("CC") is store.default
+    assert store.poll() is False
+    _write(
+        path,
+        {
+            "default": {"medium": "propane"},
+            "devices": {"AA": {"medium": "fresh_water", "tank_height": 480}},
+        },
+        bump=1_000_000,
+    )
+    assert store.poll() is True
+    assert changes == [frozenset({"BB"})]
+    _write(path, {"default": {"medium": "air"}}, bump=2_000_000)
+    assert store.poll() is True
+    assert changes[-1] is None
+    assert store.get("AA").medium is MediumType.AIR
+
+
+def test_store_keeps_config_when_file_is_invalid(tmp_path):
+    path = tmp_path / "tanks.json"
+    _write(path, {"devices": {"AA": {"medium": "fresh_water"}}})
+    store = TankConfigStore(path)
+    path.write_text('{"devices": {"AA": {"medium": "lava"}}}')
+    assert store.poll() is False
+    path.write_text('{"devices": {"AA": {"volume": 5}}}')
+    os.utime(path, ns=(0, 1))
+    assert store.poll() is False
+    assert store.get("AA").medium is MediumType.FRESH_WATER
+    with pytest.raises(ValueError):
+        store.load()
+    assert len(TankConfigStore(tmp_path / "missing.json")) == 0
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        [],
+        {"default": []},
+        {"devices": []},
+        {"devices": {"AA": "fresh_water"}},
+        {"devices": {"AA": {"medium": 3}}},
+        {"devices": {"AA": {"tank_height": "480"}}},
+        {"devices": {"AA": {"level_offset": None}}},
+        {"devices": {"AA": {"level_deadband": True}}},
+    ],
+)
+def test_store_rejects_wrong_types(tmp_path, data):
+    path = tmp_path / "tanks.json"
+    _write(path, data)
+    with pytest.raises(ValueError):
+        TankConfigStore(path)
+
+
+def test_store_accepts_null_tank_height(tmp_path):
+    path = tmp_path / "tanks.json"
+    _write(
+        path,
+        {"default": {"tank_height": 480}, "devices": {"AA": {"tank_height": None}}},
+    )
+    store = TankConfigStore(path)
+    assert store.default.tank_height == 480
+    assert store.get("AA").tank_height is None
+
+
+def test_parser_applies_tank_config():
+    parser = MopekaIOTBluetoothDeviceData(
+        tank_config=TankConfig(tank_height=682, level_offset=-0.5, level_deadband=5)
+    )
+    update = parser.update(_service_info("AA:AA:AA:AA:AA:AA"))
+    assert update.entity_values[TANK_LEVEL].native_value == 340.5
+    assert update.entity_values[TANK_FILL].native_value == 49.9
+    parser.set_tank_config(TankConfig(MediumType.FRESH_WATER))
+    assert parser.medium_type is MediumType.FRESH_WATER
+    update = parser.update(_service_info("AA:AA:AA:AA:AA:AA"))
+    assert update.entity_values[TANK_LEVEL].native_value == 711
+
+
+def test_fleet_applies_reloaded_config(tmp_path):
+    path = tmp_path / "tanks.json"
+    _write(path, {"devices": {"AA:AA:AA:AA:AA:AA": {"medium": "fresh_water"}}})
+    store = TankConfigStore(path)
+    fleet = MopekaIOTFleet(config=store)
+    first = fleet.update(_service_info("AA:AA:AA:AA:AA:AA"))
+    assert first.entity_values[TANK_LEVEL].native_value == 711
+    fleet.update(_service_info("BB:BB:BB:BB:BB:BB"))
+    _write(path, {"devices": {}}, bump=1_000_000)
+    store.poll()
+    assert fleet.medium_type("AA:AA:AA:AA:AA:AA") is MediumType.PROPANE
+    again = fleet.update(_service_info("AA:AA:AA:AA:AA:AA"))
+    assert again.entity_values[TANK_LEVEL].native_value == 341
+
+
+def test_store_matches_addresses_regardless_of_case(tmp_path):
+    path = tmp_path / "tanks.json"
+    _write(path, {"devices": {"aa:bb:cc:dd:ee:ff": {"medium": "fresh_water"}}})
+    store = TankConfigStore(path)
+    assert "AA:BB:CC:DD:EE:FF" in store
+    assert store.get("AA:BB:CC:DD:EE:FF").medium is MediumType.FRESH_WATER
+    assert store.get("aa:bb:cc:dd:ee:ff").medium is MediumType.FRESH_WATER
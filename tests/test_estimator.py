@@ -0,0 +1,122 @@
+from unittest.mock import patch
+
+import pytest
+from bluetooth_sensor_state_data import BluetoothServiceInfo
+from sensor_state_data import DeviceKey
+
+from mopeka_iot_ble import ConsumptionEstimator, MopekaIOTBluetoothDeviceData
+
+HOUR = 3600.0
+
+
+def test_linear_consumption():
+    estimator = ConsumptionEstimator(min_samples=5, min_span=HOUR)
+    estimates = [
+        estimator.update("a", hour * HOUR, 500.0 - 2.0 * hour, 3) for hour in range(6)
+    ]
+    assert estimates[:5] == [None] * 4 + [estimates[4]]
+    estimate = estimates[-1]
+    assert estimate is not None
+    assert estimate.consumption_rate == pytest.approx(48.0)
+    assert estimate.level == pytest.approx(490.0)
+    assert estimate.time_to_empty == pytest.approx(490.0 / 48.0)
+    assert estimate.samples == 6
+
+
+def test_low_quality_and_missing_levels_are_ignored():
+    estimator = ConsumptionEstimator(min_samples=2, min_span=0)
+    assert estimator.update("a", 0, 500.0, 3) is None
+    assert estimator.update("a", HOUR, None, 0) is None
+    assert estimator.update("a", HOUR, 100.0, 1) is None
+    estimate = estimator.update("a", 2 * HOUR, 498.0, 2)
+    assert estimate is not None
+    assert estimate.consumption_rate == pytest.approx(24.0)
+
+
+def test_refill_resets_the_fit():
+    estimator = ConsumptionEstimator(min_samples=3, min_span=0)
+    for hour in range(5):
+        estimator.update("a", hour * HOUR, 200.0 - 10.0 * hour, 3)
+    assert estimator.update("a", 5 * HOUR, 600.0, 3) is None
+    assert estimator.refills("a") == 0
+    # The second reading confirms the refill, the fit restarts at 600.
+    assert estimator.update("a", 6 * HOUR, 599.0, 3) is None
+    assert estimator.refills("a") == 1
+    estimate = estimator.update("a", 7 * HOUR, 598.0, 3)
+    assert estimate is not None
+    assert estimate.consumption_rate == pytest.approx(24.0)
+    assert estimate.level == pytest.approx(598.0)
+    estimator.forget("a")
+    assert estimator.refills("a") == 0
+
+
+def test_single_jump_is_not_a_refill():
+    estimator = ConsumptionEstimator(min_samples=2, min_span=0)
+    for hour in range(3):
+        estimator.update("a", hour * HOUR, 200.0 - 10.0 * hour, 3)
+    assert estimator.update("a", 3 * HOUR, 600.0, 3) is None
+    estimate = estimator.update("a", 4 * HOUR, 160.0, 3)
+    assert estimator.refills("a") == 0
+    assert estimate is not None
+    assert estimate.samples == 4
+    assert estimate.consumption_rate == pytest.approx(240.0)
+
+
+def test_readings_are_bucketed():
+    estimator = ConsumptionEstimator(window=HOUR, bucket=60.0, min_span=0)
+    # One advertisement every 2 s for 3 hours, the level dropping 24 mm a day.
+    for second in range(0, 3 * 3600, 2):
+        estimate = estimator.update("a", second, 500.0 - second / 3600.0, 3)
+    assert estimate is not None
+    assert estimate.samples == 60
+    assert estimate.consumption_rate == pytest.approx(24.0)
+
+
+def test_window_drops_old_samples():
+    estimator = ConsumptionEstimator(window=4 * HOUR, min_samples=2, min_span=0)
+    for hour in range(5):
+        estimator.update("a", hour * HOUR, 500.0 - 10.0 * hour, 3)
+    estimate = None
+    for hour in range(5, 10):
+        estimate = estimator.update("a", hour * HOUR, 460.0 - 1.0 * (hour - 4), 3)
+    assert estimate is not None
+    assert estimate.samples == 5
+    assert estimate.consumption_rate == pytest.approx(24.0)
+
+
+def test_rising_level_has_no_time_to_empty():
+    estimator = ConsumptionEstimator(min_samples=2, min_span=0, refill_threshold=1e9)
+    estimator.update("a", 0, 100.0, 3)
+    estimate = estimator.update("a", HOUR, 110.0, 3)
+    assert estimate is not None
+    assert estimate.consumption_rate == pytest.approx(-240.0)
+    assert estimate.time_to_empty is None
+
+
+def test_parser_publishes_estimate():
+    estimator = ConsumptionEstimator(min_samples=2, min_span=0)
+    parser = MopekaIOTBluetoothDeviceData(consumption_estimator=estimator)
+    consumption_rate = DeviceKey("consumption_rate")
+    for hour, tank_level_raw in enumerate((1000, 990)):
+        payload = (
+            b"\x08pC"
+            + bytes((tank_level_raw & 0xFF, 0xC0 | tank_level_raw >> 8))
+            + b"\xe0\xf5\t\xfa\xe3"
+        )
+        service_info = BluetoothServiceInfo(
+            name="",
+            address="C9:F3:32:E0:F5:09",
+            rssi=-63,
+            manufacturer_data={89: payload},
+            service_uuids=["0000fee5-0000-1000-8000-00805f9b34fb"],
+            service_data={},
+            source="local",
+        )
+        with patch("mopeka_iot_ble.parser.time.time", return_value=hour * HOUR):
+            values = parser.update(service_info).entity_values
+        if not hour:
+            assert consumption_rate not in values
+    assert values[consumption_rate].native_value > 0
+    description = parser.update(service_info).entity_descriptions[consumption_rate]
+    assert description.native_unit_of_measurement.value == "mm/d"
+    assert values[DeviceKey("time_to_empty")].native_value > 0
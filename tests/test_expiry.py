@@ -0,0 +1,96 @@
+import random
+
+import pytest
+from bluetooth_sensor_state_data import BluetoothServiceInfo
+
+from mopeka_iot_ble import DeviceExpiry, MopekaIOTFleet, TimerWheel
+
+
+def test_timer_wheel_matches_sorted_deadlines():
+    rng = random.Random(1)
+    wheel = TimerWheel(now=1000.0)
+    now = 1000
+    pending: dict[str, int] = {}
+    for _ in range(2000):
+        if rng.random() < 0.5:
+            key = str(rng.randrange(200))
+            deadline = now + rng.choice((1, 63, 64, 4095, 4096, 300000, 2**25))
+            wheel.schedule(key, deadline)
+            pending[key] = deadline
+        else:
+            now += rng.choice((1, 60, 5000))
+            expected = {key for key, deadline in pending.items() if deadline <= now}
+            assert set(wheel.advance(now)) == expected
+            for key in expected:
+                del pending[key]
+    assert len(wheel) == len(pending)
+
+
+def test_timer_wheel_cancel():
+    wheel = TimerWheel(now=0.0)
+    wheel.schedule("a", 10.0)
+    wheel.schedule("b", 10.5)
+    assert "a" in wheel
+    wheel.cancel("a")
+    wheel.cancel("missing")
+    assert wheel.advance(10.0) == []
+    assert wheel.advance(11.0) == ["b"]
+    assert len(wheel) == 0
+
+
+def test_device_expiry_stale_available_evict():
+    expiry = DeviceExpiry(stale_after=60, evict_after=300, now=0.0)
+    events: list[tuple[str, str]] = []
+    expiry.register_stale_callback(lambda address: events.append(("stale", address)))
+    expiry.register_available_callback(
+        lambda address: events.append(("available", address))
+    )
+    expiry.register_evict_callback(lambda address: events.append(("evict", address)))
+    expiry.seen("a", 0.0)
+    expiry.seen("b", 0.0)
+    for now in range(0, 59):
+        expiry.seen("a", float(now))
+        expiry.advance(float(now))
+    assert events == []
+    expiry.advance(60.0)
+    assert events == [("stale", "b")]
+    assert expiry.is_stale("b") and not expiry.is_stale("a")
+    expiry.seen("b", 61.0)
+    assert events[-1] == ("available", "b")
+    expiry.advance(119.0)
+    assert events[-1] == ("stale", "a")
+    expiry.advance(358.0)
+    assert events[-1] == ("evict", "a")
+    assert "a" not in expiry and expiry.last_seen("b") == 61.0
+    expiry.advance(400.0)
+    assert events[-1] == ("evict", "b")
+    assert len(expiry) == 0
+
+
+def test_device_expiry_rejects_short_evict():
+    with pytest.raises(ValueError):
+        DeviceExpiry(stale_after=60, evict_after=30)
+
+
+def test_fleet_evicts_expired_devices():
+    expiry = DeviceExpiry(stale_after=60, evict_after=120)
+    fleet = MopekaIOTFleet(expiry=expiry)
+    fleet.update(
+        BluetoothServiceInfo(
+            name="",
+            address="AA:AA:AA:AA:AA:AA",
+            rssi=-63,
+            manufacturer_data={89: b"\x08pC\xb6\xc3\xe0\xf5\t\xfa\xe3"},
+            service_uuids=["0000fee5-0000-1000-8000-00805f9b34fb"],
+            service_data={},
+            source="local",
+        )
+    )
+    last_seen = expiry.last_seen("AA:AA:AA:AA:AA:AA")
+    assert last_seen is not None
+    expiry.advance(last_seen + 61)
+    assert expiry.is_stale("AA:AA:AA:AA:AA:AA")
+    assert "AA:AA:AA:AA:AA:AA" in fleet
+    expiry.advance(last_seen + 121)
+    assert "AA:AA:AA:AA:AA:AA" not in fleet
+    assert fleet.parser("AA:AA:AA:AA:AA:AA") is None
@@ -0,0 +1,86 @@
+import csv
+import json
+
+from bluetooth_sensor_state_data import BluetoothServiceInfo
+
+from mopeka_iot_ble import (
+    ExportFormat,
+    MediumType,
+    MopekaIOTBluetoothDeviceData,
+    MopekaReading,
+    ReadingExporter,
+)
+from mopeka_iot_ble.export import EXPORT_FIELDS
+
+PRO_INSTALLED_SERVICE_INFO = BluetoothServiceInfo(
+    name="",
+    address="C9:F3:32:E0:F5:09",
+    rssi=-63,
+    manufacturer_data={89: b"\x08pC\xb6\xc3\xe0\xf5\t\xfa\xe3"},
+    service_uuids=["0000fee5-0000-1000-8000-00805f9b34fb"],
+    service_data={},
+    source="local",
+)
+
+
+def test_parser_reading_callback():
+    parser = MopekaIOTBluetoothDeviceData(MediumType.FRESH_WATER)
+    readings: list[MopekaReading] = []
+    remove = parser.register_reading_callback(readings.append)
+    parser.update(PRO_INSTALLED_SERVICE_INFO)
+    (reading,) = readings
+    assert reading.address == "C9:F3:32:E0:F5:09"
+    assert reading.source == "local"
+    assert reading.rssi == -63
+    assert reading.model_id == 8
+    assert reading.model == "M1015"
+    assert reading.name == "Pro Plus"
+    assert reading.medium is MediumType.FRESH_WATER
+    assert reading.battery_voltage == 3.5
+    assert reading.temperature == 27
+    assert reading.button_pressed is False
+    assert reading.tank_level_raw == 950
+    assert reading.tank_level == 711
+    assert reading.reading_quality == 3
+    assert reading.accelerometer_x == 0xFA
+    assert reading.accelerometer_y == 0xE3
+    assert reading.raw == b"\x08pC\xb6\xc3\xe0\xf5\t\xfa\xe3"
+    remove()
+    parser.update(PRO_INSTALLED_SERVICE_INFO)
+    assert len(readings) == 1
+
+
+def test_csv_export(tmp_path):
+    path = tmp_path / "readings.csv"
+    parser = MopekaIOTBluetoothDeviceData()
+    with ReadingExporter(path) as exporter:
+        parser.register_reading_callback(exporter)
+        parser.update(PRO_INSTALLED_SERVICE_INFO)
+        parser.update(PRO_INSTALLED_SERVICE_INFO)
+    with open(path, newline="") as file:
+        rows = list(csv.reader(file))
+    assert tuple(rows[0]) == EXPORT_FIELDS
+    assert len(rows) == 3
+    row = dict(zip(EXPORT_FIELDS, rows[1]))
+    assert row["address"] == "C9:F3:32:E0:F5:09"
+    assert row["medium"] == "propane"
+    assert row["raw"] == "087043b6c3e0f509fae3"
+
+
+def test_ndjson_export_with_rotation(tmp_path):
+    path = tmp_path / "readings.ndjson"
+    parser = MopekaIOTBluetoothDeviceData()
+    exporter = ReadingExporter(path, ExportFormat.NDJSON, max_bytes=1)
+    parser.register_reading_callback(exporter)
+    for _ in range(3):
+        parser.update(PRO_INSTALLED_SERVICE_INFO)
+    exporter.close()
+    assert exporter.rotated_paths == [
+        tmp_path / "readings.ndjson.1",
+        tmp_path / "readings.ndjson.2",
+    ]
+    for file_path in (*exporter.rotated_paths, path):
+        (line,) = file_path.read_text().splitlines()
+        data = json.loads(line)
+        assert data["model"] == "M1015"
+        assert data["tank_level"] is not None
@@ -0,0 +1,117 @@
+import pytest
+from bluetooth_sensor_state_data import BluetoothServiceInfo
+
+from mopeka_iot_ble import (
+    MediumType,
+    MopekaIOTFleet,
+    MopekaReading,
+    ParserMetrics,
+    QualityTracker,
+    SubscriptionBus,
+    TankLevelIndex,
+)
+
+
+def _service_info(
+    address: str, manufacturer_data: dict[int, bytes]
+) -> BluetoothServiceInfo:
+    return BluetoothServiceInfo(
+        name="",
+        address=address,
+        rssi=-63,
+        manufacturer_data=manufacturer_data,
+        service_uuids=["0000fee5-0000-1000-8000-00805f9b34fb"],
+        service_data={},
+        source="local",
+    )
+
+
+PRO = {89: b"\x08pC\xb6\xc3\xe0\xf5\t\xfa\xe3"}
+
+
+def test_fleet_routes_by_address():
+    fleet = MopekaIOTFleet(mediums={"AA:AA:AA:AA:AA:AA": MediumType.FRESH_WATER})
+    first = fleet.update(_service_info("AA:AA:AA:AA:AA:AA", PRO))
+    second = fleet.update(_service_info("BB:BB:BB:BB:BB:BB", PRO))
+    assert first is not None and second is not None
+    assert first.devices[None].name == "Pro Plus AAAA"
+    assert second.devices[None].name == "Pro Plus BBBB"
+    assert len(fleet) == 2
+    assert "AA:AA:AA:AA:AA:AA" in fleet
+    assert list(fleet) == ["AA:AA:AA:AA:AA:AA", "BB:BB:BB:BB:BB:BB"]
+    assert fleet.medium_type("AA:AA:AA:AA:AA:AA") is MediumType.FRESH_WATER
+    assert fleet.medium_type("BB:BB:BB:BB:BB:BB") is MediumType.PROPANE
+    assert fleet.parser("CC:CC:CC:CC:CC:CC") is None
+
+
+def test_fleet_ignores_other_manufacturers():
+    metrics = ParserMetrics()
+    fleet = MopekaIOTFleet(metrics=metrics)
+    assert fleet.update(_service_info("AA:AA:AA:AA:AA:AA", {76: b"\x01"})) is None
+    # Nordic's manufacturer ID without the Mopeka service UUID.
+    nordic = _service_info("BB:BB:BB:BB:BB:BB", {89: b"\x01\x02"})
+    nordic.service_uuids.clear()
+    assert fleet.update(nordic) is None
+    assert len(fleet) == 0
+    fleet.update(_service_info("AA:AA:AA:AA:AA:AA", PRO))
+    assert metrics.adverts_seen == 3
+    assert metrics.accepted == 1
+    lines = fleet.render_metrics().splitlines()
+    assert "mopeka_fleet_devices 1" in lines
+    assert "mopeka_decode_duration_seconds_count 1" in lines
+
+
+def test_fleet_reading_callbacks():
+    fleet = MopekaIOTFleet()
+    fleet.update(_service_info("AA:AA:AA:AA:AA:AA", PRO))
+    readings: list[MopekaReading] = []
+    remove = fleet.register_reading_callback(readings.append)
+    fleet.update(_service_info("AA:AA:AA:AA:AA:AA", PRO))
+    fleet.update(_service_info("BB:BB:BB:BB:BB:BB", PRO))
+    assert [reading.address for reading in readings] == [
+        "AA:AA:AA:AA:AA:AA",
+        "BB:BB:BB:BB:BB:BB",
+    ]
+    remove()
+    fleet.update(_service_info("AA:AA:AA:AA:AA:AA", PRO))
+    assert len(readings) == 2
+
+
+def test_fleet_entity_subset():
+    with pytest.raises(ValueError):
+        MopekaIOTFleet(entities=["position"])
+    fleet = MopekaIOTFleet(entities=["tank_level", "battery"])
+    update = fleet.update(_service_info("AA:AA:AA:AA:AA:AA", PRO))
+    assert update is not None
+    assert {device_key.key for device_key in update.entity_values} == {
+        "tank_level",
+        "battery",
+    }
+
+
+def test_fleet_remove_callbacks():
+    bus = SubscriptionBus()
+    fleet = MopekaIOTFleet(bus=bus)
+    index = TankLevelIndex()
+    quality = QualityTracker()
+    fleet.register_reading_callback(index)
+    fleet.register_reading_callback(quality)
+    removed: list[str] = []
+    fleet.register_remove_callback(index.remove)
+    fleet.register_remove_callback(quality.forget)
+    unregister = fleet.register_remove_callback(removed.append)
+    bus.subscribe(lambda change: None)
+    fleet.update(_service_info("AA:AA:AA:AA:AA:AA", PRO))
+    assert index.level("AA:AA:AA:AA:AA:AA") is not None
+    assert len(quality) == 1
+    fleet.remove("AA:AA:AA:AA:AA:AA")
+    assert removed == ["AA:AA:AA:AA:AA:AA"]
+    assert index.level("AA:AA:AA:AA:AA:AA") is None
+    assert len(quality) == 0
+    assert not bus._last_values
+    # Unknown devices are not called back.
+    fleet.remove("AA:AA:AA:AA:AA:AA")
+    unregister()
+    fleet.update(_service_info("AA:AA:AA:AA:AA:AA", PRO))
+    fleet.remove("AA:AA:AA:AA:AA:AA")
+    assert removed == ["AA:AA:AA:AA:AA:AA"]
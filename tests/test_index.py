@@ -0,0 +1,69 @@
+from bluetooth_sensor_state_data import BluetoothServiceInfo
+
+from mopeka_iot_ble import MediumType, MopekaIOTFleet, TankLevelIndex
+
+
+def _service_info(address: str, payload: bytes) -> BluetoothServiceInfo:
+    return BluetoothServiceInfo(
+        name="",
+        address=address,
+        rssi=-63,
+        manufacturer_data={89: payload},
+        service_uuids=["0000fee5-0000-1000-8000-00805f9b34fb"],
+        service_data={},
+        source="local",
+    )
+
+
+def _index() -> TankLevelIndex:
+    index = TankLevelIndex()
+    index.set_level("a", 50, MediumType.PROPANE, "M1015")
+    index.set_level("b", 10, MediumType.PROPANE, "M1017")
+    index.set_level("c", 30, MediumType.FRESH_WATER, "M1015")
+    index.set_level("d", 90, MediumType.PROPANE, "M1015")
+    return index
+
+
+def test_range_queries():
+    index = _index()
+    assert index.below(30) == [(10, "b")]
+    assert index.below(31) == [(10, "b"), (30, "c")]
+    assert index.above(50) == [(90, "d")]
+    assert index.between(10, 90) == [(10, "b"), (30, "c"), (50, "a")]
+    assert index.below(60, medium=MediumType.PROPANE) == [(10, "b"), (50, "a")]
+    assert index.below(60, model="M1015") == [(30, "c"), (50, "a")]
+    assert index.below(100, MediumType.PROPANE, "M1015") == [(50, "a"), (90, "d")]
+    assert index.below(100, MediumType.LNG) == []
+
+
+def test_top_k():
+    index = _index()
+    assert index.lowest(2) == [(10, "b"), (30, "c")]
+    assert index.highest(2) == [(90, "d"), (50, "a")]
+    assert index.highest(0) == []
+    assert index.lowest(5, medium=MediumType.FRESH_WATER) == [(30, "c")]
+
+
+def test_updates_and_removal():
+    index = _index()
+    index.set_level("d", 5, MediumType.PROPANE, "M1015")
+    assert index.lowest(1) == [(5, "d")]
+    assert index.level("d") == 5
+    index.set_level("c", 30, MediumType.PROPANE, "M1015")
+    assert index.lowest(5, medium=MediumType.FRESH_WATER) == []
+    index.remove("c")
+    index.remove("missing")
+    assert len(index) == 3
+    assert index.level("c") is None
+    assert index.below(100) == [(5, "d"), (10, "b"), (50, "a")]
+
+
+def test_fed_from_fleet():
+    index = TankLevelIndex()
+    fleet = MopekaIOTFleet()
+    fleet.register_reading_callback(index)
+    fleet.update(
+        _service_info("AA:AA:AA:AA:AA:AA", b"\x08pC\xb6\xc3\xe0\xf5\t\xfa\xe3")
+    )
+    fleet.update(_service_info("AA:AA:AA:AA:AA:AA", b"\x08rF\x000\xe0\xf5\t\xf0\xd8"))
+    assert index.lowest(1, MediumType.PROPANE, "M1015") == [(341, "AA:AA:AA:AA:AA:AA")]
@@ -0,0 +1,72 @@
+import asyncio
+import socket
+
+from sensor_state_data import DeviceKey
+
+from mopeka_iot_ble import IngestServer, encode_frame
+
+TANK_LEVEL = DeviceKey(key="tank_level", device_id=None)
+PRO_FRAME = b"\x08pC\xb6\xc3\xe0\xf5\t\xfa\xe3"
+SERVICE_UUID = "0000fee5-0000-1000-8000-00805f9b34fb"
+
+
+def _frame(address: str, manufacturer_id: int = 89) -> bytes:
+    return encode_frame(
+        address, -63, "proxy-1", manufacturer_id, PRO_FRAME, [SERVICE_UUID]
+    )
+
+
+def test_feed_handles_partial_and_bad_frames():
+    server = IngestServer()
+    updates = []
+    server.register_callback(lambda address, update: updates.append(address))
+    last = _frame("AA:AA:AA:AA:AA:03")
+    data = _frame("AA:AA:AA:AA:AA:01") + _frame("AA:AA:AA:AA:AA:02", 76)
+    data += b"\x03\x00abc" + last
+    # The last frame is incomplete and left for the next read.
+    assert server.feed(memoryview(data)[:-4]) == len(data) - len(last)
+    assert updates == ["AA:AA:AA:AA:AA:01"]
+    assert server.ignored == 1
+    assert server.errors == 1
+    parser = server.fleet.parser("AA:AA:AA:AA:AA:01")
+    assert parser is not None and parser.last_frame.source == "proxy-1"
+
+
+def test_udp_and_tcp_on_localhost():
+    async def _run():
+        server = IngestServer()
+        received = asyncio.Queue()
+        server.register_callback(
+            lambda address, update: received.put_nowait(
+                (address, update.entity_values[TANK_LEVEL].native_value)
+            )
+        )
+        udp_port = await server.start_udp()
+        tcp_port = await server.start_tcp()
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+            sock.sendto(
+                _frame("AA:AA:AA:AA:AA:01") + _frame("AA:AA:AA:AA:AA:02"),
+                ("127.0.0.1", udp_port),
+            )
+        _, writer = await asyncio.open_connection("127.0.0.1", tcp_port)
+        frame = _frame("BB:BB:BB:BB:BB:01")
+        writer.write(frame[:7])
+        await writer.drain()
+        await asyncio.sleep(0.01)
+        writer.write(frame[7:] + _frame("BB:BB:BB:BB:BB:02"))
+        await writer.drain()
+        results = [await asyncio.wait_for(received.get(), 5) for _ in range(4)]
+        writer.close()
+        await writer.wait_closed()
+        await server.close()
+        return results, server.frames, server.errors
+
+    results, frames, errors = asyncio.run(_run())
+    assert sorted(results) == [
+        ("AA:AA:AA:AA:AA:01", 341),
+        ("AA:AA:AA:AA:AA:02", 341),
+        ("BB:BB:BB:BB:BB:01", 341),
+        ("BB:BB:BB:BB:BB:02", 341),
+    ]
+    assert frames == 4
+    assert errors == 0
@@ -0,0 +1,62 @@
+import math
+
+from bluetooth_sensor_state_data import BluetoothServiceInfo
+from sensor_state_data import DeviceKey
+
+from mopeka_iot_ble import LinkTracker, MopekaIOTBluetoothDeviceData
+
+
+def test_link_tracker_rssi_and_intervals():
+    tracker = LinkTracker(alpha=0.5)
+    tracker.update("AA", 0.0, -60, b"a")
+    tracker.update("AA", 0.1, -70, b"a")
+    stats = tracker.update("AA", 5.0, -80, b"b")
+    assert stats.samples == 3
+    assert math.isclose(stats.rssi_mean, -72.5)
+    assert stats.rssi_stddev > 0
+    assert math.isclose(stats.repeat_interval, 0.1)
+    assert math.isclose(stats.payload_interval, 5.0)
+    # The 0.1s copy is a duplicate and does not count towards loss.
+    assert stats.packet_loss == 0.0
+    assert tracker.stats("BB") is None
+    tracker.forget("AA")
+    assert len(tracker) == 0
+
+
+def test_link_tracker_packet_loss():
+    tracker = LinkTracker(alpha=0.01)
+    timestamp = 0.0
+    for i in range(400):
+        # Every fourth advertisement is missed.
+        timestamp += 10.0 if i % 3 == 2 else 5.0
+        stats = tracker.update("AA", timestamp, -60, bytes([i % 256]))
+    assert stats.packet_loss is not None
+    assert 0.2 < stats.packet_loss < 0.3
+    pinned = LinkTracker(expected_interval=2.0)
+    pinned.update("AA", 0.0, -60, b"a")
+    assert pinned.update("AA", 6.0, -60, b"b").packet_loss == 2 / 3
+
+
+def test_parser_publishes_link_sensors():
+    parser = MopekaIOTBluetoothDeviceData(link_tracker=LinkTracker())
+    service_info = BluetoothServiceInfo(
+        name="",
+        address="AA:AA:AA:AA:AA:AA",
+        rssi=-63,
+        manufacturer_data={89: b"\x08pC\xb6\xc3\xe0\xf5\t\xfa\xe3"},
+        service_uuids=["0000fee5-0000-1000-8000-00805f9b34fb"],
+        service_data={},
+        source="local",
+    )
+    update = parser.update(service_info)
+    assert update.entity_values[DeviceKey("rssi_mean")].native_value == -63.0
+    assert DeviceKey("packet_loss") not in update.entity_values
+    update = parser.update(service_info)
+    assert update.entity_values[DeviceKey("rssi_stddev")].native_value == 0.0
+    assert DeviceKey("repeat_interval") in update.entity_values
+    assert (
+        MopekaIOTBluetoothDeviceData()
+        .update(service_info)
+        .entity_values.get(DeviceKey("rssi_mean"))
+        is None
+    )
@@ -0,0 +1,87 @@
+from bluetooth_sensor_state_data import BluetoothServiceInfo
+
+from mopeka_iot_ble import MopekaIOTBluetoothDeviceData, ParserMetrics, RejectReason
+
+
+def _service_info(
+    manufacturer_data: dict[int, bytes],
+    service_uuids: list[str] | None = None,
+) -> BluetoothServiceInfo:
+    return BluetoothServiceInfo(
+        name="",
+        address="C9:F3:32:E0:F5:09",
+        rssi=-63,
+        manufacturer_data=manufacturer_data,
+        service_uuids=(
+            ["0000fee5-0000-1000-8000-00805f9b34fb"]
+            if service_uuids is None
+            else service_uuids
+        ),
+        service_data={},
+        source="local",
+    )
+
+
+def test_parser_records_metrics():
+    metrics = ParserMetrics()
+    parser = MopekaIOTBluetoothDeviceData(metrics=metrics)
+    parser.update(_service_info({89: b"\x08pC\xb6\xc3\xe0\xf5\t\xfa\xe3"}))
+    parser.update(_service_info({89: b"\x08rF\x000\xe0\xf5\t\xf0\xd8"}))
+    parser.update(_service_info({89: b"\x03pC\xb6\xc3\xe0\xf5\t\xfa\xe3"}))
+    parser.update(_service_info({89: b"\x08pC\xb6\xc3\xe0\xf5\t\xfa\xe3"}, []))
+    parser.update(_service_info({89: b"\x7fpC\xb6\xc3\xe0\xf5\t\xfa\xe3"}))
+    parser.update(_service_info({89: b"\x08pC\xb6\xc3\xe0\xf5\t\xfa"}))
+    assert metrics.adverts_seen == 6
+    assert metrics.accepted == 3
+    assert metrics.low_quality == 1
+    assert metrics.models == {"M1015": 2, "M1017": 1}
+    assert metrics.rejected == {
+        RejectReason.NOT_MOPEKA: 1,
+        RejectReason.UNSUPPORTED_MODEL: 1,
+        RejectReason.WRONG_LENGTH: 1,
+    }
+    assert parser.metrics is metrics
+    # Only the decoded advertisements are timed.
+    assert "mopeka_decode_duration_seconds_count 3" in metrics.render().splitlines()
+
+
+def test_supported_does_not_count():
+    metrics = ParserMetrics()
+    parser = MopekaIOTBluetoothDeviceData(metrics=metrics)
+    readings = []
+    parser.register_reading_callback(readings.append)
+    service_info = _service_info({89: b"\x08pC\xb6\xc3\xe0\xf5\t\xfa\xe3"})
+    assert not parser.supported(_service_info({76: b"\x01"}))
+    assert parser.supported(service_info)
+    parser.update(service_info)
+    assert metrics.adverts_seen == 1
+    assert metrics.accepted == 1
+    assert metrics.rejected[RejectReason.NOT_MOPEKA] == 0
+    assert len(readings) == 1
+
+
+def test_render():
+    metrics = ParserMetrics(latency_buckets=(0.001, 0.01))
+    metrics.record_accepted("M1015", 3)
+    metrics.record_accepted('Pro "X"', 0)
+    metrics.record_rejected(RejectReason.WRONG_LENGTH)
+    for _ in range(3):
+        metrics.record_seen()
+    metrics.record_latency(0.0005)
+    metrics.record_latency(0.005)
+    metrics.record_latency(1.0)
+    text = metrics.render({"mopeka_fleet_devices": 2})
+    lines = text.splitlines()
+    assert "mopeka_adverts_seen_total 3" in lines
+    assert "mopeka_adverts_accepted_total 2" in lines
+    assert 'mopeka_adverts_rejected_total{reason="wrong_length"} 1' in lines
+    assert 'mopeka_adverts_rejected_total{reason="not_mopeka"} 0' in lines
+    assert 'mopeka_readings_total{model="M1015"} 1' in lines
+    assert 'mopeka_readings_total{model="Pro \\"X\\""} 1' in lines
+    assert "mopeka_low_quality_readings_total 1" in lines
+    assert 'mopeka_decode_duration_seconds_bucket{le="0.001"} 1' in lines
+    assert 'mopeka_decode_duration_seconds_bucket{le="0.01"} 2' in lines
+    assert 'mopeka_decode_duration_seconds_bucket{le="+Inf"} 3' in lines
+    assert "mopeka_decode_duration_seconds_count 3" in lines
+    assert "mopeka_fleet_devices 2" in lines
+    assert text.endswith("\n")
@@ -0,0 +1,89 @@
+from bluetooth_sensor_state_data import BluetoothServiceInfo
+
+from mopeka_iot_ble import MovementDetector, MovementEvent
+from mopeka_iot_ble.movement import accelerometer_to_signed
+from mopeka_iot_ble.parser import MopekaIOTBluetoothDeviceData
+
+ADDRESS = "C9:F3:32:E0:F5:09"
+
+
+def _service_info(x: int, y: int) -> BluetoothServiceInfo:
+    return BluetoothServiceInfo(
+        name="",
+        address=ADDRESS,
+        rssi=-63,
+        manufacturer_data={89: b"\x08pC\xb6\xc3\xe0\xf5\t" + bytes((x, y))},
+        service_uuids=["0000fee5-0000-1000-8000-00805f9b34fb"],
+        service_data={},
+        source="local",
+    )
+
+
+def test_accelerometer_to_signed():
+    assert accelerometer_to_signed(0) == 0
+    assert accelerometer_to_signed(127) == 127
+    assert accelerometer_to_signed(0xF0) == -16
+    assert accelerometer_to_signed(0xFF) == -1
+
+
+def test_small_jitter_is_not_movement():
+    detector = MovementDetector()
+    for x, y in ((2, 3), (4, 1), (3, 3), (1, 2), (2, 2), (3, 1)):
+        assert detector.update(ADDRESS, x, y) is None
+    assert detector.is_level(ADDRESS) is True
+
+
+def test_single_bump_is_ignored_and_move_is_confirmed():
+    detector = MovementDetector(confirm_samples=3)
+    for _ in range(5):
+        assert detector.update(ADDRESS, 2, 2) is None
+    assert detector.update(ADDRESS, 60, 2) is None
+    assert detector.update(ADDRESS, 2, 2) is None
+    assert detector.update(ADDRESS, 40, 40) is None
+    assert detector.update(ADDRESS, 40, 40) is None
+    assert detector.update(ADDRESS, 40, 40) is MovementEvent.MOVED
+    assert detector.baseline(ADDRESS) == (40.0, 40.0)
+    assert detector.is_level(ADDRESS) is None
+
+
+def test_not_level_and_back():
+    detector = MovementDetector(
+        move_threshold=100, level_tolerance=20, warmup_samples=3, alpha=0.5
+    )
+    assert detector.update(ADDRESS, 0xC0, 0) is None
+    assert detector.update(ADDRESS, 0xC0, 0) is None
+    assert detector.update(ADDRESS, 0xC0, 0) is MovementEvent.NOT_LEVEL
+    assert detector.update(ADDRESS, 0xC0, 0) is None
+    assert detector.is_level(ADDRESS) is False
+    assert detector.update(ADDRESS, 0, 0) is None
+    assert detector.update(ADDRESS, 0, 0) is MovementEvent.LEVEL
+    assert detector.is_level(ADDRESS) is True
+
+
+def test_bounded_devices():
+    detector = MovementDetector(max_devices=2)
+    detector.update("a", 0, 0)
+    detector.update("b", 0, 0)
+    # Seeing "a" again makes "b" the least recently seen device.
+    detector.update("a", 0, 0)
+    detector.update("c", 0, 0)
+    assert len(detector) == 2
+    assert detector.baseline("b") is None
+    assert detector.baseline("a") is not None
+    detector.forget("a")
+    assert len(detector) == 1
+
+
+def test_parser_fires_movement_event():
+    parser = MopekaIOTBluetoothDeviceData(
+        movement_detector=MovementDetector(confirm_samples=2)
+    )
+    for _ in range(5):
+        assert parser.update(_service_info(0xF0, 0xD8)).events == {}
+    assert parser.update(_service_info(0x20, 0x10)).events == {}
+    result = parser.update(_service_info(0x20, 0x10))
+    (event,) = result.events.values()
+    assert event.device_key.key == "movement"
+    assert event.event_type == "moved"
+    assert event.event_properties == {"accelerometer_x": 32, "accelerometer_y": 16}
+    assert parser.update(_service_info(0x20, 0x10)).events == {}
@@ -3,13 +3,23 @@ from mopeka_iot_ble import MediumType
 
 # Consider renaming the hex method to avoid the override complaint
 from mopeka_iot_ble.parser import (
+    DECODERS,
+    DEVICE_TYPES,
+    ENTITY_KEYS,
+    DecodedFrame,
     MopekaIOTBluetoothDeviceData,
     battery_to_percentage,
     battery_to_voltage,
+    decode_standard,
+    get_device_type,
     hex,
+    load_device_types,
+    register_device_type,
+    select_entities,
     tank_level_and_temp_to_mm,
     tank_level_to_mm,
     temp_to_celsius,
+    unregister_device_type,
 )
 from sensor_state_data import (
     BinarySensorDescription,
@@ -1628,3 +1638,155 @@ def test_tdr40_air_good_quality():
         },
         events={},
     )
+
+
+def test_decode_standard():
+    assert decode_standard(
+        b"\x08pC\xb6\xc3\xe0\xf5\t\xfa\xe3", MediumType.PROPANE
+    ) == DecodedFrame(
+        battery_voltage=3.5,
+        battery_percentage=100,
+        temperature=27,
+        button_pressed=False,
+        tank_level_raw=950,
+        tank_level=341,
+        reading_quality=3,
+        accelerometer_x=250,
+        accelerometer_y=227,
+    )
+    assert (
+        decode_standard(b"\x08rF\x000\xe0\xf5\t\xf0\xd8", MediumType.PROPANE).tank_level
+        is None
+    )
+
+
+def test_register_device_type():
+    service_info = BluetoothServiceInfo(
+        name="",
+        address="C9:F3:32:E0:F5:09",
+        rssi=-63,
+        manufacturer_data={89: b"\x7fpC\xb6\xc3\xe0\xf5\t\xfa\xe3\x01"},
+        service_uuids=["0000fee5-0000-1000-8000-00805f9b34fb"],
+        service_data={},
+        source="local",
+    )
+    parser = MopekaIOTBluetoothDeviceData()
+    assert parser.update(service_info).entity_values == {}
+
+    def decode_long(data: bytes, medium: MediumType) -> DecodedFrame:
+        return decode_standard(data, medium)._replace(button_pressed=bool(data[10]))
+
+    register_device_type(0x7F, "M9999", "Future Check", 11, decode_long)
+    try:
+        assert get_device_type(0x7F) is DEVICE_TYPES[0x7F]
+        with pytest.raises(ValueError):
+            register_device_type(0x7F, "M9999", "Future Check")
+        result = parser.update(service_info)
+        assert result.devices[None].name == "Future Check F509"
+        assert result.devices[None].model == "M9999"
+        assert result.binary_entity_values[
+            DeviceKey(key="button_pressed", device_id=None)
+        ].native_value
+    finally:
+        unregister_device_type(0x7F)
+    assert get_device_type(0x7F) is None
+    assert 0x7F not in DEVICE_TYPES
+    with pytest.raises(ValueError):
+        register_device_type(0x100, "M9999", "Future Check")
+    with pytest.raises(ValueError):
+        unregister_device_type(0x100)
+
+
+def test_load_device_types(tmp_path):
+    path = tmp_path / "devices.json"
+    path.write_text(
+        '[{"model_id": "0x7e", "model": "M9998", "name": "Cellular Check",'
+        ' "decoder": "standard"}]'
+    )
+    assert "standard" in DECODERS
+    assert load_device_types(path) == 1
+    try:
+        device_type = get_device_type(0x7E)
+        assert device_type is not None
+        assert device_type.name == "Cellular Check"
+        assert device_type.adv_length == 10
+        assert device_type.decoder is decode_standard
+    finally:
+        unregister_device_type(0x7E)
+
+
+@pytest.mark.parametrize(
+    "bad_entry",
+    [
+        '{"model_id": "0x7d", "model": "M9997", "name": "Bad", "decoder": "nope"}',
+        '{"model_id": "0x7d", "name": "Bad"}',
+        '{"model_id": 256, "model": "M9997", "name": "Bad"}',
+        '{"model_id": 8, "model": "M1015", "name": "Pro Plus"}',
+        '"0x7d"',
+    ],
+)
+def test_load_device_types_is_all_or_nothing(tmp_path, bad_entry):
+    path = tmp_path / "devices.json"
+    path.write_text(
+        f'[{{"model_id": "0x7e", "model": "M9998", "name": "Good"}}, {bad_entry}]'
+    )
+    with pytest.raises(ValueError, match="invalid device type 1"):
+        load_device_types(path)
+    assert get_device_type(0x7E) is None
+    assert get_device_type(0x7D) is None
+
+
+def test_device_identity_is_cached_per_address_and_model():
+    parser = MopekaIOTBluetoothDeviceData(max_identities=2)
+    first = parser.update(PRO_SERVICE_GOOD_QUALITY_INFO)
+    assert first.devices[None].name == "Pro Plus F509"
+    second = parser.update(PRO_200B_SERVICE_INFO)
+    assert second.devices[None].name == "Pro-200B E52B"
+    assert second.devices[None].model == "Pro-200"
+    third = parser.update(LIPPERT_SERVICE_INFO)
+    assert third.devices[None].name == "Lippert BottleCheck F509"
+    assert third.devices[None].model == "M1017"
+    assert len(parser._identities) == 2
+    assert (
+        first.entity_descriptions[DeviceKey(key="tank_level", device_id=None)]
+        is third.entity_descriptions[DeviceKey(key="tank_level", device_id=None)]
+    )
+
+
+def test_precision_is_applied():
+    parser = MopekaIOTBluetoothDeviceData()
+    parser.set_precision(1)
+    result = parser.update(PRO_SERVICE_GOOD_QUALITY_INFO)
+    assert (
+        result.entity_values[
+            DeviceKey(key="battery_voltage", device_id=None)
+        ].native_value
+        == 3.6
+    )
+
+
+def test_entity_subset():
+    entities = ENTITY_KEYS - {
+        "accelerometer_x",
+        "accelerometer_y",
+        "reading_quality_raw",
+        "button_pressed",
+    }
+    parser = MopekaIOTBluetoothDeviceData(entities=entities)
+    result = parser.update(PRO_SERVICE_GOOD_QUALITY_INFO)
+    keys = {device_key.key for device_key in result.entity_values}
+    assert keys == {"temperature", "battery", "battery_voltage", "tank_level"} | {
+        "reading_quality",
+        "signal_strength",
+    }
+    assert set(result.entity_descriptions) == set(result.entity_values)
+    assert not result.binary_entity_values
+    assert not parser._binary_sensor_values
+    with pytest.raises(ValueError, match="accelerometer_z"):
+        MopekaIOTBluetoothDeviceData(entities={"tank_level", "accelerometer_z"})
+
+
+def test_select_entities_shares_frozensets():
+    entities = frozenset({"tank_level"})
+    assert select_entities(entities) is entities
+    assert select_entities(None) is ENTITY_KEYS
@@ -0,0 +1,60 @@
+from bluetooth_sensor_state_data import BluetoothServiceInfo
+
+from mopeka_iot_ble import MopekaIOTFleet, QualityTracker
+
+
+def test_quality_tracker_counts_and_window():
+    tracker = QualityTracker(window=3600, bucket=600)
+    for minute, quality in enumerate((3, 3, 1, 0, 3)):
+        tracker.update("AA", minute * 60.0, quality, quality == 0)
+    stats = tracker.stats("AA", now=300.0)
+    assert stats is not None
+    assert stats.samples == 5
+    assert stats.quality_counts == (1, 1, 0, 3)
+    assert stats.no_level == 1
+    assert stats.transitions == 3
+    assert stats.poor_ratio == 0.4
+    assert stats.mean_quality == 2.0
+    tracker.update("AA", 3000.0, 2, False)
+    assert tracker.stats("AA", now=3000.0).samples == 6
+    # The first bucket falls out of the window.
+    assert tracker.stats("AA", now=3700.0).quality_counts == (0, 0, 1, 0)
+    assert tracker.stats("AA", now=10000.0).samples == 0
+    assert tracker.stats("BB") is None
+
+
+def test_quality_tracker_fleet_queries():
+    tracker = QualityTracker()
+    for i in range(30):
+        tracker.update("good", 100.0 + i, 3, False)
+        tracker.update("flaky", 100.0 + i, 3 if i % 2 else 1, False)
+        tracker.update("bad", 100.0 + i, 0, True)
+    tracker.update("new", 100.0, 0, True)
+    ranked = tracker.ranked(now=200.0)
+    assert [address for address, _ in ranked] == ["bad", "flaky", "good"]
+    assert ranked[1][1].transitions == 29
+    totals = tracker.totals(now=200.0)
+    assert totals.samples == 91
+    assert totals.no_level == 31
+    tracker.forget("bad")
+    assert len(tracker) == 3
+
+
+def test_quality_tracker_as_reading_callback():
+    tracker = QualityTracker()
+    fleet = MopekaIOTFleet()
+    fleet.register_reading_callback(tracker)
+    fleet.update(
+        BluetoothServiceInfo(
+            name="",
+            address="AA:AA:AA:AA:AA:AA",
+            rssi=-63,
+            manufacturer_data={89: b"\x08pC\xb6\xc3\xe0\xf5\t\xfa\xe3"},
+            service_uuids=["0000fee5-0000-1000-8000-00805f9b34fb"],
+            service_data={},
+            source="local",
+        )
+    )
+    stats = tracker.stats("AA:AA:AA:AA:AA:AA")
+    assert stats is not None
+    assert stats.quality_counts == (0, 0, 0, 1)
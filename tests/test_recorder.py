@@ -0,0 +1,127 @@
+import pytest
+from bluetooth_sensor_state_data import BluetoothServiceInfo
+from sensor_state_data import DeviceKey
+
+from mopeka_iot_ble import (
+    FrameRecord,
+    FrameRecorder,
+    MediumType,
+    MopekaIOTBluetoothDeviceData,
+    MopekaIOTFleet,
+    MopekaReading,
+    SnapshotError,
+    read_recording,
+    replay,
+)
+
+TANK_LEVEL = DeviceKey(key="tank_level", device_id=None)
+PRO_FRAME = b"\x08pC\xb6\xc3\xe0\xf5\t\xfa\xe3"
+
+
+def _service_info(address: str, payload: bytes = PRO_FRAME) -> BluetoothServiceInfo:
+    return BluetoothServiceInfo(
+        name="",
+        address=address,
+        rssi=-63,
+        manufacturer_data={89: payload},
+        service_uuids=["0000fee5-0000-1000-8000-00805f9b34fb"],
+        service_data={},
+        source="local",
+    )
+
+
+def test_recorder_roundtrip(tmp_path):
+    path = tmp_path / "capture.mopl"
+    records = [
+        FrameRecord(1.5, "AA:AA:AA:AA:AA:AA", "hci0", -63, MediumType.PROPANE, b"1"),
+        FrameRecord(2.5, "BB", "proxy", -70, MediumType.FRESH_WATER, PRO_FRAME),
+    ]
+    with FrameRecorder(path, sync_interval=None) as recorder:
+        recorder.write(records[0])
+    with FrameRecorder(path) as recorder:
+        recorder.write(records[1])
+    assert list(read_recording(path)) == records
+    # A record cut short by a crash ends the recording.
+    path.write_bytes(path.read_bytes()[:-3])
+    assert list(read_recording(path)) == records[:1]
+
+
+def test_torn_record_is_cut_off_before_appending(tmp_path):
+    path = tmp_path / "capture.mopl"
+    records = [
+        FrameRecord(1.5, "AA", "hci0", -63, MediumType.PROPANE, PRO_FRAME),
+        FrameRecord(2.5, "BB", "proxy", -70, MediumType.FRESH_WATER, PRO_FRAME),
+        FrameRecord(3.5, "CC", "hci1", -80, MediumType.AIR, PRO_FRAME),
+    ]
+    with FrameRecorder(path) as recorder:
+        recorder.write(records[0])
+        recorder.write(records[1])
+    path.write_bytes(path.read_bytes()[:-3])
+    with FrameRecorder(path) as recorder:
+        recorder.write(records[2])
+    assert list(read_recording(path)) == [records[0], records[2]]
+    # A header torn by a crash is written again.
+    path.write_bytes(b"MOP")
+    with FrameRecorder(path) as recorder:
+        recorder.write(records[0])
+    assert list(read_recording(path)) == records[:1]
+
+
+def test_read_recording_rejects_other_files(tmp_path):
+    path = tmp_path / "capture.mopl"
+    path.write_bytes(b"NOPE\x01")
+    with pytest.raises(SnapshotError):
+        list(read_recording(path))
+    path.write_bytes(b"")
+    assert list(read_recording(path)) == []
+
+
+# The header, then the medium ID after the timestamp and rssi, or the
+# first byte of the address.
+@pytest.mark.parametrize("offset", [5 + 9, 5 + 13])
+def test_read_recording_rejects_corrupt_records(tmp_path, offset):
+    path = tmp_path / "capture.mopl"
+    with FrameRecorder(path) as recorder:
+        recorder.write(
+            FrameRecord(1.5, "A", "hci0", -63, MediumType.PROPANE, PRO_FRAME)
+        )
+    data = bytearray(path.read_bytes())
+    data[offset] = 0xFF
+    path.write_bytes(bytes(data))
+    with pytest.raises(SnapshotError):
+        list(read_recording(path))
+
+
+def test_record_and_replay(tmp_path):
+    path = tmp_path / "capture.mopl"
+    fleet = MopekaIOTFleet()
+    with FrameRecorder(path) as recorder:
+        fleet.register_reading_callback(recorder)
+        fleet.update(_service_info("AA:AA:AA:AA:AA:AA"))
+        fleet.update(_service_info("BB:BB:BB:BB:BB:BB"))
+        fleet.update(_service_info("CC:CC:CC:CC:CC:CC", b"\x08"))
+    records = list(read_recording(path))
+    assert [record.address for record in records] == [
+        "AA:AA:AA:AA:AA:AA",
+        "BB:BB:BB:BB:BB:BB",
+    ]
+    assert records[0].source == "local" and records[0].payload == PRO_FRAME
+    levels = [
+        update.entity_values[TANK_LEVEL].native_value
+        for update in replay(path, MopekaIOTBluetoothDeviceData())
+    ]
+    assert levels == [341, 341]
+    # Replayed readings carry the recorded time and medium.
+    readings: list[MopekaReading] = []
+    parser = MopekaIOTBluetoothDeviceData(MediumType.FRESH_WATER)
+    parser.register_reading_callback(readings.append)
+    updates = list(replay(path, parser))
+    assert [reading.timestamp for reading in readings] == [
+        record.timestamp for record in records
+    ]
+    assert {reading.medium for reading in readings} == {MediumType.PROPANE}
+    assert updates[-1].entity_values[TANK_LEVEL].native_value == 341
+    assert parser.medium_type is MediumType.FRESH_WATER
+    replayed = MopekaIOTFleet()
+    assert len(list(replay(path, replayed))) == 2
+    assert list(replayed) == ["AA:AA:AA:AA:AA:AA", "BB:BB:BB:BB:BB:BB"]
@@ -0,0 +1,76 @@
+import multiprocessing
+
+import pytest
+
+from mopeka_iot_ble import FrameRingReader, FrameRingWriter, MediumType
+
+PRO_FRAME = b"\x08pC\xb6\xc3\xe0\xf5\t\xfa\xe3"
+
+
+def test_ring_roundtrip():
+    with FrameRingWriter(capacity=8) as writer:
+        with FrameRingReader(writer.name, from_start=True) as reader:
+            writer.write("AA:BB:CC:DD:EE:01", -63, PRO_FRAME, timestamp=1.5)
+            writer.write(
+                "AA:BB:CC:DD:EE:02", -70, PRO_FRAME, MediumType.FRESH_WATER, 2.5
+            )
+            writer.write("AA:BB:CC:DD:EE:03", -70, b"\xff" * 10)
+            frames = reader.read()
+            assert reader.read() == []
+            assert reader.rejected == 1
+    assert [(f.address, f.rssi, f.timestamp) for f in frames] == [
+        ("AA:BB:CC:DD:EE:01", -63, 1.5),
+        ("AA:BB:CC:DD:EE:02", -70, 2.5),
+    ]
+    assert frames[0].device_type.model == "M1015"
+    assert frames[0].frame.tank_level == 341
+    assert frames[1].medium is MediumType.FRESH_WATER
+    assert frames[1].frame.tank_level == 711
+
+
+def test_ring_overrun_and_limit():
+    with FrameRingWriter(capacity=4) as writer:
+        with FrameRingReader(writer.name) as reader:
+            for i in range(10):
+                writer.write("AA:BB:CC:DD:EE:01", -60 - i, PRO_FRAME)
+            frames = reader.read(limit=3)
+            assert reader.dropped == 6
+            assert [f.rssi for f in frames] == [-66, -67, -68]
+            assert [f.rssi for f in reader.read()] == [-69]
+
+
+def test_ring_shards():
+    addresses = [f"AA:BB:CC:DD:EE:{i:02X}" for i in range(6)]
+    with FrameRingWriter(capacity=16) as writer:
+        readers = [FrameRingReader(writer.name, shard, 2) for shard in range(2)]
+        for address in addresses:
+            writer.write(address, -60, PRO_FRAME)
+        seen = [[f.address for f in reader.read()] for reader in readers]
+        for reader in readers:
+            reader.close()
+    assert seen == [addresses[0::2], addresses[1::2]]
+
+
+def _consume(name, queue):
+    with FrameRingReader(name, from_start=True) as reader:
+        queue.put([(f.address, f.frame.tank_level) for f in reader.read()])
+
+
+def test_ring_across_processes():
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    with FrameRingWriter(capacity=4) as writer:
+        writer.write("AA:BB:CC:DD:EE:01", -63, PRO_FRAME)
+        process = context.Process(target=_consume, args=(writer.name, queue))
+        process.start()
+        result = queue.get(timeout=30)
+        process.join()
+    assert result == [("AA:BB:CC:DD:EE:01", 341)]
+
+
+def test_ring_rejects_bad_input():
+    with FrameRingWriter(capacity=4) as writer:
+        with pytest.raises(ValueError):
+            writer.write("AA:BB:CC:DD:EE:01", -60, b"\x08" * 17)
+        with pytest.raises(ValueError):
+            FrameRingReader(writer.name, shard=2, shards=2)
@@ -0,0 +1,67 @@
+import json
+
+from bluetooth_sensor_state_data import BluetoothServiceInfo
+
+from mopeka_iot_ble import (
+    MopekaIOTBluetoothDeviceData,
+    RejectedPayloadSampler,
+    RejectReason,
+)
+
+
+def _service_info(payload: bytes) -> BluetoothServiceInfo:
+    return BluetoothServiceInfo(
+        name="",
+        address="C9:F3:32:E0:F5:09",
+        rssi=-63,
+        manufacturer_data={89: payload},
+        service_uuids=["0000fee5-0000-1000-8000-00805f9b34fb"],
+        service_data={},
+        source="local",
+    )
+
+
+def test_parser_samples_rejected_payloads(tmp_path):
+    sampler = RejectedPayloadSampler()
+    parser = MopekaIOTBluetoothDeviceData(rejected_sampler=sampler)
+    parser.update(_service_info(b"\x08pC\xb6\xc3\xe0\xf5\t\xfa\xe3"))
+    parser.update(_service_info(b"\x7fpC\xb6\xc3\xe0\xf5\t\xfa\xe3"))
+    parser.update(_service_info(b"\x08pC\xb6\xc3\xe0\xf5\t\xfa\xe3\x00"))
+    (unsupported,) = sampler.samples(RejectReason.UNSUPPORTED_MODEL)
+    assert unsupported.address == "C9:F3:32:E0:F5:09"
+    assert unsupported.payload == b"\x7fpC\xb6\xc3\xe0\xf5\t\xfa\xe3"
+    (wrong_length,) = sampler.samples(RejectReason.WRONG_LENGTH)
+    assert len(wrong_length.payload) == 11
+    assert sampler.samples(RejectReason.NOT_MOPEKA) == []
+    assert len(sampler.samples()) == 2
+
+    path = tmp_path / "rejected.ndjson"
+    assert sampler.dump(path) == 2
+    lines = [json.loads(line) for line in path.read_text().splitlines()]
+    assert {line["reason"] for line in lines} == {"unsupported_model", "wrong_length"}
+    assert lines[0]["payload"] == "7f7043b6c3e0f509fae3"
+
+
+def test_reservoir_is_bounded():
+    sampler = RejectedPayloadSampler(capacity=4, rate=1_000_000, seed=1)
+    for n in range(1000):
+        sampler.offer(RejectReason.UNSUPPORTED_MODEL, "AA", bytes((n % 256,)))
+    assert len(sampler.samples()) == 4
+    assert sampler.seen(RejectReason.UNSUPPORTED_MODEL) == 1000
+    assert sampler.seen(RejectReason.NOT_MOPEKA) == 0
+    sampler.clear()
+    assert sampler.samples() == []
+
+
+def test_stores_are_rate_limited():
+    sampler = RejectedPayloadSampler(capacity=3, rate=0.0)
+    stored = [
+        sampler.offer(RejectReason.WRONG_LENGTH, "AA", b"\x00") for _ in range(10)
+    ]
+    assert stored == [True, True, True] + [False] * 7
+    sampler = RejectedPayloadSampler(capacity=10, rate=0.0)
+    for _ in range(5):
+        sampler.offer(RejectReason.WRONG_LENGTH, "AA", b"\x00")
+        sampler.offer(RejectReason.UNSUPPORTED_MODEL, "AA", b"\x00")
+    assert sampler.offer(RejectReason.WRONG_LENGTH, "AA", b"\x00") is False
+    assert len(sampler.samples()) == 10
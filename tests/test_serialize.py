@@ -0,0 +1,84 @@
+import json
+from datetime import date
+
+import pytest
+from bluetooth_sensor_state_data import BluetoothServiceInfo
+from sensor_state_data import (
+    DeviceKey,
+    SensorDescription,
+    SensorDeviceInfo,
+    SensorUpdate,
+    SensorValue,
+    Units,
+)
+
+from mopeka_iot_ble import FleetSerializer, MopekaIOTFleet, fleet_to_json
+from mopeka_iot_ble.serialize import orjson
+
+SERIALIZERS = [False, True] if orjson is not None else [False]
+
+
+def _service_info(address: str) -> BluetoothServiceInfo:
+    return BluetoothServiceInfo(
+        name="",
+        address=address,
+        rssi=-63,
+        manufacturer_data={89: b"\x08pC\xb6\xc3\xe0\xf5\t\xfa\xe3"},
+        service_uuids=["0000fee5-0000-1000-8000-00805f9b34fb"],
+        service_data={},
+        source="local",
+    )
+
+
+def _snapshot() -> dict[str, SensorUpdate]:
+    fleet = MopekaIOTFleet()
+    return {
+        address: fleet.update(_service_info(address))
+        for address in ("C9:F3:32:E0:F5:09", "C9:F3:32:E0:F5:0A")
+    }
+
+
+@pytest.mark.parametrize("use_orjson", SERIALIZERS)
+def test_matches_generic_path(use_orjson):
+    snapshot = _snapshot()
+    expected = fleet_to_json(snapshot)
+    serializer = FleetSerializer(use_orjson=use_orjson)
+    assert serializer.dumps(snapshot) == expected
+    assert serializer.dumps(snapshot) == expected
+    assert serializer.dumps({}) == b"{}"
+    device = json.loads(expected)["C9:F3:32:E0:F5:09"]
+    assert device["name"] == "Pro Plus F509"
+    assert device["model"] == "M1015"
+    assert device["sensors"]["temperature"] == {
+        "unit": "°C",
+        "device_class": "temperature",
+        "value": 27,
+    }
+    assert device["sensors"]["tank_level"]["value"] == 341
+    assert device["sensors"]["battery_voltage"]["value"] == 3.5
+    assert device["binary_sensors"]["button_pressed"] == {
+        "device_class": "occupancy",
+        "value": False,
+    }
+
+
+@pytest.mark.parametrize("use_orjson", SERIALIZERS)
+def test_entities_outside_the_parser_set(use_orjson):
+    known = DeviceKey("level")
+    unknown = DeviceKey("installed", "probe")
+    update = SensorUpdate(
+        title="Tank",
+        devices={None: SensorDeviceInfo('Tank "1"', None, None, None, None)},
+        entity_descriptions={
+            known: SensorDescription(known, None, Units.LENGTH_MILLIMETERS)
+        },
+        entity_values={
+            known: SensorValue(known, "Level", 0.25),
+            unknown: SensorValue(unknown, "Installed", date(2024, 5, 1)),
+        },
+    )
+    expected = fleet_to_json({"a": update})
+    assert FleetSerializer(use_orjson=use_orjson).dumps({"a": update}) == expected
+    assert json.loads(expected)["a"]["sensors"]["installed_probe"] == {
+        "value": "2024-05-01"
+    }
@@ -0,0 +1,230 @@
+import json
+import socket
+import threading
+from dataclasses import replace
+
+import pytest
+
+from mopeka_iot_ble import (
+    FileSink,
+    MediumType,
+    MopekaReading,
+    OverflowPolicy,
+    QueueSink,
+    ReadingSink,
+    SocketSink,
+)
+from mopeka_iot_ble.export import reading_from_json, reading_to_json
+
+READING = MopekaReading(
+    timestamp=1700000000.0,
+    address="C9:F3:32:E0:F5:09",
+    source="local",
+    rssi=-63,
+    model_id=8,
+    model="M1015",
+    name="Pro Plus",
+    medium=MediumType.PROPANE,
+    battery_voltage=3.5,
+    battery_percentage=100.0,
+    temperature=27,
+    button_pressed=False,
+    tank_level_raw=950,
+    tank_level=341,
+    reading_quality=3,
+    accelerometer_x=0xFA,
+    accelerometer_y=0xE3,
+    raw=b"\x08pC\xb6\xc3\xe0\xf5\t\xfa\xe3",
+)
+
+
+def _readings(count: int) -> list[MopekaReading]:
+    return [replace(READING, timestamp=READING.timestamp + i) for i in range(count)]
+
+
+class _GatedSink(ReadingSink):
+    """Sink whose writes wait until the test opens the gate."""
+
+    def __init__(self, **kwargs):
+        self.gate = threading.Event()
+        self.written: list[MopekaReading] = []
+        super().__init__(**kwargs)
+
+    def write_batch(self, batch):
+        self.gate.wait()
+        self.written.extend(batch)
+
+
+def test_reading_json_round_trip():
+    assert reading_from_json(reading_to_json(READING)) == READING
+
+
+def test_queue_sink_batches_by_size_and_linger():
+    sink = QueueSink(batch_size=3, linger=60.0)
+    for reading in _readings(7):
+        sink(reading)
+    assert len(sink.batches.get(timeout=5)) == 3
+    assert len(sink.batches.get(timeout=5)) == 3
+    assert sink.flush(timeout=5)
+    assert len(sink.batches.get(timeout=5)) == 1
+    sink.close()
+    assert sink.delivered == 7
+    assert sink.dropped == 0
+
+
+def test_drop_when_full():
+    sink = _GatedSink(batch_size=1, linger=0.0, max_buffered=2)
+    readings = _readings(10)
+    results = [sink.put(reading) for reading in readings]
+    assert results.count(False) == sink.dropped > 0
+    sink.gate.set()
+    sink.close(timeout=5)
+    kept = [reading for reading, kept in zip(readings, results) if kept]
+    assert sink.written == kept
+
+
+def test_spill_keeps_order(tmp_path):
+    spill_path = tmp_path / "spill.ndjson"
+    sink = _GatedSink(
+        batch_size=2,
+        linger=0.0,
+        max_buffered=2,
+        overflow=OverflowPolicy.SPILL,
+        spill_path=spill_path,
+    )
+    readings = _readings(20)
+    assert all(sink.put(reading) for reading in readings)
+    assert sink.spilled > 0
+    sink.gate.set()
+    assert sink.flush(timeout=5)
+    sink.close()
+    assert sink.written == readings
+    assert sink.dropped == 0
+    assert spill_path.read_text() == ""
+
+
+def test_block_waits_for_room():
+    sink = _GatedSink(
+        batch_size=1, linger=0.0, max_buffered=1, overflow=OverflowPolicy.BLOCK
+    )
+    readings = _readings(5)
+    producer = threading.Thread(target=lambda: [sink.put(r) for r in readings])
+    producer.start()
+    producer.join(timeout=0.2)
+    assert producer.is_alive()
+    sink.gate.set()
+    producer.join(timeout=5)
+    sink.close(timeout=5)
+    assert sink.written == readings
+
+
+def test_spill_again_after_catching_up(tmp_path):
+    spill_path = tmp_path / "spill.ndjson"
+    sink = _GatedSink(
+        batch_size=2,
+        linger=0.0,
+        max_buffered=1,
+        overflow=OverflowPolicy.SPILL,
+        spill_path=spill_path,
+    )
+    readings = _readings(20)
+    for round_readings in (readings[:10], readings[10:]):
+        sink.gate.clear()
+        assert all(sink.put(reading) for reading in round_readings)
+        assert sink.spilled > 0
+        sink.gate.set()
+        assert sink.flush(timeout=5)
+        assert spill_path.read_text() == ""
+    sink.close()
+    assert sink.written == readings
+    assert sink.dropped == 0
+
+
+def test_unexpected_write_errors_drop_the_batch():
+    class BrokenSink(QueueSink):
+        def write_batch(self, batch):
+            if batch[0] is READING:
+                raise RuntimeError("bug")
+            super().write_batch(batch)
+
+    sink = BrokenSink(batch_size=1, linger=0.0)
+    sink(READING)
+    other = _readings(2)[1]
+    sink(other)
+    assert sink.flush(timeout=5)
+    sink.close()
+    assert sink.dropped == 1
+    assert sink.batches.get_nowait() == [other]
+
+
+def test_sink_is_abstract():
+    with pytest.raises(TypeError):
+        ReadingSink()  # type: ignore[abstract]
+
+
+def test_spill_is_read_back_in_batches(tmp_path):
+    sink = _GatedSink(
+        batch_size=3,
+        linger=0.0,
+        max_buffered=1,
+        overflow=OverflowPolicy.SPILL,
+        spill_path=tmp_path / "spill.ndjson",
+    )
+    batches: list[int] = []
+    write_batch = sink.write_batch
+    sink.write_batch = lambda batch: (batches.append(len(batch)), write_batch(batch))
+    readings = _readings(10)
+    assert all(sink.put(reading) for reading in readings)
+    sink.gate.set()
+    assert sink.flush(timeout=5)
+    sink.close()
+    assert sink.written == readings
+    assert max(batches) <= 3
+
+
+def test_failed_batch_is_retried():
+    attempts: list[int] = []
+
+    class FlakySink(QueueSink):
+        def write_batch(self, batch):
+            attempts.append(len(batch))
+            if len(attempts) == 1:
+                raise OSError("consumer went away")
+            super().write_batch(batch)
+
+    sink = FlakySink(linger=0.0, retry_interval=0.01)
+    sink(READING)
+    assert sink.flush(timeout=5)
+    sink.close()
+    assert attempts == [1, 1]
+    assert sink.batches.get_nowait() == [READING]
+
+
+def test_file_sink(tmp_path):
+    path = tmp_path / "readings.ndjson"
+    with FileSink(path, linger=0.0) as sink:
+        for reading in _readings(3):
+            sink(reading)
+    lines = path.read_text().splitlines()
+    assert [json.loads(line)["timestamp"] for line in lines] == [
+        reading.timestamp for reading in _readings(3)
+    ]
+
+
+def test_socket_sink(tmp_path):
+    path = tmp_path / "sink.sock"
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(str(path))
+    server.listen(1)
+    sink = SocketSink(path, linger=0.0)
+    for reading in _readings(3):
+        sink(reading)
+    assert sink.flush(timeout=5)
+    sink.close()
+    connection, _ = server.accept()
+    received = b""
+    while chunk := connection.recv(65536):
+        received += chunk
+    connection.close()
+    server.close()
+    assert [reading_from_json(line) for line in received.splitlines()] == _readings(3)
@@ -0,0 +1,146 @@
+import pytest
+from bluetooth_sensor_state_data import BluetoothServiceInfo
+from sensor_state_data import Units
+
+from mopeka_iot_ble import (
+    MopekaIOTFleet,
+    Site,
+    SiteAggregator,
+    SiteMember,
+)
+from mopeka_iot_ble.sites import ACTIVE_TANK_KEY, SITE_FILL_KEY, SITE_VOLUME_KEY
+
+BOTTLES = Site(
+    "Cabin",
+    (
+        SiteMember("AA:AA:AA:AA:AA:AA", 400.0, 20.0, "Left"),
+        SiteMember("BB:BB:BB:BB:BB:BB", 400.0, 20.0, "Right"),
+    ),
+    Units.VOLUME_LITERS,
+)
+
+
+def test_totals_are_updated_incrementally():
+    aggregator = SiteAggregator([BOTTLES])
+    assert aggregator.site_of("AA:AA:AA:AA:AA:AA") == "Cabin"
+    assert aggregator.site_of("CC:CC:CC:CC:CC:CC") is None
+    assert aggregator.update("CC:CC:CC:CC:CC:CC", 100.0, 3) is None
+    aggregator.update("AA:AA:AA:AA:AA:AA", 400.0, 3)
+    totals = aggregator.totals("Cabin")
+    assert totals is not None
+    assert totals.fill == pytest.approx(100.0)
+    assert totals.capacity == 20.0
+    assert totals.tanks_reporting == 1
+    aggregator.update("BB:BB:BB:BB:BB:BB", 100.0, 3)
+    aggregator.update("AA:AA:AA:AA:AA:AA", 200.0, 3)
+    assert aggregator.update("AA:AA:AA:AA:AA:AA", None, 0) is None
+    assert aggregator.update("AA:AA:AA:AA:AA:AA", 0.0, 1) is None
+    totals = aggregator.totals("Cabin")
+    assert totals is not None
+    assert totals.volume == pytest.approx(15.0)
+    assert totals.capacity == 40.0
+    assert totals.fill == pytest.approx(37.5)
+    assert totals.tanks_reporting == 2
+
+
+def test_active_tank_follows_the_draw():
+    aggregator = SiteAggregator([BOTTLES], draw_threshold=5.0)
+    updates = []
+    aggregator.register_callback(lambda name, update: updates.append((name, update)))
+    aggregator.update("AA:AA:AA:AA:AA:AA", 300.0, 3)
+    aggregator.update("BB:BB:BB:BB:BB:BB", 380.0, 3)
+    aggregator.update("BB:BB:BB:BB:BB:BB", 377.0, 3)
+    assert aggregator.totals("Cabin").active_tank is None
+    aggregator.update("AA:AA:AA:AA:AA:AA", 290.0, 3)
+    assert aggregator.totals("Cabin").active_tank == "Left"
+    # Noise on the other bottle does not switch.
+    aggregator.update("BB:BB:BB:BB:BB:BB", 381.0, 3)
+    aggregator.update("BB:BB:BB:BB:BB:BB", 378.0, 3)
+    assert aggregator.totals("Cabin").active_tank == "Left"
+    aggregator.update("AA:AA:AA:AA:AA:AA", 0.0, 3)
+    aggregator.update("BB:BB:BB:BB:BB:BB", 360.0, 3)
+    name, update = updates[-1]
+    assert name == "Cabin"
+    assert update.title == "Cabin"
+    assert update.devices[None].name == "Cabin"
+    values = update.entity_values
+    assert values[ACTIVE_TANK_KEY].native_value == "Right"
+    assert values[SITE_VOLUME_KEY].native_value == 18.0
+    assert values[SITE_FILL_KEY].native_value == 45.0
+    assert update.entity_descriptions[SITE_VOLUME_KEY].native_unit_of_measurement is (
+        Units.VOLUME_LITERS
+    )
+
+
+def test_forget_drops_the_share():
+    aggregator = SiteAggregator([BOTTLES])
+    aggregator.update("AA:AA:AA:AA:AA:AA", 400.0, 3)
+    aggregator.update("AA:AA:AA:AA:AA:AA", 300.0, 3)
+    aggregator.update("BB:BB:BB:BB:BB:BB", 200.0, 3)
+    aggregator.forget("AA:AA:AA:AA:AA:AA")
+    aggregator.forget("CC:CC:CC:CC:CC:CC")
+    totals = aggregator.totals("Cabin")
+    assert totals is not None
+    assert totals.volume == pytest.approx(10.0)
+    assert totals.capacity == 20.0
+    assert totals.tanks_reporting == 1
+    assert totals.active_tank is None
+    assert aggregator.site_of("AA:AA:AA:AA:AA:AA") == "Cabin"
+    aggregator.forget("BB:BB:BB:BB:BB:BB")
+    assert aggregator.totals("Cabin") == (None, 0.0, 0.0, 0, None)
+
+
+@pytest.mark.parametrize("tank_height", [0.0, -400.0, float("nan")])
+def test_member_needs_a_positive_tank_height(tank_height):
+    with pytest.raises(ValueError):
+        SiteMember("AA:AA:AA:AA:AA:AA", tank_height)
+
+
+def test_sites_are_added_and_removed():
+    aggregator = SiteAggregator([BOTTLES])
+    with pytest.raises(ValueError):
+        aggregator.add_site(Site("Shed", (SiteMember("AA:AA:AA:AA:AA:AA", 400.0),)))
+    aggregator.remove_site("Cabin")
+    assert len(aggregator) == 0
+    assert aggregator.update("AA:AA:AA:AA:AA:AA", 100.0, 3) is None
+    aggregator.add_site(Site("Shed", (SiteMember("AA:AA:AA:AA:AA:AA", 400.0),)))
+    assert aggregator.site_of("AA:AA:AA:AA:AA:AA") == "Shed"
+    assert aggregator.totals("Cabin") is None
+
+
+def test_invalid_replacement_keeps_the_site():
+    aggregator = SiteAggregator([BOTTLES])
+    aggregator.add_site(Site("Shed", (SiteMember("CC:CC:CC:CC:CC:CC", 400.0),)))
+    aggregator.update("AA:AA:AA:AA:AA:AA", 400.0, 3)
+    with pytest.raises(ValueError):
+        aggregator.add_site(Site("Cabin", (SiteMember("CC:CC:CC:CC:CC:CC", 400.0),)))
+    with pytest.raises(ValueError):
+        aggregator.add_site(Site("Cabin", (BOTTLES.members[0], BOTTLES.members[0])))
+    assert aggregator.site_of("AA:AA:AA:AA:AA:AA") == "Cabin"
+    totals = aggregator.totals("Cabin")
+    assert totals is not None
+    assert totals.tanks_reporting == 1
+    # A site may be replaced by one sharing its own tanks.
+    aggregator.add_site(Site("Cabin", BOTTLES.members[:1]))
+    assert aggregator.site_of("AA:AA:AA:AA:AA:AA") == "Cabin"
+    assert aggregator.site_of("BB:BB:BB:BB:BB:BB") is None
+
+
+def test_fleet_readings_feed_the_site():
+    aggregator = SiteAggregator([BOTTLES])
+    fleet = MopekaIOTFleet()
+    fleet.register_reading_callback(aggregator)
+    fleet.update(
+        BluetoothServiceInfo(
+            name="",
+            address="AA:AA:AA:AA:AA:AA",
+            rssi=-63,
+            manufacturer_data={89: b"\x08pC\xb6\xc3\xe0\xf5\t\xfa\xe3"},
+            service_uuids=["0000fee5-0000-1000-8000-00805f9b34fb"],
+            service_data={},
+            source="local",
+        )
+    )
+    totals = aggregator.totals("Cabin")
+    assert totals is not None
+    assert totals.volume == pytest.approx(341 / 400 * 20)
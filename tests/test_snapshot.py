@@ -0,0 +1,191 @@
+import struct
+import time
+from unittest.mock import patch
+
+import pytest
+from bluetooth_sensor_state_data import BluetoothServiceInfo
+from sensor_state_data import DeviceKey
+
+from mopeka_iot_ble import (
+    BatteryModel,
+    ConsumptionEstimator,
+    FrameRecord,
+    LinkTracker,
+    MediumType,
+    MopekaIOTBluetoothDeviceData,
+    MopekaIOTFleet,
+    MopekaReading,
+    MovementDetector,
+    SnapshotError,
+    decode_snapshot,
+    encode_snapshot,
+)
+
+TANK_LEVEL = DeviceKey(key="tank_level", device_id=None)
+RESTORED = DeviceKey(key="restored", device_id=None)
+
+
+def _service_info(address: str) -> BluetoothServiceInfo:
+    return BluetoothServiceInfo(
+        name="",
+        address=address,
+        rssi=-63,
+        manufacturer_data={89: b"\x08pC\xb6\xc3\xe0\xf5\t\xfa\xe3"},
+        service_uuids=["0000fee5-0000-1000-8000-00805f9b34fb"],
+        service_data={},
+        source="local",
+    )
+
+
+def test_encode_decode_roundtrip():
+    records = [
+        FrameRecord(
+            1.5, "AA:AA:AA:AA:AA:AA", "hci0", -63, MediumType.PROPANE, b"\x08" * 10
+        ),
+        FrameRecord(2.5, "BB", "proxy", -200, MediumType.HYDRAULIC_OIL, b""),
+    ]
+    decoded = decode_snapshot(encode_snapshot(records))
+    assert decoded[0] == records[0]
+    assert decoded[1] == records[1]._replace(rssi=-128)
+    assert decode_snapshot(encode_snapshot([])) == []
+
+
+def test_decode_rejects_bad_snapshots():
+    data = encode_snapshot(
+        [FrameRecord(1.5, "AA", "hci0", -63, MediumType.PROPANE, b"\x08" * 10)]
+    )
+    with pytest.raises(SnapshotError):
+        decode_snapshot(b"MOP")
+    with pytest.raises(SnapshotError):
+        decode_snapshot(b"NOPE" + data[4:])
+    with pytest.raises(SnapshotError):
+        decode_snapshot(data[:4] + b"\x63" + data[5:])
+    with pytest.raises(SnapshotError):
+        decode_snapshot(data[:-1])
+    # A medium ID no medium has.
+    corrupt = bytearray(data)
+    corrupt[9 + 9] = 0xFF
+    with pytest.raises(SnapshotError):
+        decode_snapshot(bytes(corrupt))
+    # An address that is not UTF-8.
+    with pytest.raises(SnapshotError):
+        decode_snapshot(data.replace(b"AA", b"\xff\xfe"))
+
+
+def test_decode_version_1():
+    data = (
+        struct.pack("<4sBI", b"MOPK", 1, 1)
+        + struct.pack("<dbBBBB", 1.5, -63, 0, 2, 4, 10)
+        + b"AAhci0"
+        + b"\x08" * 10
+    )
+    assert decode_snapshot(data) == [
+        FrameRecord(1.5, "AA", "hci0", -63, MediumType.PROPANE, b"\x08" * 10)
+    ]
+
+
+def test_state_roundtrip():
+    record = FrameRecord(
+        1.5,
+        "AA",
+        "hci0",
+        -63,
+        MediumType.PROPANE,
+        b"\x08" * 10,
+        (("movement", b"\x01\x02"), ("link", b"")),
+    )
+    assert decode_snapshot(encode_snapshot([record])) == [record]
+
+
+def test_parser_last_frame_and_restore():
+    parser = MopekaIOTBluetoothDeviceData(MediumType.FRESH_WATER)
+    assert parser.last_frame is None
+    original = parser.update(_service_info("AA:AA:AA:AA:AA:AA"))
+    record = parser.last_frame
+    assert record is not None
+    assert record.medium is MediumType.FRESH_WATER
+    assert record.payload == b"\x08pC\xb6\xc3\xe0\xf5\t\xfa\xe3"
+
+    readings: list[MopekaReading] = []
+    # The frame is decoded for the medium it was recorded with.
+    restored_parser = MopekaIOTBluetoothDeviceData(MediumType.PROPANE)
+    restored_parser.register_reading_callback(readings.append)
+    restored = restored_parser.restore(record)
+    assert restored is not None
+    assert restored.entity_values == original.entity_values
+    assert restored.binary_entity_values[RESTORED].native_value is True
+    assert RESTORED not in original.binary_entity_values
+    assert restored_parser.last_frame == record
+    assert readings == []
+    assert restored_parser.restore(record._replace(payload=b"\x7f" * 10)) is None
+    live = restored_parser.update(_service_info("AA:AA:AA:AA:AA:AA"))
+    assert live.binary_entity_values[RESTORED].native_value is False
+    assert live.entity_values[TANK_LEVEL].native_value == 341
+
+
+def test_fleet_snapshot_restore():
+    fleet = MopekaIOTFleet()
+    fleet.update(_service_info("AA:AA:AA:AA:AA:AA"))
+    fleet.update(_service_info("BB:BB:BB:BB:BB:BB"))
+    data = fleet.snapshot()
+
+    restored_fleet = MopekaIOTFleet()
+    restored = restored_fleet.restore(data, now=time.time() + 60)
+    assert set(restored) == {"AA:AA:AA:AA:AA:AA", "BB:BB:BB:BB:BB:BB"}
+    device = restored["AA:AA:AA:AA:AA:AA"]
+    assert 59 < device.age < 61
+    assert device.update.devices[None].name == "Pro Plus AAAA"
+    assert device.update.entity_values[TANK_LEVEL].native_value == 341
+    assert len(restored_fleet) == 2
+
+
+def test_fleet_restore_skips_frames_that_do_not_decode():
+    fleet = MopekaIOTFleet()
+    readings: list[MopekaReading] = []
+    fleet.register_reading_callback(readings.append)
+    data = encode_snapshot(
+        [FrameRecord(1.5, "CC", "hci0", -63, MediumType.PROPANE, b"\x7f" * 10)]
+    )
+    assert fleet.restore(data) == {}
+    assert "CC" not in fleet
+    assert len(fleet) == 0
+
+
+def _trackers():
+    return {
+        "movement_detector": MovementDetector(),
+        "consumption_estimator": ConsumptionEstimator(bucket=60.0),
+        "link_tracker": LinkTracker(),
+        "battery_model": BatteryModel(),
+    }
+
+
+def test_fleet_snapshot_restores_tracker_state():
+    trackers = _trackers()
+    fleet = MopekaIOTFleet(**trackers)
+    for second in range(0, 600, 7):
+        with patch("mopeka_iot_ble.parser.time.time", return_value=float(second)):
+            fleet.update(_service_info("AA:AA:AA:AA:AA:AA"))
+    data = fleet.snapshot()
+
+    restored_trackers = _trackers()
+    MopekaIOTFleet(**restored_trackers).restore(data)
+    for name, tracker in trackers.items():
+        state = tracker.dump_state("AA:AA:AA:AA:AA:AA")
+        assert state is not None, name
+        assert restored_trackers[name].dump_state("AA:AA:AA:AA:AA:AA") == state
+
+
+def test_corrupt_tracker_state():
+    parser = MopekaIOTBluetoothDeviceData(movement_detector=MovementDetector())
+    record = FrameRecord(
+        1.5,
+        "AA:AA:AA:AA:AA:AA",
+        "hci0",
+        -63,
+        MediumType.PROPANE,
+        b"\x08pC\xb6\xc3\xe0\xf5\t\xfa\xe3",
+        (("movement", b"\x01"),),
+    )
+    with pytest.raises(SnapshotError):
+        parser.restore(record)